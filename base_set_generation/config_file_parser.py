@@ -18,7 +18,10 @@ Testception. If not, see <http://www.gnu.org/licenses/>.
 
 import ast
 import copy
+import hashlib
+import imp
 import os
+import pickle
 import re
 import string
 import sys
@@ -34,14 +37,24 @@ EVALS_HEADER = "[exhaustive domain]"
 RVALS_HEADER = "[random domain]"
 VARS_HEADER = "[variables]"
 RANDOM_HEADER = "[num random]"
+RATTEMPTS_HEADER = "[max random attempts]"
+SPLIT_HEADER = "[percent exhaustive]"
+EXHAUSTIVE_HEADER = "[max exhaustive]"
+STRENGTH_HEADER = "[combination strength]"
+CANONICAL_HEADER = "[canonical form]"
 
 MANDATORY_HEADERS = [TYPES_HEADER, EVALS_HEADER, RVALS_HEADER, RANDOM_HEADER]
 OPTIONAL_HEADERS = [EVALIDATION_HEADER, RVALIDATION_HEADER, 
-    CONSTRUCTORS_HEADER, VARS_HEADER]
+    CONSTRUCTORS_HEADER, VARS_HEADER, RATTEMPTS_HEADER, SPLIT_HEADER, 
+    EXHAUSTIVE_HEADER, STRENGTH_HEADER, CANONICAL_HEADER]
 
-## Paths for input and output files
+## Paths for input files, and for the cached method specs
 CWD = os.path.dirname(os.path.realpath(__file__))
-OUTFILE = CWD + "/method_spec.py"
+SPEC_CACHE_DIR = CWD + "/cache/specs"
+
+## Source files of the parser itself, so that changes to it invalidate the 
+## cached method specs
+PARSER_FILES = ["bsg_globals.py", "config_file_parser.py"]
 
 ## Keywords for specifying domains, types, etc.
 ANY = "any"
@@ -49,7 +62,7 @@ CLASS = "class"
 
 def _find_sublines(header_to_idx, header_inds, header, lines):
     """
-    Helper function to make parse_config_file more robust: given a mapping of
+    Helper function to make read_config_file more robust: given a mapping of
     headers to starting indices, a sorted list of header start indices, the
     header for which to find the sublines, and the complete list of lines,
     returns a sublist of lines containing only the lines within the specified 
@@ -66,7 +79,186 @@ def _find_sublines(header_to_idx, header_inds, header, lines):
 
     return sublines
 
-def parse_config_file(projno, funcno, ms_outpath, importdir=None):
+class MethodSpec():
+    """
+    The method spec parsed from the config file for one function: the 
+    parsed contents of each of its sections (TYPES, EXHAUSTIVE_VALS, 
+    RANDOMIZED_VALS, VARS, CONSTRUCTORS, RANDOMIZED_BOUND, 
+    RANDOMIZED_ATTEMPTS, SPLIT, EXHAUSTIVE_BOUND, and STRENGTH), along with 
+    the functions and classes it imports: evalidation_fxn, rvalidation_fxn,
+    canonical_fxn (or None), and each constructor's class, by name. The 
+    modules they are imported from are kept in modules; each is loaded under
+    a name qualified by its file (see _load_module), so that the method specs
+    of different projects never share a module of the same name.
+
+    Only the parsed contents and the names of the imports are pickled; the 
+    imports are resolved again when unpickled. Raises ImportError if a
+    validation function or constructor can't be imported.
+    """
+    FIELDS = ["TYPES", "EXHAUSTIVE_VALS", "RANDOMIZED_VALS", "VARS", \
+        "CONSTRUCTORS", "RANDOMIZED_BOUND", "RANDOMIZED_ATTEMPTS", "SPLIT", \
+        "EXHAUSTIVE_BOUND", "STRENGTH"]
+
+    def __init__(self, fields, imports, paths):
+        """
+        Creates the method spec with the given mapping of FIELDS to their 
+        values, importing each (module name, name, as name) in imports from
+        the first of the given paths (or else sys.path) that has it.
+        """
+        self.fields = fields
+        self.imports = imports
+        self.paths = paths
+
+        for field in self.FIELDS:
+            setattr(self, field, fields[field])
+
+        self.canonical_fxn = None
+        self.modules = []
+        for module_name, name, as_name in imports:
+            module = _load_module(module_name, paths)
+            if not hasattr(module, name):
+                raise ImportError("cannot import name " + name)
+            setattr(self, as_name or name, getattr(module, name))
+            self.modules.append(module)
+
+    def __getstate__(self):
+        return self.fields, self.imports, self.paths
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def describe(self, exclude=()):
+        """
+        Returns a description of the parsed contents and imports of this 
+        method spec (other than its paths, and any FIELDS in exclude) that is
+        the same for the same config file.
+        """
+        lines = []
+        for field in self.FIELDS:
+            if field not in exclude:
+                val = self.fields[field]
+                if type(val) == type({}):
+                    val = sorted(val.items())
+                lines.append(field + " = " + repr(val))
+
+        return "\n".join(lines + [repr(self.imports)])
+
+def _load_module(module_name, paths):
+    """
+    Returns the module with the given name, loaded from its source file under
+    a name qualified by the path of that file, so that modules of the same 
+    name from different projects are kept apart in sys.modules. Validation 
+    modules ("validation." followed by a name) are found within this 
+    package; other modules in the first of the given paths, or else of 
+    sys.path, that has them. The paths are only on sys.path while the module
+    is loaded, so that it can import its neighbours. Raises ImportError if 
+    there is no such module.
+    """
+    if module_name.startswith("validation."):
+        dirs = [CWD + "/validation"]
+        fname = module_name[len("validation."):] + ".py"
+    else:
+        dirs = paths + sys.path
+        fname = module_name + ".py"
+
+    for dirname in dirs:
+        path = os.path.abspath(os.path.join(dirname or os.curdir, fname))
+        if os.path.isfile(path):
+            break
+    else:
+        raise ImportError("No module named " + module_name)
+
+    qualified_name = "spec_" + hashlib.sha1(path).hexdigest()[:12] + "_" \
+        + module_name.replace(".", "_")
+    if qualified_name in sys.modules:
+        return sys.modules[qualified_name]
+
+    sys.path[0:0] = paths
+    try:
+        return imp.load_source(qualified_name, path)
+    finally:
+        ## Remove the paths to avoid keeping old paths
+        del sys.path[0:len(paths)]
+
+def spec_key(projno, funcno, importdir=None):
+    """
+    Returns the key under which to cache the method spec parsed from the 
+    config file for the given (problem, function): a hash of the config 
+    file, the paths its method spec imports from, and the parser itself.
+    """
+    if importdir:
+        importdir = os.path.abspath(importdir)
+
+    digest = hashlib.sha256()
+    digest.update(_read(_config_filename(projno, funcno)))
+    digest.update(repr([projno, CWD, importdir]))
+    for fname in PARSER_FILES:
+        digest.update(_read(CWD + "/" + fname))
+
+    return digest.hexdigest()
+
+def load_method_spec(projno, funcno, importdir=None):
+    """
+    Returns the method spec for the given (problem, function) (see 
+    MethodSpec), reusing the one cached for the same config file (see 
+    spec_key), if any; otherwise, the config file is parsed (see 
+    read_config_file), and the result cached. Raises ImportError if a 
+    validation function or constructor can't be imported.
+    """
+    path = os.path.join(SPEC_CACHE_DIR, spec_key(projno, funcno, importdir) \
+        + ".pickle")
+    if os.path.isfile(path):
+        return read_method_spec(path)
+
+    method_spec = read_config_file(projno, funcno, importdir)
+    if not os.path.isdir(SPEC_CACHE_DIR):
+        os.makedirs(SPEC_CACHE_DIR)
+    write_method_spec(method_spec, path)
+    return method_spec
+
+def write_method_spec(method_spec, path):
+    """
+    Pickles the given method spec to the given path, writing to a temporary
+    file first so that an interrupted write never leaves a truncated one 
+    behind.
+    """
+    f = open(path + ".tmp", "wb")
+    pickle.dump(method_spec, f, pickle.HIGHEST_PROTOCOL)
+    f.close()
+    os.rename(path + ".tmp", path)
+
+def read_method_spec(path):
+    """
+    Returns the method spec pickled to the given path (see 
+    write_method_spec). Raises ImportError if a validation function or 
+    constructor can't be imported.
+    """
+    f = open(path, "rb")
+    method_spec = pickle.load(f)
+    f.close()
+    return method_spec
+
+def _config_filename(projno, funcno):
+    """
+    Returns the path of the config file for the given (problem, function).
+    """
+    return CWD + "/../projects/project" + str(projno) + "/func" \
+        + str(funcno) + ".cfg"
+
+def _read(path):
+    """
+    Returns the contents of the file at the given path, or "" if there is no
+    such file.
+    """
+    if not os.path.isfile(path):
+        return ""
+
+    f = open(path)
+    contents = f.read()
+    f.close()
+    return contents
+
+def read_config_file(projno, funcno, importdir=None):
     """
     Parse the config file, whose name was passed as a command line arg, 
     and constructs two lists:
@@ -90,15 +282,13 @@ def parse_config_file(projno, funcno, ms_outpath, importdir=None):
        order as their corresponding types, and this results in dictionaries 
        being laid out equivalently to in TYPES.
 
-    Creates a file method_spec.py which imports the solution to the function
-    to be tested and includes the definitions of TYPES and VALS. This file will
-    later be used to this tuple to the parser_output.py file, which will later
-    be used to a) generate test cases and b) check results.
+    Returns the resulting method spec (see MethodSpec), which includes TYPES
+    and VALS along with the validation functions for the function to be 
+    tested. This will later be used to a) generate test cases and b) check
+    results; use load_method_spec to only parse each config file once.
     """
     ## Read the complete contents of the config file
-    config_filename = CWD + "/../projects/project" + str(projno) + "/func" \
-        + str(funcno) + ".cfg"
-    f = open(config_filename, "r")
+    f = open(_config_filename(projno, funcno), "r")
 
     lines = filter(len, [line[:-1] for line in f.readlines()])
     f.close()
@@ -128,34 +318,40 @@ def parse_config_file(projno, funcno, ms_outpath, importdir=None):
         ## Find the series of lines within this section
         sublines = _find_sublines(header_to_idx, header_inds, \
             EVALIDATION_HEADER, lines)
-        import_str0 = parse_validation(sublines, "evalidation_fxn")
+        imports0 = parse_validation(sublines, "evalidation_fxn")
 
         ## Even though it's now optional, still accept opting out via present 
         ## but no contents
-        if not import_str0:
-            import_str0 = "from validation.default import accept_all as " \
-                + "evalidation_fxn\n"
+        if not imports0:
+            imports0 = [("validation.default", "accept_all", \
+                "evalidation_fxn")]
 
     else:
-        import_str0 = "from validation.default import accept_all as " \
-            + "evalidation_fxn\n"
+        imports0 = [("validation.default", "accept_all", "evalidation_fxn")]
 
     if RVALIDATION_HEADER in header_to_idx:
 
         ## Find the series of lines withi this section
         sublines = _find_sublines(header_to_idx, header_inds, \
             RVALIDATION_HEADER, lines)
-        import_str1 = parse_validation(sublines, "rvalidation_fxn")
+        imports1 = parse_validation(sublines, "rvalidation_fxn")
 
         ## Even though it's now optional, still accept opting out via present 
         ## but no contents
-        if not import_str1:
-            import_str1 = "from validation.default import accept_all as " \
-                + "rvalidation_fxn\n"
+        if not imports1:
+            imports1 = [("validation.default", "accept_all", \
+                "rvalidation_fxn")]
+
+    else:
+        imports1 = [("validation.default", "accept_all", "rvalidation_fxn")]
 
+    ## Canonical form, for keeping only one test case per equivalence class 
+    ## (optional; if unspecified, only exact duplicates are dropped)
+    if CANONICAL_HEADER in header_to_idx:
+        imports3 = parse_validation(_find_sublines(header_to_idx, \
+            header_inds, CANONICAL_HEADER, lines), "canonical_fxn")
     else:
-        import_str1 = "from validation.default import accept_all as " \
-            + "rvalidation_fxn\n"
+        imports3 = []
 
     ## The meat of it: types of the parameters for this function
     types_sublines =_find_sublines(header_to_idx, header_inds, \
@@ -173,11 +369,11 @@ def parse_config_file(projno, funcno, ms_outpath, importdir=None):
     ## Constructors args for all classes that appeared in the types list
     ## (again, optional)
     if CONSTRUCTORS_HEADER in header_to_idx:
-        import_str2, dummy, constructors = parse_constructors( \
+        imports2, dummy, constructors = parse_constructors( \
             _find_sublines(header_to_idx, header_inds, CONSTRUCTORS_HEADER, \
             lines), variables, 0)
     else:
-        import_str2 = ""
+        imports2 = []
         constructors = {}
 
     ## The other half of the meat of it: value ranges of the parameters for 
@@ -188,39 +384,64 @@ def parse_config_file(projno, funcno, ms_outpath, importdir=None):
         RVALS_HEADER, lines), types_sublines, variables)
 
     ## Number of random test cases to be generated
-    random = _find_sublines(header_to_idx, header_inds, RANDOM_HEADER, \
-        lines)[0]
-
-    ## Write the results to method_spec.py and ms_proj<projno>_func<funcno>.py
-    f1 = open(OUTFILE, "w+")
-    f2 = open(ms_outpath, "w+")
-    f1.write("import sys\n\nsys.path.append(\"../projects/project" \
-        + str(projno) + "/\")\n")
-    f2.write("import sys\n\nsys.path.append(\"../../projects/project" \
-        + str(projno) + "/\")\n")
+    random = ast.literal_eval(_find_sublines(header_to_idx, header_inds, \
+        RANDOM_HEADER, lines)[0].strip())
+
+    ## Budget of attempts at generating random test cases (optional; if 
+    ## unspecified, the randomized generator picks one based on the number of
+    ## random test cases)
+    if RATTEMPTS_HEADER in header_to_idx:
+        random_attempts = ast.literal_eval(_find_sublines(header_to_idx, \
+            header_inds, RATTEMPTS_HEADER, lines)[0].strip())
+    else:
+        random_attempts = None
+
+    ## Split of a total budget between exhaustive and random test cases, if 
+    ## generating with one (optional)
+    if SPLIT_HEADER in header_to_idx:
+        split = parse_split(_find_sublines(header_to_idx, header_inds, \
+            SPLIT_HEADER, lines))
+    else:
+        split = None
+
+    ## Cap on the number of exhaustive test cases, beyond which the exhaustive
+    ## domain is sampled (optional)
+    if EXHAUSTIVE_HEADER in header_to_idx:
+        exhaustive_bound = ast.literal_eval(_find_sublines(header_to_idx, \
+            header_inds, EXHAUSTIVE_HEADER, lines)[0].strip())
+    else:
+        exhaustive_bound = None
+
+    ## Strength of the covering array to reduce the exhaustive test cases to
+    ## (optional; if unspecified, keep the full product across parameters)
+    if STRENGTH_HEADER in header_to_idx:
+        strength = ast.literal_eval(_find_sublines(header_to_idx, \
+            header_inds, STRENGTH_HEADER, lines)[0].strip())
+    else:
+        strength = None
+
+    ## Paths to import constructors from
+    paths = [os.path.normpath(CWD + "/../projects/project" + str(projno))]
     if importdir:
-        f1.write("sys.path.append(\"../" + importdir + "\")\n")
-        f2.write("sys.path.append(\"../../" + importdir + "\")\n")
-    f1.write(import_str0)
-    f1.write(import_str1)
-
-    for outf in [f1, f2]:
-        outf.write(import_str2 + "\n")
-        outf.write("TYPES = " + str(types) + "\n")
-        outf.write("EXHAUSTIVE_VALS = " + str(exhaustive_vals) + "\n")
-        outf.write("RANDOMIZED_VALS = " + str(randomized_vals) + "\n")
-        outf.write("VARS = " + str(variables) + "\n")
-        outf.write("CONSTRUCTORS = " + str(constructors) + "\n")
-        outf.write("RANDOMIZED_BOUND = " + random + "\n")
-        outf.close()
+        paths.append(os.path.abspath(importdir))
+
+    fields = {"TYPES": types, "EXHAUSTIVE_VALS": exhaustive_vals, \
+        "RANDOMIZED_VALS": randomized_vals, "VARS": variables, \
+        "CONSTRUCTORS": constructors, "RANDOMIZED_BOUND": random, \
+        "RANDOMIZED_ATTEMPTS": random_attempts, "SPLIT": split, \
+        "EXHAUSTIVE_BOUND": exhaustive_bound, "STRENGTH": strength}
+
+    return MethodSpec(fields, imports0 + imports1 + imports3 + imports2, \
+        paths)
 
 def parse_validation(lines, as_what=None):
     """
     Parse the [validation] (and/or [solution], formerly) section of 
-    the config file. Returns a string importing the required function(s) 
-    and/or class(es) from the appropriate file(s).
+    the config file. Returns a list of (module name, name, as name) imports
+    of the required function(s) and/or class(es) from the appropriate 
+    file(s).
     """
-    retval = ""
+    retval = []
     for line in lines:
 
         ## Skip blank lines
@@ -230,21 +451,18 @@ def parse_validation(lines, as_what=None):
         ## Lines will be of the format "filename, fxn_name"
         filename, fxn_name = tuple([elem.strip() for elem in line.split(",")])
         filename = ".".join(filename.split(".")[0:-1])
-        retval += "from validation." + filename + " import " + fxn_name
-        if as_what:
-            retval += " as " + as_what + "\n"
-        else:
-            retval += "\n"
+        retval.append(("validation." + filename, fxn_name, as_what))
 
     return retval
 
 def parse_constructors(lines, variables, indentation=0, as_what=None):
     """
-    Parse the [constructors] section of the config file. Returns a string 
-    importing the required class(es) from the appropriate file(s), as well as
-    a dictionary mapping class names to lists of arg types.
+    Parse the [constructors] section of the config file. Returns a list of
+    (module name, name, as name) imports of the required class(es) from the
+    appropriate file(s), as well as a dictionary mapping class names to lists
+    of arg types.
     """
-    retval = ""
+    retval = []
     constructors = {}
     init_vals = []
 
@@ -270,18 +488,14 @@ def parse_constructors(lines, variables, indentation=0, as_what=None):
                 for elem in line.split(",")])
 
             filename = ".".join(filename.split(".")[0:-1])
-            retval += "from " + filename + " import " + class_name
-            if as_what:
-                retval += " as " + as_what + "\n"
-            else:
-                retval += "\n"
+            retval.append((filename, class_name, as_what))
 
-            importstr, fields, nested_constructors = parse_constructors(lines[i+1:], \
+            imports, fields, nested_constructors = parse_constructors(lines[i+1:], \
                 variables, indentation + 1)
 
             ## Aggregate the nested information with the current-level 
             ## information
-            retval += importstr
+            retval += imports
             constructors.update(nested_constructors)
             constructors[class_name] = fields
 
@@ -844,5 +1058,6 @@ def parse_split(lines):
 
 
 if __name__ == "__main__":
-    ## Expect one arg, the name of the file to be parsed, and do said parsing!
-    parse_config_file(CWD + "/" + sys.argv[1])
+    ## Expect two args, the project and function numbers of the config file to
+    ## be parsed, and do said parsing!
+    print read_config_file(sys.argv[1], sys.argv[2]).describe()
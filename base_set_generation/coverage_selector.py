@@ -0,0 +1,230 @@
+"""
+Copyright 2015-2017 Rebecca Smith, Terry Tang, Joe Warren, and Scott Rixner
+
+This file is part of Testception.
+
+Testception is free software: you can redistribute it and/or modify it under 
+the terms of the GNU General Public License as published by the Free Software 
+Foundation, either version 3 of the License, or (at your option) any later 
+version.
+
+Testception is distributed in the hope that it will be useful, but WITHOUT ANY 
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR 
+A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with 
+Testception. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import copy
+import imp
+import json
+import os
+import sys
+
+from test_case_generator import *
+
+## Kinds of coverage features that a test case can add
+LINE = "line"
+ARC = "arc"
+OUTPUT = "output"
+
+def _output_class(value):
+    """
+    Returns the class of the given (arbitrarily nested) reference output: its
+    type, along with the sign of a number, the value of a bool, or whether a
+    container or str is empty, a singleton, or longer; containers add the
+    classes of their elements.
+    """
+    value_type = type(value)
+
+    if value_type == bool or value is None:
+        return value
+
+    elif value_type in [int, long, float]:
+        return (value_type, cmp(value, 0))
+
+    elif value_type in [str, unicode]:
+        return (value_type, min(len(value), 2))
+
+    elif value_type in [list, tuple, set, frozenset]:
+        return (value_type, min(len(value), 2), \
+            frozenset([_output_class(elem) for elem in value]))
+
+    elif value_type == dict:
+        return (value_type, min(len(value), 2), \
+            frozenset([(_output_class(key), _output_class(val)) \
+            for key, val in value.items()]))
+
+    ## Class instance (or anything else): only its type
+    return value_type.__name__
+
+def _trace_case(ref_func, module_globals, case):
+    """
+    Runs ref_func on (a copy of) the given test case, tracing every line
+    executed in the module with the given globals. Returns the set of
+    features covered: the lines, and the arcs between consecutive lines 
+    within a call (including entering and leaving it, as negated line 
+    numbers). Also returns the reference output, as a pair of either 
+    "returns" and the value returned, or "raises" and the exception's type.
+    """
+    features = set()
+
+    def global_trace(frame, event, arg):
+        if frame.f_globals is not module_globals:
+            return None
+
+        entry = -frame.f_code.co_firstlineno
+        last_line = [entry]
+
+        def local_trace(frame, event, arg):
+            if event == "line":
+                features.add((LINE, frame.f_lineno))
+                features.add((ARC, last_line[0], frame.f_lineno))
+                last_line[0] = frame.f_lineno
+            elif event == "return":
+                features.add((ARC, last_line[0], entry))
+            return local_trace
+
+        return local_trace
+
+    temp_case = copy.deepcopy(case)
+    sys.settrace(global_trace)
+    try:
+        output = ("returns", ref_func(*temp_case))
+    except Exception as ex:
+        output = ("raises", type(ex).__name__)
+    finally:
+        sys.settrace(None)
+
+    return features, output
+
+def select_cases(ref_func, module_globals, cases, cap=None, stats=None):
+    """
+    Returns the indices (in ascending order) of the test cases, out of the
+    given ones (with any classes instantiated), that are kept by a greedy
+    pass in order over them: a test case is kept if running ref_func on it
+    covers a line, an arc, or a class of reference output (see _trace_case
+    and _output_class) that no test case kept before it did. Stops after cap
+    test cases, if given.
+
+    Given stats, the number of candidate and selected test cases, and the 
+    number of features of each kind covered by the selected ones, are left 
+    in its "coverage" entry.
+    """
+    covered = set()
+    idxs = []
+    for idx, case in enumerate(cases):
+        if cap is not None and len(idxs) >= cap:
+            break
+
+        features, output = _trace_case(ref_func, module_globals, case)
+        if output[0] == "returns":
+            features.add((OUTPUT, _output_class(output[1])))
+        else:
+            features.add((OUTPUT, output))
+
+        if not features <= covered:
+            covered.update(features)
+            idxs.append(idx)
+
+    if stats is not None:
+        counters = {"candidates": len(cases), "selected": len(idxs)}
+        for kind in [LINE, ARC, OUTPUT]:
+            counters[kind] = len([feature for feature in covered \
+                if feature[0] == kind])
+        stats["coverage"] = counters
+
+    return idxs
+
+def collapse_cases(ref_func, module_globals, cases, per_group, stats=None):
+    """
+    Returns the indices (in ascending order) of the test cases, out of the
+    given ones (with any classes instantiated), that are kept when grouping 
+    them by the output of ref_func and the set of lines and arcs it executes
+    (see _trace_case), so that the number of loop iterations doesn't matter:
+    only the first per_group test cases of each group are kept.
+
+    Given stats, the number of candidate and kept test cases, and the number
+    of groups they fell into, are left in its "collapse" entry.
+    """
+    group_sizes = {}
+    idxs = []
+    for idx, case in enumerate(cases):
+        features, output = _trace_case(ref_func, module_globals, case)
+        key = (CANONICAL(output), frozenset(features))
+
+        group_sizes[key] = group_sizes.get(key, 0) + 1
+        if group_sizes[key] <= per_group:
+            idxs.append(idx)
+
+    if stats is not None:
+        stats["collapse"] = {"candidates": len(cases), \
+            "groups": len(group_sizes), "selected": len(idxs)}
+
+    return idxs
+
+def gen_write_selected_cases(method_spec, outfile, projno, funcno, \
+    exhaustive_cases, randomized_cases, importdir=None, \
+    coverage_guided=False, cap=None, per_group=None, stats=None):
+    """
+    Reduces the given exhaustive and randomized test cases for the given 
+    method spec (as returned by gen_write_exhaustive_cases and 
+    gen_write_random_cases) by tracing the reference solution, considering 
+    the exhaustive test cases first, and rewrites the output file with them:
+    if given per_group, to that many per group of equivalent test cases (see
+    collapse_cases), and then if coverage_guided, to those that add coverage
+    (see select_cases). Their counters are left in the given stats, if any.
+    """
+    ## Load the reference solution under a name of its own, so that the
+    ## solutions to different projects can be loaded at once
+    if importdir:
+        sys.path.insert(0, os.path.abspath(importdir))
+    projdir = os.getcwd() + "/projects/project" + str(projno)
+    sys.path.insert(0, projdir)
+    solution = imp.load_source("solution_proj" + str(projno), \
+        projdir + "/solution.py")
+    ## Remove the paths to avoid keeping old paths
+    sys.path.pop(0)
+    if importdir:
+        sys.path.pop(0)
+
+    with open("menu.json") as data_file:
+        menu = json.load(data_file)
+    funcname = menu[str(projno)]["funclist"][funcno]
+    ref_func = getattr(solution, funcname)
+
+    cases = exhaustive_cases + randomized_cases
+    idxs = range(len(cases))
+    if per_group is not None:
+        idxs = collapse_cases(ref_func, solution.__dict__, cases, per_group, \
+            stats)
+
+    if coverage_guided:
+        idxs = [idxs[idx] for idx in select_cases(ref_func, \
+            solution.__dict__, [cases[idx] for idx in idxs], cap, stats)]
+    selected_exhaustive_cases = [exhaustive_cases[idx] for idx in idxs \
+        if idx < len(exhaustive_cases)]
+    selected_randomized_cases = [randomized_cases[idx \
+        - len(exhaustive_cases)] for idx in idxs \
+        if idx >= len(exhaustive_cases)]
+
+    ## Write test cases to file, without any instantiated classes
+    if CONTAINS_CLASSES(method_spec, method_spec.TYPES):
+        unconvert_classes = GET_CLASS_UNCONVERTER(method_spec, \
+            method_spec.TYPES)
+    else:
+        unconvert_classes = tuple
+
+    f = open(outfile, "w")
+    f.write("EXHAUSTIVE_CASES = ")
+    f.write(repr([unconvert_classes(case) for case \
+        in selected_exhaustive_cases]))
+    f.write("\n")
+    f.write("RANDOMIZED_CASES = ")
+    f.write(repr([unconvert_classes(case) for case \
+        in selected_randomized_cases]))
+    f.close()
+
+    ## Return the Python object versions
+    return selected_exhaustive_cases, selected_randomized_cases
@@ -0,0 +1,127 @@
+"""
+Copyright 2015-2017 Rebecca Smith, Terry Tang, Joe Warren, and Scott Rixner
+
+This file is part of Testception.
+
+Testception is free software: you can redistribute it and/or modify it under 
+the terms of the GNU General Public License as published by the Free Software 
+Foundation, either version 3 of the License, or (at your option) any later 
+version.
+
+Testception is distributed in the hope that it will be useful, but WITHOUT ANY 
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR 
+A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with 
+Testception. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import exhaustive_generator
+import randomized_generator
+from test_case_generator import *
+
+def gen_write_delta_cases(method_spec, outfile, previous, seed=None, jobs=1, \
+    stats=None):
+    """
+    Extends the previous base test set (as returned by 
+    generation_cache.load_previous) to the given method spec, if its domains 
+    contain the previous ones (see DOMAIN_CONTAINS) and its [num random] is no
+    smaller, and writes the output to a file. The previous test cases keep 
+    their indices, and the new ones are appended after them, in 
+    APPENDED_CASES; NUM_PREVIOUS marks where they start.
+
+    Only the test cases of the wider exhaustive domain that are not already in
+    the previous base test set are appended, followed by enough randomized 
+    test cases to make up the [num random]. Returns the Python object version
+    of the whole base test set, or None (without writing anything) if it 
+    can't be extended.
+
+    Given stats, the number of test cases in the previous base test set and
+    the number of exhaustive and randomized test cases appended to it are 
+    left in its "delta" entry, along with the counters of the generators 
+    (see exhaustive_generator.generate_exhaustive_cases and 
+    randomized_generator.generate_random_cases).
+    """
+    if stats is None:
+        stats = {}
+
+    ## A sample or a covering array of the wider domain need not contain the
+    ## previous one
+    if method_spec.EXHAUSTIVE_BOUND is not None or method_spec.STRENGTH:
+        return None
+
+    types = CONVERT_TYPES(method_spec.TYPES)
+    if not DOMAIN_CONTAINS(types, method_spec.EXHAUSTIVE_VALS, \
+        method_spec.VARS, previous["EXHAUSTIVE_VALS"], previous["VARS"]) or \
+        not DOMAIN_CONTAINS(types, method_spec.RANDOMIZED_VALS, \
+        method_spec.VARS, previous["RANDOMIZED_VALS"], previous["VARS"]) or \
+        method_spec.RANDOMIZED_BOUND < previous["RANDOMIZED_BOUND"]:
+        return None
+
+    has_classes = CONTAINS_CLASSES(method_spec, method_spec.TYPES)
+    convert_classes = GET_CLASS_CONVERTER(method_spec, method_spec.TYPES)
+
+    previous_cases = previous["EXHAUSTIVE_CASES"] \
+        + previous["RANDOMIZED_CASES"] + previous.get("APPENDED_CASES", [])
+    if has_classes:
+        previous_converted_cases = [convert_classes(case) for case \
+            in previous_cases]
+    else:
+        previous_converted_cases = [tuple(case) for case in previous_cases]
+    previous_keys = [CANONICAL_FORM(method_spec, case, converted_case) \
+        for case, converted_case in zip(previous_cases, \
+        previous_converted_cases)]
+
+    ## Only the exhaustive test cases outside the previous base test set are
+    ## new
+    exhaustive_cases, converted_exhaustive_cases = \
+        exhaustive_generator.generate_exhaustive_cases(method_spec, jobs, \
+        None, stats)
+    exhaustive_keys = [CANONICAL_FORM(method_spec, case, converted_case) \
+        for case, converted_case in zip(exhaustive_cases, \
+        converted_exhaustive_cases)]
+
+    seen = set(previous_keys)
+    idxs = [idx for idx in xrange(len(exhaustive_cases)) \
+        if exhaustive_keys[idx] not in seen]
+    new_exhaustive_cases = [exhaustive_cases[idx] for idx in idxs]
+    new_converted_exhaustive_cases = [converted_exhaustive_cases[idx] \
+        for idx in idxs]
+
+    ## Previous test cases outside the exhaustive domain count towards the 
+    ## [num random]; the new ones are drawn from different streams than the
+    ## previous ones, which would mostly be duplicates
+    exhaustive_keys = set(exhaustive_keys)
+    num_randomized = len([key for key in previous_keys \
+        if key not in exhaustive_keys])
+    if seed is not None:
+        seed += len(previous_cases)
+
+    new_randomized_cases, new_converted_randomized_cases = \
+        randomized_generator.generate_random_cases(method_spec, outfile, \
+        previous_converted_cases + new_converted_exhaustive_cases, seed, jobs, \
+        max(method_spec.RANDOMIZED_BOUND - num_randomized, 0), None, \
+        "random", stats)
+
+    stats["delta"] = {"previous": len(previous_cases), \
+        "exhaustive": len(new_exhaustive_cases), \
+        "randomized": len(new_randomized_cases)}
+
+    ## Write test cases to file
+    f = open(outfile, "w")
+    f.write("EXHAUSTIVE_CASES = ")
+    f.write(repr(previous["EXHAUSTIVE_CASES"]))
+    f.write("\n")
+    f.write("RANDOMIZED_CASES = ")
+    f.write(repr(previous["RANDOMIZED_CASES"]))
+    f.write("\n")
+    f.write("APPENDED_CASES = ")
+    f.write(repr(previous.get("APPENDED_CASES", []) + new_exhaustive_cases \
+        + new_randomized_cases))
+    f.write("\n")
+    f.write("NUM_PREVIOUS = " + str(len(previous_cases)))
+    f.close()
+
+    ## Return the Python object version
+    return previous_converted_cases + new_converted_exhaustive_cases \
+        + new_converted_randomized_cases
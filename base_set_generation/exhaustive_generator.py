@@ -16,13 +16,34 @@ You should have received a copy of the GNU General Public License along with
 Testception. If not, see <http://www.gnu.org/licenses/>.
 """
 
-import method_spec
+import itertools
+import multiprocessing
+import random
+import time
+
+import randomized_generator
 from test_case_generator import *
 
+## Method spec that a worker process enumerates shards of (see _init_worker)
+_WORKER = {}
+
+## Maximum number of shards the exhaustive domain is split into when it is
+## enumerated across worker processes
+MAX_SHARDS = 64
+
+## Number of test cases taken through each stage of validation at a time, so
+## that the stages can be timed separately without timing every test case
+CHUNK_SIZE = 1000
+
+## When generating within a bound, the largest multiple of the bound that the
+## estimated size of the exhaustive domain can be and still be enumerated 
+## (and then subsampled down to the bound) rather than sampled directly
+ENUMERATION_FACTOR = 10
+
 ###---------------------------------------------------
 ### TYPE-SPECIFIC PROCESSING:
 ###---------------------------------------------------
-def _process_class(subtypes, subvals, idx, variables):
+def _process_class(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the class instance
     parameter specified by the inputs.
@@ -39,7 +60,7 @@ def _process_class(subtypes, subvals, idx, variables):
     ## Recursively exhaustively generate values for all fields in this
     ## class object
     field_possible_args = process_types_rec(all_field_types, \
-        all_field_vals, variables, PROCESS_FXNS)
+        all_field_vals, variables, PROCESS_FXNS, stats)
 
     ## Recursively generate all combinations of fields for this 
     ## object; these combinations will in turn serve as all possible 
@@ -47,14 +68,14 @@ def _process_class(subtypes, subvals, idx, variables):
     field_arg_lists = []
     field_idx = 0
     generate_arg_lists(field_possible_args, field_idx, \
-        field_arg_lists, variables)
+        field_arg_lists, variables, stats, "possible_args")
 
     ## Separate varnames from fields
     possible_varnames = [arg_list[0] for arg_list in field_arg_lists]
     field_arg_lists = [arg_list[1] for arg_list in field_arg_lists]
     return possible_varnames, field_arg_lists
 
-def _process_int(subtypes, subvals, idx, variables):
+def _process_int(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the int parameter 
     specified by the inputs.
@@ -66,7 +87,7 @@ def _process_int(subtypes, subvals, idx, variables):
         possible_args)
     return possible_varnames, possible_args
 
-def _process_bol(subtypes, subvals, idx, variables):
+def _process_bol(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the bool parameter 
     specified by the inputs.
@@ -78,7 +99,7 @@ def _process_bol(subtypes, subvals, idx, variables):
         possible_args)
     return possible_varnames, possible_args
 
-def _process_flt(subtypes, subvals, idx, variables):
+def _process_flt(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the float parameter 
     specified by the inputs.
@@ -95,7 +116,7 @@ def _process_flt(subtypes, subvals, idx, variables):
         possible_vals)
     return possible_varnames, possible_vals
 
-def _process_str(subtypes, subvals, idx, variables):
+def _process_str(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the str parameter 
     specified by the inputs.
@@ -105,31 +126,7 @@ def _process_str(subtypes, subvals, idx, variables):
     if type(subvals[idx]) == type(xrange(0)):
 
         ## Get the character domain
-        if not keywords:
-            ## Default to everything
-            domain = string.printable
-
-        elif LOWER in keywords:
-            domain = string.lowercase
-
-        elif UPPER in keywords:
-            domain = string.uppercase
-
-        elif LETTERS in keywords:
-            domain = string.letters
-
-        elif DIGITS in keywords:
-            domain = string.digits
-
-        elif HEXDIGITS in keywords:
-            domain = string.hexdigits
-
-        elif keywords[0][0] == "\"" and keywords[0][-1] == "\"": 
-            ## Explicit domain as a string of characters
-            domain = keywords[0][1:-1]
-
-        else:
-            raise ValueError
+        domain = STR_DOMAIN(keywords)
 
     ## Get all permutations of these characters within the specified range
     ## of lengths
@@ -148,7 +145,8 @@ def _process_str(subtypes, subvals, idx, variables):
         lambda x: len(x))
     return possible_varnames, opts
 
-def _process_tup(subtypes, subvals, idx, variables, typestr="tuple"):
+def _process_tup(subtypes, subvals, idx, variables, stats, \
+    typestr="tuple"):
     """
     Returns an exhaustive list of possible values for the tuple parameter 
     specified by the inputs. This tuple can be nested arbitrarily deeply.
@@ -170,7 +168,7 @@ def _process_tup(subtypes, subvals, idx, variables, typestr="tuple"):
 
     ## Get the list of all potential elements of this tuple
     nested_varnames, next_vals = next_process_fxn(subtypes, subvals, idx, \
-        variables)
+        variables, stats)
 
     ## Get all permutations of the possible next_vals within the specified 
     ## range of lengths 
@@ -178,30 +176,30 @@ def _process_tup(subtypes, subvals, idx, variables, typestr="tuple"):
     min_length = length_range[0]
     perms, perm_varnames = _create_tup_perms(max_length, min_length, \
         base_varname, varrange, next_vals, nested_varnames, keywords, \
-        varname, typestr)
-    perms = [(perm[0], perm[1]) for perm in perms]
+        varname, typestr, stats)
+    perms = [(typestr, perm[0]) for perm in perms]
 
     return perm_varnames, perms
 
-def _process_lst(subtypes, subvals, idx, variables):
+def _process_lst(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the list parameter 
     specified by the inputs. This list can be nested arbitrarily deeply.
     """
     perm_varnames, perms = _process_tup(subtypes, subvals, idx, variables, \
-        "list")
+        stats, "list")
     return perm_varnames, perms
 
-def _process_set(subtypes, subvals, idx, variables):
+def _process_set(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the set parameter 
     specified by the inputs. This set can be nested arbitrarily deeply.
     """
     perm_varnames, perms = _process_tup(subtypes, subvals, idx, variables, \
-        "set")
+        stats, "set")
     return perm_varnames, perms
 
-def _process_dic(subtypes, subvals, idx, variables):
+def _process_dic(subtypes, subvals, idx, variables, stats):
     """
     Returns an exhaustive list of possible values for the dict parameter 
     specified by the inputs. This dict can be nested arbitrarily deeply.
@@ -235,9 +233,9 @@ def _process_dic(subtypes, subvals, idx, variables):
     ## For each of the keys and vals, dispatch to the appropriate 
     ## type-specific processing function
     nested_key_varnames, possible_keys = first_key_process_fxn(key_subtypes, \
-        key_subvals, 0, variables)
+        key_subvals, 0, variables, stats)
     nested_val_varnames, possible_vals = first_val_process_fxn(val_subtypes, \
-        val_subvals, 0, variables)
+        val_subvals, 0, variables, stats)
 
     ## Get all permutations of the possible keys and vals within the
     ## specified range of lengths 
@@ -245,11 +243,11 @@ def _process_dic(subtypes, subvals, idx, variables):
     min_length = length_range[0]
     perms, perm_varnames = _create_dict_perms(max_length, min_length, \
         base_varname, varrange, possible_keys, possible_vals, \
-        nested_key_varnames, nested_val_varnames, keywords, varname)
+        nested_key_varnames, nested_val_varnames, keywords, varname, \
+        stats)
 
-    dict_perms = [(adict[0], (adict[1],)) for adict in perms]
+    dict_perms = [("dict", (adict[0],)) for adict in perms]
 
-    ## Convert perms from (keys_tuple, vals_tuple) to {key:val}
     return perm_varnames, dict_perms
 
 ## All available type-specific processing functions, for use by the top-level
@@ -302,31 +300,35 @@ def _create_str_perms(max_length, min_length, domain):
         return all_strs
 
 def _create_tup_perms(max_length, min_length, varname, varrange, next_vals, \
-    nested_varnames, keywords, full_varname, typestr="tuple"):
+    nested_varnames, keywords, full_varname, typestr, stats=None):
     """
     Helper function for _process_tup (and _process_lst, and process_set): 
     finds and returns all permutations of the elements in next_vals such that 
     a) the result is valid according to the given keywords and b) the length 
     of the result is some l such that min_length <= l <= max_length.
+
+    Each permutation is a pair of (tuple of elements, bindings). Given stage
+    stats (see STAGE), the number of permutations pruned for inconsistent
+    variable usage is added to its "possible_args" stage.
     """
     ## First, get all permutations up to the max length
     perms, perm_varnames = _create_tup_perms_helper(max_length, min_length, \
         varname, varrange, next_vals, nested_varnames, keywords, \
-        full_varname, typestr)
+        full_varname, typestr, stats)
 
     final_perms = []
     final_varnames = []
 
     ## Second, filter out anything that's too short
     for i in range(len(perms)):
-        if len(perms[i][1]) >= min_length:
+        if len(perms[i][0]) >= min_length:
             final_perms.append(perms[i])
             final_varnames.append(perm_varnames[i])
 
     return final_perms, final_varnames
 
 def _create_tup_perms_helper(max_length, min_length, varname, varrange, \
-    next_vals, nested_varnames, keywords, full_varname, typestr):
+    next_vals, nested_varnames, keywords, full_varname, typestr, stats):
     """
     Helper function for _create_tup_perms: finds and returns all permutations 
     of the elements in next_vals such that a) the result is valid according 
@@ -337,9 +339,9 @@ def _create_tup_perms_helper(max_length, min_length, varname, varrange, \
 
         ## Base case: the only zero-length option is an empty tuple
         if varrange:
-            keys = [(typestr, (), ((varname, length),)) for length in varrange]
+            keys = [((), ((varname, length),)) for length in varrange]
         else:
-            keys = [(typestr, (), ((None, 0),))]
+            keys = [((), ((None, 0),))]
 
     else:
         ## Recursive case: find all valid tuples of length l such that 
@@ -350,18 +352,19 @@ def _create_tup_perms_helper(max_length, min_length, varname, varrange, \
         ## min_length <= l <= max_length - 1
         shorter_tups, dummy = _create_tup_perms_helper(max_length - 1, \
             min_length, varname, varrange, next_vals, nested_varnames, \
-            keywords, full_varname, typestr)
+            keywords, full_varname, typestr, stats)
 
         ## Exhaustively append one element (from next_vals) to each option, 
         ## and then include both the pre- and post-extended versions of the 
         ## tuples to all_tups
+        num_pruned = 0
         for tup in shorter_tups:
 
             ## Add the tuple itself
-            if tup not in all_tups and len(tup[1]) >= min_length:
+            if tup not in all_tups and len(tup[0]) >= min_length:
                 all_tups[tup] = True
 
-            tup_varnames = tup[2]
+            tup_elems, tup_varnames = tup
 
             ## Add all expansions of this tuple
             for i in range(len(next_vals)):
@@ -370,55 +373,36 @@ def _create_tup_perms_helper(max_length, min_length, varname, varrange, \
                 elem = next_vals[i]
                 elem_varnames = nested_varnames[i]
 
-                ## ...but only if this elem's variable's value is consistent 
-                ## with all other elements already in the tuple...
+                ## ...but only if it's sorted, if requested...
+                if not ((typestr != "set" and SORTED not in keywords) \
+                    or len(tup_elems) == 0 or (SORTED in keywords and \
+                    elem >= tup_elems[-1]) or (typestr == "set" and \
+                    elem > tup_elems[-1])):
+                    continue
+
+                ## ...and only if this elem's variable's value is consistent 
+                ## with all other elements already in the tuple; for a 
+                ## range, check all possible values (at most one can be 
+                ## valid)
                 if type(elem_varnames) == type([]):
-
-                    ## Range: check all possible values; at most one can be 
-                    ## valid
-                    for elem_varname_opt in elem_varnames:
-                        useme, combined_varnames = check_against_others( \
-                            tup_varnames, elem_varname_opt)
-
-                        if useme:
-                            ## Construct a new tuple that results from adding elem to tup
-                            expanded_tup = tup[1] + tuple([elem])
-                            potential_key = (tup[0], expanded_tup, combined_varnames)
-
-                            ## ...and also only if it's unique...
-                            if potential_key not in all_tups:
-
-                                ## ...and sorted, if requested!
-                                if (typestr != "set" and SORTED not in \
-                                    keywords) or len(tup[1]) == 0 or \
-                                    (SORTED in keywords and elem >= tup[1][-1]) or \
-                                    (typestr == "set" and elem > tup[1][-1]):
-                                    all_tups[potential_key] = True
-
+                    elem_varname_opts = elem_varnames
                 else:
-
-                    ## Absolute variable value
-                    useme, combined_varnames = check_against_others(\
-                        tup_varnames, elem_varnames)
-
-                    if not useme:
-                        ## (name, val) mismatch
-                        continue
-
-                    ## Construct a new tuple that results from adding elem to tup
-                    expanded_tup = tup[1] + tuple([elem])
-                    potential_key = (tup[0], expanded_tup, combined_varnames)
-
-                    ## ...and also only if it's unique...
-                    if potential_key not in all_tups:
-
-                        ## ...and sorted, if requested!
-                        if (typestr != "set" and SORTED not in \
-                            keywords) or len(tup[1]) == 0 or \
-                            (SORTED in keywords and elem >= tup[1][-1]) or \
-                            (typestr == "set" and elem > tup[1][-1]):
-                            all_tups[potential_key] = True
-
+                    elem_varname_opts = [elem_varnames]
+
+                for elem_varname_opt in elem_varname_opts:
+                    useme, combined_varnames = check_against_others( \
+                        tup_varnames, elem_varname_opt)
+
+                    if useme:
+                        ## Construct a new tuple that results from adding 
+                        ## elem to tup
+                        all_tups[(tup_elems + (elem,), \
+                            combined_varnames)] = True
+                    else:
+                        num_pruned += 1
+
+        if stats is not None:
+            STAGE_COUNT(stats, "possible_args", "pruned", num_pruned)
         keys = all_tups.keys()
 
     ## Filter the tuples we created according to variable usage
@@ -426,9 +410,9 @@ def _create_tup_perms_helper(max_length, min_length, varname, varrange, \
 
     for tup in keys:
         ## Actual length of the created tuple
-        length = len(tup[1])
+        length = len(tup[0])
 
-        for var in tup[2]:
+        for var in tup[1]:
             ## val = claimed length of the created tuple
             name, val = var
             if name == varname:
@@ -442,30 +426,36 @@ def _create_tup_perms_helper(max_length, min_length, varname, varrange, \
             and val <= length) or (val >= length)):
             filtered_keys.append(tup)
 
-    tup_varnames = [tup[2] for tup in filtered_keys]
+    tup_varnames = [tup[1] for tup in filtered_keys]
     return filtered_keys, tup_varnames
 
 def _create_dict_perms(max_length, min_length, varname, varrange, \
     possible_keys, possible_vals, nested_key_varnames, nested_val_varnames, \
-    keywords, full_varname):
+    keywords, full_varname, stats=None):
     """
     Helper function for _process_dict: finds and returns all permutations of 
     (key, val) pairs composed from possible_keys and possible_vals such that 
     a) the result is valid according to the given keywords and varnames and 
     b) the length of the result is some l such that min_length <= l <= 
     max_length.
+
+    Each permutation is a pair of ((tuple of keys, tuple of vals), 
+    bindings). Given stage stats (see STAGE), the number of permutations 
+    pruned for inconsistent variable usage is added to its "possible_args" 
+    stage.
     """
     ## First, get all permutations up to the max length
     perms, perm_varnames = _create_dict_perms_helper(max_length, min_length, \
         varname, varrange, possible_keys, possible_vals, \
-        nested_key_varnames, nested_val_varnames, keywords, full_varname)
+        nested_key_varnames, nested_val_varnames, keywords, full_varname, \
+        stats)
 
     final_perms = []
     final_varnames = []
 
     ## Second, filter out anything that's too short
     for i in range(len(perms)):
-        if len(perms[i][1][0]) >= min_length:
+        if len(perms[i][0][0]) >= min_length:
             final_perms.append(perms[i])
             final_varnames.append(perm_varnames[i])
 
@@ -473,7 +463,7 @@ def _create_dict_perms(max_length, min_length, varname, varrange, \
 
 def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
     possible_keys, possible_vals, nested_key_varnames, nested_val_varnames, \
-    keywords, full_varname):
+    keywords, full_varname, stats):
     """
     Helper function for _process_dict: finds and returns all permutations of 
     (key, val) pairs composed from possible_keys and possible_vals such that 
@@ -487,10 +477,9 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
         ## hashable, so that we can construct these permutations relatively 
         ## quickly
         if varrange:
-            keys = [("dict", ((), ()), ((varname, size),)) \
-                for size in varrange]
+            keys = [(((), ()), ((varname, size),)) for size in varrange]
         else:
-            keys = [("dict", ((), ()), ((None, 0),))]
+            keys = [(((), ()), ((None, 0),))]
 
     else:
         ## Recursive case: find all valid dictionaries of length l such that 
@@ -501,18 +490,20 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
         ## min_length <= l <= max_length - 1
         shorter_dicts, dummy = _create_dict_perms_helper(max_length - 1, \
             min_length, varname, varrange, possible_keys, possible_vals, \
-            nested_key_varnames, nested_val_varnames, keywords, full_varname)
+            nested_key_varnames, nested_val_varnames, keywords, full_varname, \
+            stats)
 
         ## Exhaustively append one element (from next_vals) to each option, 
         ## and then include both the pre- and post-extended versions of the 
         ## tuples to all_tups
+        num_pruned = 0
         for adict in shorter_dicts:
 
             ## Add the dict itself
             if adict not in all_dicts:
                 all_dicts[adict] = True
 
-            dict_varnames = adict[2]
+            dict_varnames = adict[1]
 
             ## Add all extensions to the dict
             for i in range(len(possible_keys)):
@@ -531,6 +522,7 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
 
                         if not useme:
                             ## (name, val) mismatch
+                            num_pruned += 1
                             continue
 
                         ## Valid key; try all possible vals to go with it
@@ -551,6 +543,8 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
                                     if useme:
                                         add_to_dict(all_dicts, adict, key_elem, \
                                             val_elem, new_combined_varnames)
+                                    else:
+                                        num_pruned += 1
 
                             else:
                                 ## Compare val names to shorter dict names 
@@ -561,6 +555,8 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
                                 if useme:
                                     add_to_dict(all_dicts, adict, key_elem, \
                                         val_elem, new_combined_varnames)
+                                else:
+                                    num_pruned += 1
                            
 
                 else:
@@ -572,6 +568,7 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
 
                     if not useme:
                         ## (name, val) mismatch
+                        num_pruned += 1
                         continue
 
                     ## Valid key; try all possible vals to go with it
@@ -592,6 +589,8 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
                                 if useme:
                                     add_to_dict(all_dicts, adict, key_elem, \
                                         val_elem, new_combined_varnames)
+                                else:
+                                    num_pruned += 1
 
                         else:
                             ## Compare val names to shorter dict names 
@@ -602,7 +601,11 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
                             if useme:
                                 add_to_dict(all_dicts, adict, key_elem, \
                                     val_elem, new_combined_varnames)
+                            else:
+                                num_pruned += 1
 
+        if stats is not None:
+            STAGE_COUNT(stats, "possible_args", "pruned", num_pruned)
         keys = all_dicts.keys()
 
     ## Filter the dicts we created according to variable usage
@@ -610,9 +613,9 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
 
     for adict in keys:
         ## Actual length of the created tuple
-        length = len(adict[1][0])
+        length = len(adict[0][0])
 
-        for var in adict[2]:
+        for var in adict[1]:
             ## val = claimed length of the created tuple
             name, val = var
             if name == varname:
@@ -626,7 +629,7 @@ def _create_dict_perms_helper(max_length, min_length, varname, varrange, \
             and val <= length) or (val >= length)):
             filtered_keys.append(adict)
 
-    dict_varnames = [adict[2] for adict in filtered_keys]
+    dict_varnames = [adict[1] for adict in filtered_keys]
     return filtered_keys, dict_varnames
 
 def add_to_dict(all_dicts, adict, key_elem, val_elem, combined_varnames):
@@ -634,18 +637,18 @@ def add_to_dict(all_dicts, adict, key_elem, val_elem, combined_varnames):
     Helper function for adding a single expanded permutation 
     (adict + (key_elem, val_elem)) to the set of all dict permutations.
     """
+    keys, vals = adict[0]
+
     ## Since order doesn't matter for dictionaries, maintain 
     ## the keys in sorted order; otherwise we'll end up with 
     ## duplicates. Also, use > rather than >= so as to enforce
     ## uniqueness of keys within a single dictionary.
-    if len(adict[1][0]) == 0 or key_elem > adict[1][0][-1]:
+    if len(keys) == 0 or key_elem > keys[-1]:
 
         ## Construct the new dict that results from adding 
         ## (key_elem, val_elem) to adict
-        expanded_dict = ((adict[1][0] + tuple([key_elem])), \
-            (adict[1][1] + tuple([val_elem])))
-        potential_key = ("dict", expanded_dict, \
-            combined_varnames)
+        expanded_dict = (keys + (key_elem,), vals + (val_elem,))
+        potential_key = (expanded_dict, combined_varnames)
 
         if potential_key not in all_dicts:
             all_dicts[potential_key] = True
@@ -653,37 +656,274 @@ def add_to_dict(all_dicts, adict, key_elem, val_elem, combined_varnames):
 ###---------------------------------------------------
 ### TOP-LEVEL PROCESSING:
 ###---------------------------------------------------
-def generate_exhaustive_cases():
+def _shards(possible_args):
+    """
+    Splits the given possible args for each parameter (as returned by 
+    process_types_rec) into shards that create disjoint sets of arg lists, by
+    the possible values of the first parameter: each shard keeps one run of 
+    them, up to MAX_SHARDS runs, with any repeated value kept within a single
+    shard. Returns the shards in order, as possible args of the same form.
+    """
+    varnames, opts = possible_args[0]
+
+    ## Group the indices of the first parameter's possible values by value,
+    ## in order of first appearance
+    groups = {}
+    order = []
+    for idx in range(len(opts)):
+        if opts[idx] not in groups:
+            groups[opts[idx]] = []
+            order.append(opts[idx])
+        groups[opts[idx]].append(idx)
+
+    num_shards = max(min(len(order), MAX_SHARDS), 1)
+    shards = []
+    for shard_idx in range(num_shards):
+        idxs = []
+        for opt in order[len(order) * shard_idx / num_shards: \
+            len(order) * (shard_idx + 1) / num_shards]:
+            idxs += groups[opt]
+
+        shards.append([([varnames[idx] for idx in idxs], \
+            [opts[idx] for idx in idxs])] + possible_args[1:])
+
+    return shards
+
+def _enumerate_shard(method_spec, types, possible_args, keep_converted=True, \
+    deadline=None):
     """
-    Exhaustively generate test cases.
+    Creates and validates the test cases from the given possible args (or
+    shard of them, see _shards) of the given method spec, keeping only the 
+    first test case of each equivalence class if it has a [canonical form]. 
+    Stops early, a chunk short of the rest, once the deadline (if any) has 
+    passed.
+    Returns the test cases, their class-converted versions (or None, unless 
+    keep_converted), the canonical forms of the test cases (or None, without
+    a [canonical form]), the number of valid test cases, whether the shard 
+    was enumerated in full, and the stage stats (see STAGE) of doing so.
     """
-    ## Generate unfiltered set test cases
-    exhaustive_cases = process_types(method_spec, \
-        CONVERT_TYPES(method_spec.TYPES), \
-        method_spec.EXHAUSTIVE_VALS, method_spec.VARS, PROCESS_FXNS)
+    stats = {}
+    start_time = time.time()
+    arg_lists = combine_args(possible_args, method_spec.VARS, stats)
+    start_time = STAGE_TIME(stats, "combine", start_time)
+
+    ## Cases are only converted a chunk at a time, as they are filtered below
+    exhaustive_cases = expand_arg_lists_iter(method_spec, types, arg_lists)
+
+    ## Without any classes, the two formats below are one and the same, so
+    ## there's no need to keep separate copies of each case
+    has_classes = CONTAINS_CLASSES(method_spec, method_spec.TYPES)
+    convert_classes = GET_CLASS_CONVERTER(method_spec, method_spec.TYPES)
+    unconvert_classes = GET_CLASS_UNCONVERTER(method_spec, method_spec.TYPES)
 
     ## Filter the test cases using the validation function; in doing so,
     ## convert all of the tuples of fields to actual class objects
     final_test_cases = []
     final_converted_test_cases = []
-    for test_case in exhaustive_cases:
+
+    ## Canonical forms of the test cases kept so far, and the number of valid
+    ## test cases, when keeping one test case per equivalence class
+    seen = set()
+    keys = []
+    num_valid = 0
+    complete = True
+    while True:
+        start_time = time.time()
+        if deadline is not None and start_time > deadline:
+            complete = False
+            break
+        chunk = list(itertools.islice(exhaustive_cases, CHUNK_SIZE))
+        if not chunk:
+            break
+        if not has_classes:
+            chunk = [tuple(test_case) for test_case in chunk]
+        start_time = STAGE_TIME(stats, "expand", start_time)
 
         ## Instantiate any classes (leaving it to the last minute here so 
         ## that we still have a serializable version to write to file)
-        class_converted_args = CONVERT_CLASSES(method_spec, test_case, 
-            method_spec.TYPES)
+        if has_classes:
+            chunk = [convert_classes(test_case) for test_case in chunk]
+            start_time = STAGE_TIME(stats, "convert_classes", start_time)
+
+        ## Perform validation; only keep the test cases that pass
+        valid_chunk = [class_converted_args for class_converted_args \
+            in chunk if method_spec.evalidation_fxn(class_converted_args)]
+        STAGE_COUNT(stats, "validate", "candidates", len(chunk))
+        STAGE_COUNT(stats, "validate", "rejected", \
+            len(chunk) - len(valid_chunk))
+        start_time = STAGE_TIME(stats, "validate", start_time)
+
+        ## Regenerate the non-class version of the test cases, in case our
+        ## validation function mutated them
+        if has_classes:
+            test_cases = [unconvert_classes(class_converted_args) \
+                for class_converted_args in valid_chunk]
+            start_time = STAGE_TIME(stats, "convert_classes", start_time)
+        else:
+            test_cases = valid_chunk
+
+        num_valid += len(valid_chunk)
+        for test_case, class_converted_args in zip(test_cases, valid_chunk):
+
+            ## Only keep the first test case of its equivalence class
+            if method_spec.canonical_fxn:
+                key = CANONICAL_FORM(method_spec, test_case, \
+                    class_converted_args)
+                if key in seen:
+                    STAGE_COUNT(stats, "canonical", "duplicates")
+                    continue
+                seen.add(key)
+                keys.append(key)
+
+            final_test_cases.append(test_case)
+            if keep_converted:
+                final_converted_test_cases.append(class_converted_args)
+
+        if method_spec.canonical_fxn:
+            STAGE_TIME(stats, "canonical", start_time)
+
+    if not keep_converted:
+        final_converted_test_cases = None
+    if not method_spec.canonical_fxn:
+        keys = None
+
+    return final_test_cases, final_converted_test_cases, keys, num_valid, \
+        complete, stats
+
+def _init_worker(method_spec, types, shards, deadline):
+    """
+    Initializes a worker process to enumerate the given shards of the given
+    method spec by the given deadline; these are inherited rather than 
+    pickled.
+    """
+    _WORKER["method_spec"] = method_spec
+    _WORKER["types"] = types
+    _WORKER["shards"] = shards
+    _WORKER["deadline"] = deadline
+
+def _enumerate_worker_shard(shard_idx):
+    """
+    Enumerates the shard with the given index (see _enumerate_shard) in a 
+    worker process; class objects are left for the parent process to 
+    instantiate, rather than pickled.
+    """
+    return _enumerate_shard(_WORKER["method_spec"], _WORKER["types"], \
+        _WORKER["shards"][shard_idx], False, _WORKER["deadline"])
 
-        ## Perform validation; only add this test case if it passes
-        if not method_spec.evalidation_fxn(class_converted_args):
-            continue
+def generate_exhaustive_cases(method_spec, jobs=1, deadline=None, \
+    stats=None):
+    """
+    Exhaustively generate test cases for the given method spec (or a 
+    covering array of them, if the config file specifies a [combination 
+    strength]). The possible args are split into shards (see _shards) that 
+    are enumerated and validated in order, across jobs worker processes if
+    jobs is more than 1; the test cases are the same for any number of jobs.
+    If the deadline (if any) passes first, enumeration stops there, keeping 
+    only the test cases found so far.
+
+    Counters and timings for each stage are added to the "exhaustive" stage
+    stats (see STAGE) in the given stats, if any. Given a [canonical form], 
+    the number of valid test cases and the number of equivalence classes 
+    they were collapsed to are left in its "canonical" entry; given a 
+    [combination strength], the sizes of the test set before and after 
+    selecting a covering array are left in its "covering" entry.
+    """
+    if stats is None:
+        stats = {}
+    stage_stats = stats.setdefault("exhaustive", {})
+
+    ## Generate the possible args for each parameter
+    start_time = time.time()
+    types = CONVERT_TYPES(method_spec.TYPES)
+    possible_args = process_types_rec(types, method_spec.EXHAUSTIVE_VALS, \
+        method_spec.VARS, PROCESS_FXNS, stage_stats)
+    shards = _shards(possible_args)
+
+    STAGE_COUNT(stage_stats, "possible_args", "candidates", \
+        sum([len(opts) for dummy, opts in possible_args]))
+    STAGE_TIME(stage_stats, "possible_args", start_time)
+
+    ## Worker processes are forked only now, so that they inherit the shards
+    pool = None
+    if jobs > 1 and len(shards) > 1:
+        pool = multiprocessing.Pool(jobs, _init_worker, (method_spec, types, \
+            shards, deadline))
+        results = pool.imap(_enumerate_worker_shard, range(len(shards)))
+    else:
+        results = (_enumerate_shard(method_spec, types, shard, True, \
+            deadline) for shard in shards)
 
-        ## Regenerate the non-class version of the test case, in case our
-        ## validation function mutated it
-        test_case = UNCONVERT_CLASSES(method_spec, class_converted_args, 
-            method_spec.TYPES)
+    has_classes = CONTAINS_CLASSES(method_spec, method_spec.TYPES)
+    convert_classes = GET_CLASS_CONVERTER(method_spec, method_spec.TYPES)
 
-        final_test_cases.append(test_case)
-        final_converted_test_cases.append(class_converted_args)
+    ## Merge the shards, keeping only the first test case of each 
+    ## equivalence class across all of them
+    final_test_cases = []
+    final_converted_test_cases = []
+    seen = set()
+    num_valid = 0
+    complete = True
+    ## Reap the worker processes even if a worker or the merge fails
+    try:
+        for test_cases, converted_test_cases, keys, shard_valid, \
+            shard_complete, shard_stats in results:
+            start_time = time.time()
+            MERGE_STAGE_STATS(stage_stats, shard_stats)
+            num_valid += shard_valid
+            complete = complete and shard_complete
+
+            if converted_test_cases is None:
+                if has_classes:
+                    converted_test_cases = [convert_classes(test_case) \
+                        for test_case in test_cases]
+                    start_time = STAGE_TIME(stage_stats, "convert_classes", \
+                        start_time)
+                else:
+                    converted_test_cases = test_cases
+
+            if keys is None:
+                final_test_cases += test_cases
+                final_converted_test_cases += converted_test_cases
+                continue
+
+            for test_case, converted_test_case, key in zip(test_cases, \
+                converted_test_cases, keys):
+                if key not in seen:
+                    seen.add(key)
+                    final_test_cases.append(test_case)
+                    final_converted_test_cases.append(converted_test_case)
+                else:
+                    STAGE_COUNT(stage_stats, "canonical", "duplicates")
+            STAGE_TIME(stage_stats, "canonical", start_time)
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    if not complete:
+        print " WARNING: ran out of time, with only " \
+            + str(len(final_test_cases)) + " test cases enumerated from the " \
+            + "exhaustive domain"
+
+    if method_spec.canonical_fxn:
+        stats["canonical"] = {"valid": num_valid, \
+            "canonical": len(final_test_cases)}
+
+    ## Keep only a covering array of the requested strength, rather than the
+    ## full product across parameters
+    if method_spec.STRENGTH:
+        start_time = time.time()
+        idxs = COVERING_SUBSET(final_test_cases, method_spec.STRENGTH)
+        stats["covering"] = {"strength": method_spec.STRENGTH, \
+            "full": len(final_test_cases), "selected": len(idxs)}
+
+        final_test_cases = [final_test_cases[idx] for idx in idxs]
+        final_converted_test_cases = [final_converted_test_cases[idx] \
+            for idx in idxs]
+
+        STAGE_COUNT(stage_stats, "covering", "dropped", \
+            stats["covering"]["full"] - stats["covering"]["selected"])
+        STAGE_TIME(stage_stats, "covering", start_time)
 
     ## Print the results
     #for test_case in final_converted_test_cases:
@@ -694,17 +934,96 @@ def generate_exhaustive_cases():
     ## to be passed to the next stage in the pipeline
     return final_test_cases, final_converted_test_cases
 
-def gen_write_exhaustive_cases(outfile):
+def gen_write_exhaustive_cases(method_spec, outfile, bound=None, seed=None, \
+    jobs=1, deadline=None, boundary_first=False, stats=None):
     """
-    Exhaustively generate test cases and write the output to a file.
+    Exhaustively generate test cases for the given method spec, across jobs
+    worker processes (see generate_exhaustive_cases), and write the output to
+    a file. 
+    
+    If given a bound, at most that many test cases are kept: if the exhaustive
+    domain is estimated to be too large to enumerate (see ENUMERATION_FACTOR),
+    a sample is drawn from it directly instead (using the given seed, jobs, 
+    and deadline, as for the randomized test cases); otherwise, it is 
+    enumerated until the deadline, if any, and then subsampled down to the 
+    bound. If boundary_first, the boundary values of the 
+    exhaustive domain (see BOUNDARY_VALS) are sampled first, and only what 
+    remains of the bound (or, without one, the rest of the exhaustive 
+    domain) is filled with other test cases. Counters and 
+    timings are left in the given stats, if any (see 
+    generate_exhaustive_cases and randomized_generator.generate_random_cases).
     """
-    ## Generate test cases
-    test_cases, converted_test_cases = generate_exhaustive_cases()
+    if stats is None:
+        stats = {}
+
+    types = CONVERT_TYPES(method_spec.TYPES)
+    test_cases = []
+    converted_test_cases = []
+
+    ## Generate the boundary test cases first, if requested
+    if boundary_first:
+        boundary_size = ESTIMATE_CARDINALITY(types, BOUNDARY_VALS(types, \
+            method_spec.EXHAUSTIVE_VALS), BOUNDARY_VARS(method_spec.VARS))
+        if bound is not None:
+            boundary_size = min(bound, boundary_size)
+        test_cases, converted_test_cases = \
+            randomized_generator.generate_random_cases(method_spec, \
+            outfile, [], seed, jobs, boundary_size, deadline, "boundary", \
+            stats)
+        if bound is not None:
+            bound -= len(test_cases)
+
+    if bound is None:
+        estimate = 0
+    else:
+        estimate = ESTIMATE_CARDINALITY(types, method_spec.EXHAUSTIVE_VALS, \
+            method_spec.VARS)
+
+    ## Generate (the rest of the) test cases
+    if bound == 0:
+        more_test_cases, more_converted_test_cases = [], []
+
+    elif bound is not None and estimate > ENUMERATION_FACTOR * bound:
+        more_test_cases, more_converted_test_cases = \
+            randomized_generator.generate_random_cases(method_spec, \
+            outfile, converted_test_cases, seed, jobs, bound, deadline, \
+            "exhaustive", stats)
+
+    else:
+        more_test_cases, more_converted_test_cases = \
+            generate_exhaustive_cases(method_spec, jobs, deadline, stats)
+
+        ## Leave out any that were already generated as boundary test cases
+        if test_cases:
+            seen = set([CANONICAL_FORM(method_spec, case, converted_case) \
+                for case, converted_case in zip(test_cases, \
+                converted_test_cases)])
+            idxs = [idx for idx in xrange(len(more_test_cases)) \
+                if CANONICAL_FORM(method_spec, more_test_cases[idx], \
+                more_converted_test_cases[idx]) not in seen]
+            more_test_cases = [more_test_cases[idx] for idx in idxs]
+            more_converted_test_cases = [more_converted_test_cases[idx] \
+                for idx in idxs]
+
+        ## Subsample down to the bound, keeping the original order
+        if bound is not None and len(more_test_cases) > bound:
+            idxs = sorted(random.Random(seed).sample( \
+                xrange(len(more_test_cases)), bound))
+            more_test_cases = [more_test_cases[idx] for idx in idxs]
+            more_converted_test_cases = [more_converted_test_cases[idx] \
+                for idx in idxs]
+
+    test_cases += more_test_cases
+    converted_test_cases += more_converted_test_cases
 
     ## Write test cases to file
+    start_time = time.time()
     f = open(outfile, "w")
-    f.write("EXHAUSTIVE_CASES = " + repr(test_cases) + "\n")
+    f.write("EXHAUSTIVE_CASES = ")
+    f.write(repr(test_cases))
+    f.write("\n")
     f.close()
+    STAGE_TIME(stats.setdefault("exhaustive", {}), "write", start_time)
 
     ## Return the Python object version
     return converted_test_cases
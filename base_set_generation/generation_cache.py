@@ -0,0 +1,144 @@
+"""
+Copyright 2015-2017 Rebecca Smith, Terry Tang, Joe Warren, and Scott Rixner
+
+This file is part of Testception.
+
+Testception is free software: you can redistribute it and/or modify it under 
+the terms of the GNU General Public License as published by the Free Software 
+Foundation, either version 3 of the License, or (at your option) any later 
+version.
+
+Testception is distributed in the hope that it will be useful, but WITHOUT ANY 
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR 
+A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with 
+Testception. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import os
+
+import config_file_parser
+
+## Paths for the generator's own source files and the cached base test sets
+CWD = os.path.dirname(os.path.realpath(__file__))
+CACHE_DIR = CWD + "/cache"
+
+## Source files of the generator itself, so that changes to it invalidate
+## the cache
+GENERATOR_FILES = ["bsg_globals.py", "config_file_parser.py", \
+    "coverage_selector.py", "delta_generator.py", "exhaustive_generator.py", \
+    "randomized_generator.py", "test_case_generator.py"]
+
+## Fields of the method spec that a base test set can be extended across 
+## (see generation_key)
+DOMAIN_FIELDS = ["EXHAUSTIVE_VALS", "RANDOMIZED_VALS", "VARS", \
+    "RANDOMIZED_BOUND"]
+
+def _read(path):
+    """
+    Returns the contents of the file at the given path, or "" if there is no
+    such file.
+    """
+    if not os.path.isfile(path):
+        return ""
+
+    f = open(path)
+    contents = f.read()
+    f.close()
+    return contents
+
+def _module_source(module):
+    """
+    Returns the source of the given module, or "" if it has no source file.
+    """
+    path = getattr(module, "__file__", None)
+    if not path:
+        return ""
+
+    if path.endswith((".pyc", ".pyo")):
+        path = path[:-1]
+    return _read(path)
+
+def cache_key(method_spec, projdir, options, exclude=()):
+    """
+    Returns the key under which to cache the base test set generated from 
+    the given method spec (see config_file_parser.MethodSpec) with the given
+    options: a hash of the parsed config (other than any fields in exclude),
+    the source of every module it imports validation functions and 
+    constructors from, wherever they were found, the reference solution in
+    projdir, the generator itself, and the options. The paths the modules
+    are imported from are left out, so that identical configs share a key 
+    across functions and projects (as long as their solutions are identical,
+    too).
+    """
+    digest = hashlib.sha256()
+    digest.update(method_spec.describe(exclude))
+
+    for module in method_spec.modules:
+        digest.update(_module_source(module))
+
+    digest.update(_read(os.path.join(projdir, "solution.py")))
+    for fname in GENERATOR_FILES:
+        digest.update(_read(CWD + "/" + fname))
+    digest.update(repr(options))
+
+    return digest.hexdigest()
+
+def generation_key(method_spec, projdir, options):
+    """
+    Returns the key that identifies which base test sets can be extended into
+    one another: the same as cache_key, but leaving out the domains and the
+    [num random] from the method spec.
+    """
+    return cache_key(method_spec, projdir, options, DOMAIN_FIELDS)
+
+def load_previous(base_set_path, ms_path):
+    """
+    Returns the contents of the base test set file at base_set_path, along 
+    with the domains and [num random] from the method spec pickled at 
+    ms_path (see config_file_parser.write_method_spec) that it was generated
+    from, as a dict of their names to values; returns None if either file is
+    missing, or the base test set was not generated with a generation key 
+    (see generation_key).
+    """
+    base_set_contents = _read(base_set_path)
+    if "GENERATION_KEY = " not in base_set_contents or \
+        not os.path.isfile(ms_path):
+        return None
+
+    previous = {}
+    exec base_set_contents in previous
+    method_spec = config_file_parser.read_method_spec(ms_path)
+    for field in DOMAIN_FIELDS:
+        previous[field] = getattr(method_spec, field)
+
+    return previous
+
+def load(key):
+    """
+    Returns the contents of the base test set file cached under the given 
+    key, or None on a miss.
+    """
+    path = os.path.join(CACHE_DIR, key + ".py")
+    if not os.path.isfile(path):
+        return None
+
+    return _read(path)
+
+def store(key, base_set_path):
+    """
+    Caches the contents of the base test set file at base_set_path under the
+    given key.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+
+    ## Write to a temporary file first, so that an interrupted write never 
+    ## leaves a truncated entry behind
+    path = os.path.join(CACHE_DIR, key + ".py")
+    f = open(path + ".tmp", "w")
+    f.write(_read(base_set_path))
+    f.close()
+    os.rename(path + ".tmp", path)
@@ -17,15 +17,317 @@ Testception. If not, see <http://www.gnu.org/licenses/>.
 """
 
 import importlib
+import multiprocessing
 import random
+import sys
+import time
 
-import method_spec
 from test_case_generator import *
 
+## Number of candidate test cases generated from each seeded stream
+BATCH_SIZE = 100
+
+## Default budget of attempts per requested random test case, used if the
+## config file doesn't specify [max random attempts]
+ATTEMPTS_PER_CASE = 100
+
+## Number of draws per element allowed when drawing distinct elements from a
+## domain that can't be enumerated
+DRAWS_PER_ELEMENT = 100
+
+## Outcomes of a single attempt at generating a random test case
+ACCEPTED = "accepted"
+INVALID = "invalid"
+DUPLICATE = "duplicate"
+INFEASIBLE = "infeasible"
+
+## Outcome of an attempt that is new, but equivalent to an earlier test case
+## under the config file's [canonical form]
+EQUIVALENT = "equivalent"
+
+## Domains that can be sampled: the random domain, the exhaustive domain, and
+## the boundary values of the exhaustive domain
+DOMAINS = ["random", "exhaustive", "boundary"]
+
+## Kinds of decision points whose choice can be forced by a stratum
+VARIABLE = "variable"
+LENGTH = "length"
+
+## Method spec that a worker process generates batches for (see 
+## _init_worker)
+_WORKER = {}
+
+class InfeasibleError(Exception):
+    """
+    Raised when no random value satisfying the structural constraints (e.g.
+    distinct set elements or dict keys) can be drawn.
+    """
+    pass
+
+###---------------------------------------------------
+### CONSTRAINT-AWARE SAMPLING:
+###---------------------------------------------------
+def _range_constraints(vals, variables, constraints):
+    """
+    Walks the (arbitrarily nested) domain vals, and adds to constraints a 
+    predicate for each range with an endpoint among the given variables, 
+    which holds for the values of that variable that leave the range 
+    non-empty.
+    """
+    if type(vals) == type(""):
+        if vals.count("-") != 1:
+            return
+
+        start, end = tuple([range_end.strip() for range_end in \
+            vals.split("-")])
+
+        try:
+            if end in variables:
+                start = int(start)
+                constraints.setdefault(end, []).append(lambda val, \
+                    start=start: val >= start)
+            elif start in variables:
+                end = int(end)
+                constraints.setdefault(start, []).append(lambda val, \
+                    end=end: val <= end)
+        except ValueError:
+            ## Not a range after all
+            pass
+
+    elif type(vals) == type([]) or type(vals) == type(()):
+        for subvals in vals:
+            _range_constraints(subvals, variables, constraints)
+
+def _referenced_variables(vals, variables, varnames):
+    """
+    Walks the (arbitrarily nested) domain vals, and adds to varnames the name
+    of every one of the given variables it references, whether as a whole 
+    value or as the endpoint of a range.
+    """
+    if type(vals) == type(""):
+        for name in [vals] + [range_end.strip() for range_end in \
+            vals.split("-")]:
+            if name in variables:
+                varnames.add(name)
+
+    elif type(vals) == type([]) or type(vals) == type(()):
+        for subvals in vals:
+            _referenced_variables(subvals, variables, varnames)
+
+def _domain(method_spec, domain):
+    """
+    Returns the values, variable ranges, and validation function of the given
+    domain (one of DOMAINS) of the given method spec to sample from.
+    """
+    if domain == "random":
+        return method_spec.RANDOMIZED_VALS, method_spec.VARS, \
+            method_spec.rvalidation_fxn
+
+    elif domain == "exhaustive":
+        return method_spec.EXHAUSTIVE_VALS, method_spec.VARS, \
+            method_spec.evalidation_fxn
+
+    types = CONVERT_TYPES(method_spec.TYPES)
+    return BOUNDARY_VALS(types, method_spec.EXHAUSTIVE_VALS), \
+        BOUNDARY_VARS(method_spec.VARS), method_spec.evalidation_fxn
+
+def _feasible_variables(vals, variables):
+    """
+    Returns a mapping of each variable name to the values in its range (as
+    given by variables) that keep every range in the domain vals non-empty, 
+    so that the values chosen for the variables are always consistent with
+    the domain.
+    """
+    constraints = {}
+    _range_constraints(vals, variables, constraints)
+
+    feasible = {}
+    for varname, varrange in variables.items():
+        preds = constraints.get(varname, [])
+        feasible[varname] = [val for val in varrange \
+            if all([pred(val) for pred in preds])]
+
+    return feasible
+
+def _choose(point, options, forced, rng):
+    """
+    Returns a random choice from options, drawn from the random stream rng,
+    unless the current stratum forces the choice at this decision point; 
+    forced maps decision points to the values forced there for the current 
+    attempt.
+    """
+    if point in forced and forced[point] in options:
+        return forced[point]
+    return rng.choice(options)
+
+def _strata(types, vals, variables):
+    """
+    Returns the strata of the domain vals (for the given types, as output by
+    CONVERT_TYPES), in a fixed order: one for each value of each variable it
+    references (among those in its range that are consistent with the 
+    domain), and one for each length of each container (or str) whose length
+    range isn't given by a variable, which covers both empty and non-empty 
+    containers. Each stratum maps a single decision point to the value 
+    forced there.
+    """
+    strata = []
+
+    varnames = set()
+    _referenced_variables(vals, variables, varnames)
+
+    feasible_vars = _feasible_variables(vals, variables)
+    for varname in sorted(varnames):
+        for val in feasible_vars[varname]:
+            strata.append({(VARIABLE, varname): val})
+
+    for nested_type, nested_val in zip(types, vals):
+        _length_strata(nested_type, nested_val, 0, strata)
+
+    return strata
+
+def _length_strata(subtypes, subvals, idx, strata):
+    """
+    Helper function for _strata: adds a stratum for each length of each
+    container nested within the type at idx.
+    """
+    subtype, keywords = subtypes[idx]
+
+    is_container = subtype in [list, tuple, set, dict] or \
+        (subtype == str and type(subvals[idx]) == type(xrange(0)))
+
+    ## Lengths given by a variable are already covered by its strata
+    if is_container and type(subvals[idx]) != type(""):
+        for length in subvals[idx]:
+            strata.append({(LENGTH, id(subvals), idx): length})
+
+    if subtype in [list, tuple, set]:
+        _length_strata(subtypes, subvals, idx + 1, strata)
+
+    elif subtype == dict:
+        key_subtypes, val_subtypes = subtypes[idx + 1]
+        key_subvals, val_subvals = subvals[idx + 1]
+        _length_strata(key_subtypes, key_subvals, 0, strata)
+        _length_strata(val_subtypes, val_subvals, 0, strata)
+
+    elif subtype not in PROCESS_FXNS:
+        ## Class: recurse into each field
+        class_name, field_types = subtypes[idx]
+        class_name, field_vals = subvals[idx]
+        for field_type, field_val in zip(field_types, field_vals):
+            _length_strata(field_type[1][0], field_val[1][0], 0, strata)
+
+def domain_size(method_spec, domain="random"):
+    """
+    Returns the (estimated, see ESTIMATE_CARDINALITY) number of distinct test
+    cases in the given domain (one of DOMAINS) of the given method spec, or 
+    None if it is unbounded because floats are sampled from a continuous 
+    range.
+    """
+    types = CONVERT_TYPES(method_spec.TYPES)
+    vals, var_ranges, dummy = _domain(method_spec, domain)
+    for nested_type, nested_val in zip(types, vals):
+        if _continuous(nested_type, nested_val, 0, var_ranges):
+            return None
+
+    return ESTIMATE_CARDINALITY(types, vals, var_ranges)
+
+def _continuous(subtypes, subvals, idx, variables):
+    """
+    Helper function for domain_size: returns True if the type at idx has a
+    float nested within it whose values are given by a range.
+    """
+    subtype, keywords = subtypes[idx]
+
+    if subtype == float:
+        dummy, dummy2, possible_vals = VAR_LOOKUP(subvals[idx], variables)
+        return type(possible_vals) == type(xrange(0))
+
+    elif subtype in [list, tuple, set]:
+        return _continuous(subtypes, subvals, idx + 1, variables)
+
+    elif subtype == dict:
+        key_subtypes, val_subtypes = subtypes[idx + 1]
+        key_subvals, val_subvals = subvals[idx + 1]
+        return _continuous(key_subtypes, key_subvals, 0, variables) or \
+            _continuous(val_subtypes, val_subvals, 0, variables)
+
+    elif subtype not in PROCESS_FXNS:
+        ## Class: recurse into each field
+        class_name, field_types = subtypes[idx]
+        class_name, field_vals = subvals[idx]
+        for field_type, field_val in zip(field_types, field_vals):
+            if _continuous(field_type[1][0], field_val[1][0], 0, variables):
+                return True
+
+    return False
+
+def _finite_domain(subtypes, subvals, idx, variables):
+    """
+    Returns the sequence of all possible values for the primitive type at idx,
+    or None if they can't be enumerated cheaply (i.e. floats, strs generated
+    from a length range, containers, and classes).
+    """
+    subtype, keywords = subtypes[idx]
+
+    if subtype == int or subtype == bool:
+        dummy, dummy2, possible_vals = VAR_LOOKUP(subvals[idx], variables)
+
+    elif subtype == str and type(subvals[idx]) != type(xrange(0)):
+        dummy, dummy2, possible_vals = VAR_LOOKUP(tuple(subvals[idx]), \
+            variables)
+
+    else:
+        return None
+
+    if type(possible_vals) == type(xrange(0)):
+        return possible_vals
+
+    ## Discrete list of values, which may contain repeats
+    unique_vals = []
+    for val in possible_vals:
+        if val not in unique_vals:
+            unique_vals.append(val)
+
+    return unique_vals
+
+def _sample_distinct(draw_fxn, length, domain, rng):
+    """
+    Returns a list of length distinct values, sampled without replacement from
+    domain (with the random stream rng) if it's known, or else drawn with 
+    draw_fxn until enough distinct values have been found. Raises 
+    InfeasibleError if that can't be done.
+    """
+    if domain is not None:
+        if length > len(domain):
+            raise InfeasibleError("can't draw " + str(length) \
+                + " distinct values from a domain of " + str(len(domain)))
+        return rng.sample(domain, length)
+
+    ## Compare canonical forms, so that e.g. sets are distinct regardless of
+    ## the order in which their elements were drawn
+    vals = []
+    seen = set()
+    for i in range(DRAWS_PER_ELEMENT * length):
+        if len(vals) == length:
+            break
+
+        val = draw_fxn()
+        key = CANONICAL(val)
+        if key not in seen:
+            seen.add(key)
+            vals.append(val)
+
+    if len(vals) < length:
+        raise InfeasibleError("found only " + str(len(vals)) + " of " \
+            + str(length) + " distinct values after " \
+            + str(DRAWS_PER_ELEMENT * length) + " draws")
+
+    return vals
+
 ###---------------------------------------------------
 ### TYPE-SPECIFIC PROCESSING:
 ###---------------------------------------------------
-def _process_class(subtypes, subvals, idx, variables):
+def _process_class(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the class instance
     parameter specified by the inputs.
@@ -42,7 +344,7 @@ def _process_class(subtypes, subvals, idx, variables):
     ## Recursively exhaustively generate values for all fields in this
     ## class object
     field_possible_args = process_types_rec(all_field_types, \
-        all_field_vals, variables, PROCESS_FXNS)
+        all_field_vals, variables, PROCESS_FXNS, forced, rng)
 
     ## Recursively generate all combinations of fields for this 
     ## object; these combinations will in turn serve as all possible 
@@ -58,7 +360,7 @@ def _process_class(subtypes, subvals, idx, variables):
 
     return list(possible_varnames[0]), field_arg_lists
 
-def _process_int(subtypes, subvals, idx, variables):
+def _process_int(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the int parameter 
     specified by the inputs.
@@ -66,9 +368,9 @@ def _process_int(subtypes, subvals, idx, variables):
     ## Primitive type + no valid keywords (yet), so ignore subtypes
     possible_vals = subvals[idx]
     dummy, dummy2, possible_args = VAR_LOOKUP(possible_vals, variables)
-    return [((None, None),)], [random.choice(possible_args)]
+    return [((None, None),)], [rng.choice(possible_args)]
 
-def _process_bol(subtypes, subvals, idx, variables):
+def _process_bol(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the bool parameter 
     specified by the inputs.
@@ -76,9 +378,9 @@ def _process_bol(subtypes, subvals, idx, variables):
     ## Primitive type + no valid keywords (yet), so ignore subtypes
     possible_vals = subvals[idx]
     dummy, dummy2, possible_args = VAR_LOOKUP(possible_vals, variables)
-    return [((None, None),)], [random.choice(possible_args)]
+    return [((None, None),)], [rng.choice(possible_args)]
 
-def _process_flt(subtypes, subvals, idx, variables):
+def _process_flt(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the float parameter 
     specified by the inputs.
@@ -90,17 +392,17 @@ def _process_flt(subtypes, subvals, idx, variables):
     ## If we have a range of values, generate a random value on that 
     ## continuous spectrum
     if type(possible_vals) == type(xrange(0)):
-        val = possible_vals[0] + (random.random() * \
+        val = possible_vals[0] + (rng.random() * \
             (possible_vals[-1] - possible_vals[0]))
 
     ## Otherwise, we have a discrete list of possible values, so choose a
     ## random element from that list
     else:
-        val = random.choice(possible_vals)
+        val = rng.choice(possible_vals)
 
     return [((None, None),)], [val]
 
-def _process_str(subtypes, subvals, idx, variables):
+def _process_str(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the str parameter 
     specified by the inputs.
@@ -110,52 +412,30 @@ def _process_str(subtypes, subvals, idx, variables):
     if type(subvals[idx]) == type(xrange(0)):
 
         ## Get the character domain
-        if not keywords:
-            # default to everything
-            domain = string.printable
-
-        elif LOWER in keywords:
-            domain = string.lowercase
-
-        elif UPPER in keywords:
-            domain = string.uppercase
-
-        elif LETTERS in keywords:
-            domain = string.letters
-
-        elif DIGITS in keywords:
-            domain = string.digits
-
-        elif HEXDIGITS in keywords:
-            domain = string.hexdigits
-
-        elif keywords[0][0] == "\"" and keywords[0][-1] == "\"":
-            ## Explicit domain as a string of characters
-            domain = keywords[0][1:-1]
-
-        else:
-            raise ValueError
+        domain = STR_DOMAIN(keywords)
 
         ## Randomly select a valid length
         length_range = subvals[idx]
         dummy, dummy2, length_range = VAR_LOOKUP(length_range, variables)
-        length = random.choice(length_range)
+        length = _choose((LENGTH, id(subvals), idx), length_range, forced, \
+            rng)
 
         ## Generate random one permutation of this length   
         chars = []
         for i in range(length):
             ## Select each character to go in this string
-            chars.append(random.choice(domain))
+            chars.append(rng.choice(domain))
         opts = ["".join(chars)]
 
     else:
         opts = tuple(subvals[idx])
         dummy, dummy2, opts = VAR_LOOKUP(opts, variables)
-        opts = [random.choice(opts)]
+        opts = [rng.choice(opts)]
 
     return [((None, None),)], opts
 
-def _process_tup(subtypes, subvals, idx, variables, typestr="tuple"):
+def _process_tup(subtypes, subvals, idx, variables, forced, rng, \
+    typestr="tuple"):
     """
     Returns a random choice of possible value for the tuple parameter 
     specified by the inputs. This tuple can be nested arbitrarily deeply.
@@ -165,7 +445,8 @@ def _process_tup(subtypes, subvals, idx, variables, typestr="tuple"):
     dummy, dummy2, length_range = VAR_LOOKUP(length_range, variables)
 
     ## Randomly select a valid length
-    length = random.choice(length_range)
+    length = _choose((LENGTH, id(subvals), idx), length_range, forced, \
+        rng)
 
     ## Get the information about the elements to go in this tuple
     idx += 1
@@ -176,42 +457,43 @@ def _process_tup(subtypes, subvals, idx, variables, typestr="tuple"):
     else:
         next_process_fxn = PROCESS_FXNS[CLASS]
 
-    ## Generate one random permutation of this length   
-    arg = []
-    while len(arg) < length:
-        ## Select each element to go in this tuple
-        retval = next_process_fxn(subtypes, subvals, idx, \
-            variables)
-        next_val = retval[1][0]
+    draw_fxn = lambda: next_process_fxn(subtypes, subvals, idx, \
+        variables, forced, rng)[1][0]
+
+    ## Generate one random permutation of this length; set elements are 
+    ## drawn distinct up front (rather than rejecting repeats), and sorted-ness
+    ## is imposed afterwards (rather than rejecting out-of-order elements)
+    if typestr == "set":
+        arg = _sample_distinct(draw_fxn, length, _finite_domain(subtypes, \
+            subvals, idx, variables), rng)
+    else:
+        arg = [draw_fxn() for i in range(length)]
+
+    if SORTED in keywords:
+        arg.sort()
 
-        ## Make sure we maintain sorted-ness, if requested
-        if (typestr != "set" and SORTED not in keywords) or len(arg) == 0 or \
-            (SORTED in keywords and next_val >= arg[-1]) or \
-            (typestr == "set" and next_val not in arg):
-            arg.append(next_val)
-    
     retval = [((None, None),)], [(typestr, tuple(arg))]
     return retval
 
-def _process_lst(subtypes, subvals, idx, variables):
+def _process_lst(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the list parameter 
     specified by the inputs. This list can be nested arbitrarily deeply.
     """
     perm_varnames, perms = _process_tup(subtypes, subvals, idx, variables, \
-        "list")
+        forced, rng, "list")
     return perm_varnames, perms
 
-def _process_set(subtypes, subvals, idx, variables):
+def _process_set(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the set parameter 
     specified by the inputs. This set can be nested arbitrarily deeply.
     """
     perm_varnames, perms = _process_tup(subtypes, subvals, idx, variables, \
-        "set")
+        forced, rng, "set")
     return perm_varnames, perms
 
-def _process_dic(subtypes, subvals, idx, variables):
+def _process_dic(subtypes, subvals, idx, variables, forced, rng):
     """
     Returns a random choice of possible value for the dict parameter 
     specified by the inputs. This dict can be nested arbitrarily deeply.
@@ -221,7 +503,8 @@ def _process_dic(subtypes, subvals, idx, variables):
     dummy, dummy2, length_range = VAR_LOOKUP(length_range, variables)
 
     ## Randomly select a valid length
-    length = random.choice(length_range)
+    length = _choose((LENGTH, id(subvals), idx), length_range, forced, \
+        rng)
 
     ## Get the information about the elements to go in this tuple
     idx += 1
@@ -241,20 +524,13 @@ def _process_dic(subtypes, subvals, idx, variables):
     else:
         first_val_process_fxn = PROCESS_FXNS[CLASS]
 
-    key_list = []
-    val_list = []
-
-    ## Generate one random permutation of this length   
-    while len(key_list) < length:
-        dummy, keys = first_key_process_fxn(key_subtypes, key_subvals, \
-            0, variables)
-        dummy, vals = first_val_process_fxn(val_subtypes, val_subvals, \
-            0, variables)
-
-        ## Only add this key if it's new!
-        if keys[0] not in key_list:
-            key_list.append(keys[0])
-            val_list.append(vals[0]) 
+    ## Generate one random permutation of this length, with distinct keys
+    draw_key_fxn = lambda: first_key_process_fxn(key_subtypes, key_subvals, \
+        0, variables, forced, rng)[1][0]
+    key_list = _sample_distinct(draw_key_fxn, length, \
+        _finite_domain(key_subtypes, key_subvals, 0, variables), rng)
+    val_list = [first_val_process_fxn(val_subtypes, val_subvals, 0, \
+        variables, forced, rng)[1][0] for key in key_list]
 
     return [((None, None),)], [("dict", ((tuple(key_list), tuple(val_list)),), \
         ((None, None),))]
@@ -274,80 +550,377 @@ PROCESS_FXNS = {int:   _process_int,
 ###---------------------------------------------------
 ### TOP-LEVEL PROCESSING:
 ###---------------------------------------------------
-def generate_random_cases(infile):
+def _init_worker(method_spec):
     """
-    Randomly generate test cases.
+    Initializes a worker process to generate batches for the given method 
+    spec, which is inherited rather than pickled.
     """
+    _WORKER["method_spec"] = method_spec
+
+def _generate_worker_batch(stream_args):
+    """
+    Generates a batch (see _generate_batch) in a worker process, returning it
+    along with the stage stats of doing so.
+    """
+    stats = {}
+    batch = _generate_batch(_WORKER["method_spec"], stream_args, stats)
+    return batch, stats
+
+def _generate_batch(method_spec, stream_args, stats=None):
+    """
+    Makes BATCH_SIZE attempts at generating a random test case for the given
+    method spec, from the random stream identified by stream_args, a (seed, 
+    stream index, domain) triple, where domain is the one of DOMAINS to 
+    sample from.
+    Returns the outcome of each attempt as an (outcome, value) pair, where the
+    value is the test case in its non-class format if it was ACCEPTED (or, as
+    generated, if it was INVALID), or a diagnostic message if it was 
+    INFEASIBLE. The results depend only on 
+    stream_args, so batches can be generated by any worker process.
+
+    When sampling the exhaustive (or boundary) domain, the attempts cycle 
+    through its strata (continuing from the previous stream), each forcing 
+    one choice. Timings for each stage are added to the given stage stats 
+    (see STAGE), if any.
+    """
+    if stats is None:
+        stats = {}
+
+    ## Draw from a random stream of our own, so that concurrent generations 
+    ## don't disturb one another
+    seed, stream, domain = stream_args
+    rng = random.Random((((seed << 32) + stream) << 2) + \
+        DOMAINS.index(domain))
+    vals, var_ranges, validation_fxn = _domain(method_spec, domain)
+
     types = CONVERT_TYPES(method_spec.TYPES)
+    has_classes = CONTAINS_CLASSES(method_spec, method_spec.TYPES)
+    convert_classes = GET_CLASS_CONVERTER(method_spec, method_spec.TYPES)
+    unconvert_classes = GET_CLASS_UNCONVERTER(method_spec, method_spec.TYPES)
+    feasible_vars = _feasible_variables(vals, var_ranges)
 
-    base_set_path = "base_set_generation.output." + infile.split("/")[-1][:-3]
-    base_test_set = importlib.import_module(base_set_path)
-    existing_cases = base_test_set.EXHAUSTIVE_CASES[:]
+    if domain == "random":
+        strata = []
+    else:
+        strata = _strata(types, vals, var_ranges)
 
-    ## Build randomized cases, one at a time
-    randomized_cases = []
-    converted_cases = []
+    ## Choices forced for the current attempt, as a mapping of decision point
+    ## to value
+    forced = {}
 
-    ## Keep going until we've reached the upper bound on the number of 
-    ## randomized test cases
-    num_attempts = 0
-    while len(randomized_cases) < method_spec.RANDOMIZED_BOUND:
-        dup = 0
-        num_attempts += 1
+    batch = []
+    for i in range(BATCH_SIZE):
+        start_time = time.time()
+        forced.clear()
+        if strata:
+            forced.update(strata[(stream * BATCH_SIZE + i) % len(strata)])
 
-        ## Pick a value for each variable
+        ## Pick a value for each variable, among those consistent with the 
+        ## domain
         variables = {}
-        for varname, varrange in method_spec.VARS.items():
-            val = random.choice(varrange)
+        for varname in method_spec.VARS:
+            val = _choose((VARIABLE, varname), feasible_vars[varname], \
+                forced, rng)
             variables[varname] = [val]
 
         ## Randomly generate a new case
-        test_case = process_types(method_spec, types, method_spec.RANDOMIZED_VALS,
-            variables, PROCESS_FXNS)[0]
+        try:
+            test_case = process_types(method_spec, types, vals, variables, \
+                PROCESS_FXNS, (forced, rng))[0]
+        except InfeasibleError as ex:
+            STAGE_TIME(stats, "sample", start_time)
+            batch.append((INFEASIBLE, str(ex)))
+            continue
+        start_time = STAGE_TIME(stats, "sample", start_time)
 
         ## Instantiate any classes
-        class_converted_args = CONVERT_CLASSES(method_spec, test_case, 
-            method_spec.TYPES)
+        if has_classes:
+            class_converted_args = convert_classes(test_case)
+            start_time = STAGE_TIME(stats, "convert_classes", start_time)
+        else:
+            class_converted_args = tuple(test_case)
 
         ## Perform validation; only add this test case if it passes 
-        if not method_spec.rvalidation_fxn(class_converted_args):
+        valid = validation_fxn(class_converted_args)
+        start_time = STAGE_TIME(stats, "validate", start_time)
+        if not valid:
+            batch.append((INVALID, tuple(test_case)))
             continue
 
         ## Regenerate the non-class version of the test case, in case our
         ## validation function mutated it
-        test_case = UNCONVERT_CLASSES(method_spec, class_converted_args,
-            method_spec.TYPES)
-
-        ## Only add it if it's a) self-consistent (otherwise 
-        ## process_types would've returned None), b) not covered by the 
-        ## exhaustive test cases, and c) not already randomly-generated in a 
-        ## prior iteration
-        if test_case:
-            for case in existing_cases:
-                if test_case == case:
-                    ## Duplicate; try again
-                    dup = 1
-                    break
-            if dup:
-                continue
-
-            existing_cases.append(test_case)
-            randomized_cases.append(test_case)
-            converted_cases.append(class_converted_args)
+        if has_classes:
+            test_case = unconvert_classes(class_converted_args)
+            STAGE_TIME(stats, "convert_classes", start_time)
+        else:
+            test_case = class_converted_args
+
+        batch.append((ACCEPTED, test_case))
+
+    return batch
+
+def measure_rate(method_spec, seed=None, domain="random"):
+    """
+    Returns the approximate number of test cases accepted per second when 
+    sampling the given domain (one of DOMAINS) of the given method spec, as 
+    measured over a single batch.
+    """
+    if seed is None:
+        seed = random.SystemRandom().randint(0, sys.maxint)
+
+    start_time = time.time()
+    batch = _generate_batch(method_spec, (seed, 0, domain))
+    duration = max(time.time() - start_time, 1e-6)
+
+    ## Count at least one acceptance, so the rate is never zero
+    num_accepted = len([outcome for outcome, dummy in batch \
+        if outcome == ACCEPTED])
+    return max(num_accepted, 1) / duration
+
+def generate_random_cases(method_spec, infile, exhaustive_cases=None, \
+    seed=None, jobs=1, bound=None, deadline=None, domain="random", \
+    stats=None):
+    """
+    Randomly generate up to bound test cases for the given method spec (by
+    default, the [num random] from the config file), which must not 
+    duplicate exhaustive_cases (in the format returned by 
+    gen_write_exhaustive_cases; if None, these are instead loaded from 
+    infile). Samples the given domain, one of DOMAINS.
+
+    Candidates are generated in batches, each from its own stream seeded by
+    seed and the batch's index, and optionally spread across jobs worker
+    processes; the results for a given seed are the same for any number of
+    jobs. Samples of the exhaustive and boundary domains are stratified (see
+    _strata), so that every stratum is covered once bound is at least the 
+    number of strata (barring validation failures). Only one test case is 
+    kept per equivalence class, if the config file specifies a [canonical 
+    form]. Gives up, with a warning, once the budget of attempts is used up 
+    or the deadline (in seconds since the epoch) has passed.
+
+    Given stats, the counters for this domain are left in its "sampler" 
+    entry (the number of attempts, the number of each outcome, the 
+    acceptance rate, and the number of strata and how many were covered), 
+    and counters and timings for each stage are added to the stage stats 
+    (see STAGE) for this domain in its "randomized" entry.
+    """
+    if stats is None:
+        stats = {}
+
+    has_classes = CONTAINS_CLASSES(method_spec, method_spec.TYPES)
+    convert_classes = GET_CLASS_CONVERTER(method_spec, method_spec.TYPES)
+    unconvert_classes = GET_CLASS_UNCONVERTER(method_spec, method_spec.TYPES)
+    vals, var_ranges, dummy = _domain(method_spec, domain)
+
+    if exhaustive_cases is None:
+        base_set_path = "base_set_generation.output." \
+            + infile.split("/")[-1][:-3]
+        base_test_set = importlib.import_module(base_set_path)
+        existing_cases = base_test_set.EXHAUSTIVE_CASES
+        if has_classes:
+            exhaustive_cases = [convert_classes(case) for case \
+                in existing_cases]
+        else:
+            exhaustive_cases = existing_cases
+    elif has_classes:
+        existing_cases = [unconvert_classes(case) for case \
+            in exhaustive_cases]
+    else:
+        existing_cases = exhaustive_cases
+
+    ## Canonical forms of all cases so far, for checking for duplicates (and,
+    ## given a [canonical form], of their equivalence classes)
+    seen = set([CANONICAL(case) for case in existing_cases])
+    if method_spec.canonical_fxn:
+        seen_forms = set([CANONICAL_FORM(method_spec, case, converted_case) \
+            for case, converted_case in zip(existing_cases, \
+            exhaustive_cases)])
+    else:
+        seen_forms = seen
+
+    if seed is None:
+        seed = random.SystemRandom().randint(0, sys.maxint)
+
+    if bound is None:
+        bound = method_spec.RANDOMIZED_BOUND
+
+    if method_spec.RANDOMIZED_ATTEMPTS is None or domain != "random":
+        max_attempts = ATTEMPTS_PER_CASE * bound
+    else:
+        max_attempts = method_spec.RANDOMIZED_ATTEMPTS
+
+    ## Strata covered by accepted test cases, if sampling the exhaustive (or 
+    ## boundary) domain
+    if domain == "random":
+        num_strata = 0
+    else:
+        num_strata = len(_strata(CONVERT_TYPES(method_spec.TYPES), vals, \
+            var_ranges))
+    covered_strata = set()
+
+    ## Every distinct candidate drawn, valid or not, if the domain is finite,
+    ## so that sampling stops once all of them have been drawn
+    size = domain_size(method_spec, domain)
+    drawn = set()
+
+    counters = {"attempts": 0, "acceptance_rate": None, \
+        "strata": num_strata, "strata_covered": 0}
+    for outcome in [ACCEPTED, INVALID, DUPLICATE, EQUIVALENT, INFEASIBLE]:
+        counters[outcome] = 0
+    stats.setdefault("sampler", {})[domain] = counters
+    stage_stats = stats.setdefault("randomized", {}).setdefault(domain, {})
+
+    ## Build randomized cases, one batch at a time
+    randomized_cases = []
+    converted_cases = []
+
+    if bound <= 0:
+        return randomized_cases, converted_cases
+
+    ## Every attempt would fail if some variable has no consistent values
+    for varname, varrange in _feasible_variables(vals, var_ranges).items():
+        if not varrange:
+            print " WARNING: no value of variable " + varname + " keeps " \
+                + "every range in the " + domain + " domain " \
+                + "non-empty; skipping sampling"
+            return randomized_cases, converted_cases
+
+    ## Worker processes inherit the method spec when they are forked
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, _init_worker, (method_spec,))
+        map_fxn = lambda streams: pool.map(_generate_worker_batch, streams)
+    else:
+        pool = None
+        map_fxn = lambda streams: [(_generate_batch(method_spec, \
+            stream_args, stage_stats), {}) for stream_args in streams]
+
+    ## Keep going until we've reached the upper bound on the number of 
+    ## randomized test cases, used up the budget of attempts or time, or
+    ## exhausted the domain; each round generates one batch per job, and the
+    ## batches are always consumed in order of their stream indices
+    num_streams = 0
+    last_infeasible = None
+    out_of_time = False
+    exhausted = False
+    ## Reap the worker processes even if a worker or the dedup fails
+    try:
+        while len(randomized_cases) < bound and \
+            counters["attempts"] < max_attempts and not out_of_time and \
+            not exhausted:
+            streams = [(seed, num_streams + i, domain) for i in range(jobs)]
+            num_streams += jobs
+
+            for stream_args, (batch, batch_stats) in zip(streams, \
+                map_fxn(streams)):
+                MERGE_STAGE_STATS(stage_stats, batch_stats)
+                start_time = time.time()
+                for i, (outcome, test_case) in enumerate(batch):
+                    if len(randomized_cases) >= bound or \
+                        counters["attempts"] >= max_attempts or exhausted:
+                        break
+
+                    counters["attempts"] += 1
+
+                    ## Only add it if it's a) valid, b) not covered by the 
+                    ## exhaustive test cases, and c) not already 
+                    ## randomly-generated in a prior iteration
+                    if outcome == ACCEPTED:
+                        key = CANONICAL(test_case)
+                        if has_classes:
+                            converted_case = convert_classes(test_case)
+                        else:
+                            converted_case = test_case
+
+                        if method_spec.canonical_fxn and key not in seen:
+                            form = CANONICAL_FORM(method_spec, test_case, \
+                                converted_case)
+                        else:
+                            form = key
+
+                        if key in seen:
+                            outcome = DUPLICATE
+                        elif form in seen_forms:
+                            outcome = EQUIVALENT
+                        else:
+                            seen.add(key)
+                            seen_forms.add(form)
+                            randomized_cases.append(test_case)
+                            converted_cases.append(converted_case)
+                            if num_strata:
+                                covered_strata.add((stream_args[1] \
+                                    * BATCH_SIZE + i) % num_strata)
+
+                    elif outcome == INFEASIBLE:
+                        last_infeasible = test_case
+
+                    if size is not None and outcome != INFEASIBLE:
+                        drawn.add(CANONICAL(test_case))
+                        exhausted = len(drawn) >= size
+
+                    counters[outcome] += 1
+
+                STAGE_TIME(stage_stats, "dedup", start_time)
+
+            if deadline is not None and time.time() >= deadline:
+                out_of_time = True
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    if counters["attempts"]:
+        counters["acceptance_rate"] = counters[ACCEPTED] \
+            / float(counters["attempts"])
+    counters["strata_covered"] = len(covered_strata)
+    STAGE_COUNT(stage_stats, "sample", "candidates", counters["attempts"])
+    STAGE_COUNT(stage_stats, "sample", "infeasible", counters[INFEASIBLE])
+    STAGE_COUNT(stage_stats, "validate", "rejected", counters[INVALID])
+    STAGE_COUNT(stage_stats, "dedup", "duplicates", counters[DUPLICATE])
+    STAGE_COUNT(stage_stats, "dedup", "equivalent", counters[EQUIVALENT])
+
+    ## The size of the boundary domain is only estimated (from above), so
+    ## running out of boundary test cases is expected, as is running out of
+    ## test cases in any domain that has been exhausted
+    if len(randomized_cases) < bound and not exhausted and \
+        (out_of_time or domain != "boundary"):
+        if out_of_time:
+            reason = "ran out of time"
+        else:
+            reason = "gave up"
+
+        print " WARNING: " + reason + " after " + str(counters["attempts"]) \
+            + " attempts, with only " + str(len(randomized_cases)) + " of " \
+            + str(bound) + " test cases sampled from the " + domain \
+            + " domain (" + str(counters[INVALID]) + " failed validation, " \
+            + str(counters[DUPLICATE]) + " were duplicates, " \
+            + str(counters[EQUIVALENT]) + " were equivalent, " \
+            + str(counters[INFEASIBLE]) + " were infeasible)"
+        if last_infeasible:
+            print "    last infeasible attempt: " + last_infeasible
 
     return randomized_cases, converted_cases
 
-def gen_write_random_cases(outfile):
+def gen_write_random_cases(method_spec, outfile, exhaustive_cases=None, \
+    seed=None, jobs=1, bound=None, deadline=None, stats=None):
     """
-    Randomly generate test cases and write the output to a file.
+    Randomly generate test cases for the given method spec and write the 
+    output to a file. Counters and timings are left in the given stats, if 
+    any (see generate_random_cases).
     """
+    if stats is None:
+        stats = {}
+
     ## Generate test cases
-    test_cases, converted_test_cases = generate_random_cases(outfile)
+    test_cases, converted_test_cases = generate_random_cases(method_spec, \
+        outfile, exhaustive_cases, seed, jobs, bound, deadline, "random", \
+        stats)
 
     ## Write test cases to file
+    start_time = time.time()
     f = open(outfile, "a")
     f.write("RANDOMIZED_CASES = " + repr(test_cases))
     f.close()
+    STAGE_TIME(stats.setdefault("randomized", {}).setdefault("random", {}), \
+        "write", start_time)
 
     ## Return the Python object version
     return converted_test_cases
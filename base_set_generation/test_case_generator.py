@@ -17,11 +17,15 @@ Testception. If not, see <http://www.gnu.org/licenses/>.
 """
 
 import ast
+import heapq
 import inspect
+import itertools
 import math
 import random
+import resource
 import string
 import sys
+import time
 import __builtin__
 
 from bsg_globals import *
@@ -117,280 +121,657 @@ def IS_RANGE(varname):
     return type(varname) == type(()) and (varname[0] == START \
         or varname[0] == END)
 
-def CONVERT_CONTAINER(method_spec, container, nested_expected_types):
+def POSSIBLE_VARNAMES(varname, varrange, possible_args, f=(lambda x: x)):
     """
-    Helper function for converting nested tuples of the form:
-    (typestr, (typestr, (typestr, obj))) into nested objects of the intended 
-    types (as identified by the typestrs).
+    Given the name and range of a variable, as well as the range of possible 
+    arguments, creates a tuple of sub-tuples of (varname, val) pairs, where 
+    the i-th sub-tuple corresponds to all of the values of varname that are 
+    compatible with the i-th element in possible_args.
     """
-    if len(container) == 0:
-        return container
+    ## Case 1: absolute value
+    if type(varname) != type(()):
+        possible_varnames = [tuple([(varname, f(arg))]) for arg in \
+            possible_args]
+        base_varname = varname
 
-    ## Create an empty container of the appropriate type
-    first = container[0]
-    type_fxn = getattr(__builtin__, first)
-    retval = type_fxn()
+    ## Case 2: start of a range
+    elif varname[0] == START:
+        possible_varnames = [[((varname[1], val),) for val in \
+            filter(lambda x: x <= f(arg), varrange)] for arg in possible_args]
+        base_varname = varname[1]
 
-    ## Recursively process everything in this container
-    rest = container[1]
+    ## Case 3: end of a range
+    else:
+        possible_varnames = [[((varname[1], val),) for val in \
+            filter(lambda x: x >= f(arg), varrange)] for arg in possible_args]
+        base_varname = varname[1]
 
-    if type_fxn == dict:
+    return base_varname, possible_varnames
 
-        ## Get the types of the keys and values
-        key_type = nested_expected_types[0][0]
-        val_type = nested_expected_types[0][1]
+def STR_DOMAIN(keywords):
+    """
+    Returns the string of characters that may appear in a str generated from
+    a range of lengths, as specified by its keywords.
+    """
+    if not keywords:
+        ## Default to everything
+        return string.printable
 
-        ## Get the actual keys and values
-        keys = rest[0][0]
-        vals = rest[0][1]
-        pairs = zip(keys, vals)
+    elif LOWER in keywords:
+        return string.lowercase
 
-        for key, val in pairs:
-            ## Convert each (key, val) pair...
-            converted_key = CHECK_CONVERT(method_spec, key, key_type)
-            converted_val = CHECK_CONVERT(method_spec, val, val_type)
+    elif UPPER in keywords:
+        return string.uppercase
 
-            ## ...and add it to the dictionary
-            retval = APPEND(retval, (converted_key, converted_val))
+    elif LETTERS in keywords:
+        return string.letters
 
-    else:
+    elif DIGITS in keywords:
+        return string.digits
+
+    elif HEXDIGITS in keywords:
+        return string.hexdigits
 
-        ## Convert each element and add it to the container
-        for elem in rest:
-            retval = APPEND(retval, CHECK_CONVERT(method_spec, elem, \
-                nested_expected_types, CONVERT_CONTAINER))
+    elif keywords[0][0] == "\"" and keywords[0][-1] == "\"":
+        ## Explicit domain as a string of characters
+        return keywords[0][1:-1]
 
-    return retval
+    raise ValueError
 
-def CHECK_CONVERT(method_spec, container, expected_types, 
-    conversion_fxn=CONVERT_CONTAINER):
+def ESTIMATE_CARDINALITY(types, vals, variables):
     """
-    Helper function which optionally (if they are containers or classes) 
-    converts the input containers using the specified conversion function.
+    Estimates the number of arg lists in the exhaustive domain given by types
+    (as output by CONVERT_TYPES) and vals, without enumerating them. This is
+    an upper bound, since it ignores validation and variable consistency.
     """
-    if type(container) != type(()):
-        return container
+    total = 1
+    for nested_type, nested_val in zip(types, vals):
+        total *= _estimate_rec(nested_type, nested_val, 0, variables)
 
-    elif container[0] in CONTAINER_TYPES:
+    return total
 
-        ## We stored all (nested) lists, sets, and tuples as tuples 
-        ## during generation, so that we could hash them to perform quick 
-        ## checks for duplicates; but, now we want to convert them back 
-        ## to their intended types
-        container = conversion_fxn(method_spec, container, expected_types[1:])
-
-    elif expected_types[0][0] in method_spec.CONSTRUCTORS:
+def _choose(n, k):
+    """
+    Returns the binomial coefficient n choose k.
+    """
+    if k < 0 or k > n:
+        return 0
 
-        ## Convert each individual field, aggregating the results
-        retval = []
-        for i in range(len(container)):
-            field = container[i]
-            retval.append(CHECK_CONVERT(method_spec, field, \
-                expected_types[0][1][i][1][0]))
+    result = 1
+    for i in range(min(k, n - k)):
+        result = result * (n - i) / (i + 1)
 
-        container = tuple(retval)
+    return result
 
-    else:
-        ## Unidentified type
-        raise ValueError
-
-    return container
-
-def APPEND(container, elem):
+def _estimate_rec(subtypes, subvals, idx, variables):
+    """
+    Helper function for ESTIMATE_CARDINALITY: estimates the number of 
+    possible values for the (arbitrarily nested) type at idx.
+    """
+    subtype, keywords = subtypes[idx]
+
+    if subtype == int or subtype == bool or subtype == float:
+        dummy, dummy2, possible_vals = VAR_LOOKUP(subvals[idx], variables)
+        return len(possible_vals)
+
+    elif subtype == str:
+        if type(subvals[idx]) != type(xrange(0)):
+            dummy, dummy2, opts = VAR_LOOKUP(tuple(subvals[idx]), variables)
+            return len(opts)
+
+        ## All strings over the character domain within the range of lengths
+        dummy, dummy2, lengths = VAR_LOOKUP(subvals[idx], variables)
+        num_chars = len(STR_DOMAIN(keywords))
+        return sum([num_chars ** length for length in lengths])
+
+    elif subtype == list or subtype == tuple or subtype == set:
+        dummy, dummy2, lengths = VAR_LOOKUP(subvals[idx], variables)
+        num_elems = _estimate_rec(subtypes, subvals, idx + 1, variables)
+
+        if subtype == set:
+            return sum([_choose(num_elems, length) for length in lengths])
+        elif SORTED in keywords:
+            return sum([_choose(num_elems + length - 1, length) for length \
+                in lengths])
+        else:
+            return sum([num_elems ** length for length in lengths])
+
+    elif subtype == dict:
+        dummy, dummy2, lengths = VAR_LOOKUP(subvals[idx], variables)
+        key_subtypes, val_subtypes = subtypes[idx + 1]
+        key_subvals, val_subvals = subvals[idx + 1]
+        num_keys = _estimate_rec(key_subtypes, key_subvals, 0, variables)
+        num_vals = _estimate_rec(val_subtypes, val_subvals, 0, variables)
+
+        ## Keys are distinct and unordered; values are independent
+        return sum([_choose(num_keys, length) * num_vals ** length \
+            for length in lengths])
+
+    ## Class: every combination of field values
+    class_name, field_types = subtypes[idx]
+    class_name, field_vals = subvals[idx]
+    total = 1
+    for field_type, field_val in zip(field_types, field_vals):
+        total *= _estimate_rec(field_type[1][0], field_val[1][0], 0, \
+            variables)
+
+    return total
+
+def CANONICAL(value):
     """
-    Appends the element to the given container (which could be a list, set, or
-    tuple).
+    Returns a hashable canonical form of the given (arbitrarily nested) 
+    value, such that two values have equal canonical forms if and only if
+    they are themselves equal.
     """
-    if type(container) == type([]):
-        container.append(elem)
+    value_type = type(value)
 
-    elif type(container) == type(set([])):
-        container.add(elem)
+    if value_type == type([]) or value_type == type(()):
+        ## Tag sequences with their type, since [1] != (1,)
+        return (value_type, tuple([CANONICAL(elem) for elem in value]))
 
-    elif type(container) == type(()):
-        container = container + (elem,)
+    elif value_type == type(set([])):
+        return (value_type, frozenset([CANONICAL(elem) for elem in value]))
 
-    elif type(container) == type({}):
-        container[elem[0]] = elem[1]
+    elif value_type == type({}):
+        return (value_type, frozenset([(CANONICAL(key), CANONICAL(val)) \
+            for key, val in value.items()]))
 
-    return container
+    ## Primitive type: already hashable
+    return value
 
-def POSSIBLE_VARNAMES(varname, varrange, possible_args, f=(lambda x: x)):
+def CANONICAL_FORM(method_spec, case, converted_case):
     """
-    Given the name and range of a variable, as well as the range of possible 
-    arguments, creates a tuple of sub-tuples of (varname, val) pairs, where 
-    the i-th sub-tuple corresponds to all of the values of varname that are 
-    compatible with the i-th element in possible_args.
+    Returns a hashable key for the given test case (given both as written to
+    file and with any classes instantiated). If the config file specifies a 
+    [canonical form], this is the canonical form of the result of applying 
+    canonical_fxn to converted_case, so that test cases in the same 
+    equivalence class share a key; otherwise, it is that of case itself.
     """
-    ## Case 1: absolute value
-    if type(varname) != type(()):
-        possible_varnames = [tuple([(varname, f(arg))]) for arg in \
-            possible_args]
-        base_varname = varname
+    if method_spec.canonical_fxn:
+        return CANONICAL(method_spec.canonical_fxn(converted_case))
 
-    ## Case 2: start of a range
-    elif varname[0] == START:
-        possible_varnames = [[((varname[1], val),) for val in \
-            filter(lambda x: x <= f(arg), varrange)] for arg in possible_args]
-        base_varname = varname[1]
+    return CANONICAL(case)
 
-    ## Case 3: end of a range
-    else:
-        possible_varnames = [[((varname[1], val),) for val in \
-            filter(lambda x: x >= f(arg), varrange)] for arg in possible_args]
-        base_varname = varname[1]
+def BOUNDARY_VALS(types, vals):
+    """
+    Returns a copy of the domain vals (for the given types, as output by 
+    CONVERT_TYPES) reduced to its boundary values: the endpoints of each range
+    of ints or floats, and the minimum, next-to-minimum, and maximum of each
+    range of lengths, which covers empty and singleton containers. Strs from
+    a range of lengths become the strs of those lengths repeating the first or
+    the last character of their domain. Lengths are given as lists, so this 
+    domain is meant to be sampled rather than enumerated; domains given by 
+    variables are left as they are (see BOUNDARY_VARS).
+    """
+    return [_boundary_rec(nested_type, nested_val) for nested_type, \
+        nested_val in zip(types, vals)]
 
-    return base_varname, possible_varnames
+def BOUNDARY_VARS(variables):
+    """
+    Returns a copy of the mapping of variable names to ranges, reduced to the
+    endpoints of each range.
+    """
+    new_variables = {}
+    for varname, varrange in variables.items():
+        if len(varrange):
+            new_variables[varname] = sorted(set([varrange[0], \
+                varrange[-1]]))
+        else:
+            new_variables[varname] = []
 
-def CONVERT_CLASSES(method_spec, arg_list, types):
+    return new_variables
+
+def _boundary_lengths(lengths):
     """
-    Given a list of args in the form of nested tuples, converts all classes
-    into objects of the appropriate type.
+    Helper function for _boundary_rec: returns the minimum, next-to-minimum,
+    and maximum of the given lengths.
     """
-    new_arg_list = []
+    lengths = sorted(set(lengths))
+    if not lengths:
+        return lengths
 
-    for i in range(len(types)):
-        arg_type = types[i]
-        arg_val = arg_list[i]
+    return sorted(set([lengths[0], lengths[:2][-1], lengths[-1]]))
 
-        if arg_type[0][0] in CONTAINER_TYPES:
+def _boundary_rec(subtypes, subvals):
+    """
+    Helper function for BOUNDARY_VALS: reduces the domain of a single
+    (arbitrarily nested) parameter.
+    """
+    new_subvals = []
+    for subtype, subval in zip(subtypes, subvals):
 
-            ## Recursive case #1: container, which might contain classes
-            ## Make an empty container of the appropriate type 
-            type_fxn = getattr(__builtin__, arg_type[0][0])
-            container = type_fxn()
+        if type(subtype) == type([]):
+            ## Dictionary keys and values
+            new_subvals.append([_boundary_rec(subtype[0], subval[0]), \
+                _boundary_rec(subtype[1], subval[1])])
 
-            rest = arg_type[1:]
+        elif type(subval) == type(""):
+            ## Variable
+            new_subvals.append(subval)
 
-            if type_fxn == dict:
+        elif subtype[0] in [list, tuple, set, dict]:
+            new_subvals.append(_boundary_lengths(subval))
 
-                key_type = arg_type[1][0]
-                val_type = arg_type[1][1]
+        elif subtype[0] == str:
+            if type(subval) != type(xrange(0)):
+                ## Explicit list of strs
+                new_subvals.append(subval)
+                continue
 
-                ## Process each (key, val) pair in the original dict, and 
-                ## add it to our new (actual) dict
-                for key, val in arg_val.items():
-                    converted_key = CONVERT_CLASSES(method_spec, [key], 
-                        [key_type])[0]
-                    converted_val = CONVERT_CLASSES(method_spec, [val], 
-                        [val_type])[0]
-                    container = APPEND(container, (converted_key, \
-                        converted_val))
+            domain = STR_DOMAIN(subtype[1])
+            opts = []
+            for length in _boundary_lengths(subval):
+                for char in [domain[0], domain[-1]]:
+                    if char * length not in opts:
+                        opts.append(char * length)
+            new_subvals.append(opts)
+
+        elif subtype[0] == int or subtype[0] == float:
+            if not len(subval):
+                new_subvals.append(subval)
+                continue
 
+            if type(subval) == type(xrange(0)):
+                endpoints = sorted(set([subval[0], subval[-1]]))
             else:
+                endpoints = sorted(set([min(subval), max(subval)]))
+
+            if subtype[0] == float:
+                endpoints = [float(val) for val in endpoints]
+            new_subvals.append(endpoints)
+
+        elif subtype[0] == bool:
+            new_subvals.append(subval)
+
+        else:
+            ## Class: reduce each field
+            class_name, field_types = subtype
+            class_name, field_vals = subval
+            new_subvals.append((class_name, [(field_name, \
+                [_boundary_rec(field_type[0], field_val[1][0])]) \
+                for (field_name, field_type), field_val \
+                in zip(field_types, field_vals)]))
+
+    return new_subvals
+
+def DOMAIN_CONTAINS(types, vals, variables, old_vals, old_variables):
+    """
+    Returns whether the domain vals, with the given mapping of variable names
+    to ranges, contains the domain old_vals, with old_variables (both for the
+    given types, as output by CONVERT_TYPES): every range must contain the
+    corresponding old one, and every variable must be used in the same
+    places, with a range that contains its old range. This is checked on the
+    config alone, so a domain that contains the old one in some other way is
+    not recognized.
+    """
+    for varname, varrange in old_variables.items():
+        if varname not in variables or \
+            not _range_contains(variables[varname], varrange):
+            return False
 
-                ## Process each element in the original container, and add
-                ## it to our new container
-                elem_type = arg_type[1:]
-                for elem in arg_val: 
-                    converted_elem = CONVERT_CLASSES(method_spec, [elem], 
-                        [elem_type])
-                    container = APPEND(container, converted_elem[0])
+    return all([_contains_rec(nested_type, nested_val, old_nested_val) \
+        for nested_type, nested_val, old_nested_val \
+        in zip(types, vals, old_vals)])
 
-            ## Add this new container to the list
-            new_arg_list.append(container)
+def _range_contains(vals, old_vals):
+    """
+    Helper function for DOMAIN_CONTAINS: returns whether the range (xrange
+    or explicit list) vals contains every value in old_vals.
+    """
+    if type(vals) == type(xrange(0)) and type(old_vals) == type(xrange(0)):
+        return not len(old_vals) or (len(vals) > 0 and \
+            vals[0] <= old_vals[0] and old_vals[-1] <= vals[-1])
+
+    return set(old_vals) <= set(vals)
+
+def _contains_rec(subtypes, subvals, old_subvals):
+    """
+    Helper function for DOMAIN_CONTAINS: checks the domain of a single
+    (arbitrarily nested) parameter.
+    """
+    for subtype, subval, old_subval in zip(subtypes, subvals, old_subvals):
+
+        if type(subtype) == type([]):
+            ## Dictionary keys and values
+            if not _contains_rec(subtype[0], subval[0], old_subval[0]) or \
+                not _contains_rec(subtype[1], subval[1], old_subval[1]):
+                return False
+
+        elif type(subval) == type("") or type(old_subval) == type(""):
+            ## Variable
+            if subval != old_subval:
+                return False
+
+        elif subtype[0] in [list, tuple, set, dict, str, int, float, bool]:
+            if not _range_contains(subval, old_subval):
+                return False
+
+        else:
+            ## Class: check each field
+            class_name, field_types = subtype
+            class_name, field_vals = subval
+            old_class_name, old_field_vals = old_subval
+            for (field_name, field_type), field_val, old_field_val \
+                in zip(field_types, field_vals, old_field_vals):
+                if not _contains_rec(field_type[0], field_val[1][0], \
+                    old_field_val[1][0]):
+                    return False
+
+    return True
+
+def COVERING_SUBSET(cases, strength):
+    """
+    Returns the indices (in ascending order) of a subset of cases in which
+    every combination of values for any strength parameters that appears in
+    cases appears at least once, i.e. a covering array of that strength. 
+    Cases are picked greedily, most newly-covered combinations first, to keep
+    the subset small.
+    """
+    if not cases or strength >= len(cases[0]):
+        return range(len(cases))
+
+    ## All combinations of parameter values covered by each case
+    param_combos = list(itertools.combinations(range(len(cases[0])), \
+        strength))
+    case_combos = []
+    for case in cases:
+        canon = [CANONICAL(arg) for arg in case]
+        case_combos.append(set([(params, tuple([canon[i] for i in params])) \
+            for params in param_combos]))
+
+    uncovered = set()
+    for combos in case_combos:
+        uncovered.update(combos)
+
+    ## Lazy greedy: a case's gain only ever shrinks, so its stale gain on the
+    ## heap is an upper bound, and only needs recomputing when it's on top
+    heap = [(-len(combos), idx) for idx, combos in enumerate(case_combos)]
+    heapq.heapify(heap)
+
+    selected = []
+    while uncovered and heap:
+        dummy, idx = heapq.heappop(heap)
+        gain = len(case_combos[idx] & uncovered)
+        if not gain:
             continue
 
-        elif arg_type[0][0] not in method_spec.CONSTRUCTORS:
-            ## Base case: not a class; nothing to be done!
-            new_arg_list.append(arg_val)
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, idx))
             continue
 
-        ## Recursive case #2: class!
-        arg_type = arg_type[0]
-        class_name = arg_type[0]
-        fields = arg_type[1]
+        selected.append(idx)
+        uncovered -= case_combos[idx]
 
-        ## Get the constructor for this class
-        constructor = getattr(method_spec, class_name)
-        constructor_args = method_spec.CONSTRUCTORS[class_name]
+    selected.sort()
+    return selected
 
-        ## Instantiate the class object with these nonsense args for now
-        class_instance = constructor(*constructor_args)
+def STAGE(stats, stage):
+    """
+    Returns the counters for the given stage in the given stage stats, a 
+    mapping of stage names to counters, adding them if needed. Every stage 
+    has its wall time (in seconds) and the peak memory of the process by the
+    end of it (in KB), along with any counters added by STAGE_COUNT.
+    """
+    if stage not in stats:
+        stats[stage] = {"wall_time": 0.0, "peak_memory_kb": 0}
+    return stats[stage]
 
-        ## Now, overwrite the fields with their true values
-        for j in range(len(fields)):
-            field_name = fields[j][0]
-            field_val = arg_val[j]
-            setattr(class_instance, field_name, field_val)
+def STAGE_TIME(stats, stage, start_time):
+    """
+    Adds the wall time since start_time (as returned by time.time()) to the
+    given stage in the given stage stats (see STAGE), and updates its peak 
+    memory. Returns the current time, to start timing the next stage.
+    """
+    now = time.time()
+    counters = STAGE(stats, stage)
+    counters["wall_time"] += now - start_time
+    counters["peak_memory_kb"] = max(counters["peak_memory_kb"], \
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return now
+
+def STAGE_COUNT(stats, stage, counter, num=1):
+    """
+    Adds num to the given counter of the given stage in the given stage stats
+    (see STAGE).
+    """
+    counters = STAGE(stats, stage)
+    counters[counter] = counters.get(counter, 0) + num
 
-        ## Add this class instance to the arg list
-        new_arg_list.append(class_instance)
+def MERGE_STAGE_STATS(stats, more_stats):
+    """
+    Adds the given stage stats (e.g. from a worker process) into the given 
+    stage stats (see STAGE): wall times and other counters are summed, and 
+    the larger peak memory is kept.
+    """
+    for stage, more_counters in more_stats.items():
+        counters = STAGE(stats, stage)
+        for counter, num in more_counters.items():
+            if counter == "peak_memory_kb":
+                counters[counter] = max(counters[counter], num)
+            else:
+                counters[counter] = counters.get(counter, 0) + num
 
-    return tuple(new_arg_list)
+def CHECK_CONVERT(method_spec, container, expected_types):
+    """
+    Converts the input from the hashable format used during generation into 
+    an object of the intended type, as identified by expected_types.
+    """
+    return GET_CONVERTER(method_spec, expected_types)(container)
+
+def CONVERT_CLASSES(method_spec, arg_list, types):
+    """
+    Given a list of args in the form of nested tuples, converts all classes
+    into objects of the appropriate type.
+    """
+    return GET_CLASS_CONVERTER(method_spec, types)(arg_list)
 
 def UNCONVERT_CLASSES(method_spec, arg_list, types):
     """
     Given a list of args in the form of objects, converts all class objects
     back into tuples of fields.
     """
-    new_arg_list = []
+    return GET_CLASS_UNCONVERTER(method_spec, types)(arg_list)
 
-    for i in range(len(types)):
-        arg_type = types[i]
-        arg_val = arg_list[i]
+###---------------------------------------------------
+### COMPILED CONVERSIONS:
+###---------------------------------------------------
+## Conversion functions are compiled once per (spec, type signature) and 
+## cached here; each entry also holds a reference to its spec, so that the 
+## spec's id can't be reused while the entry is still around
+_CONVERTERS = {}
 
-        if arg_type[0][0] in CONTAINER_TYPES:
+def _identity(val):
+    """
+    Conversion function for values that need no conversion.
+    """
+    return val
 
-            ## Recursive case #1: container, which might contain classes
-            ## Make an empty container of the appropriate type 
-            type_fxn = getattr(__builtin__, arg_type[0][0])
-            container = type_fxn()
+def _type_name(subtype):
+    """
+    Returns the name of the type in the (type, keywords) pair subtype, 
+    regardless of whether it is stored as a string or as a type object.
+    """
+    if type(subtype[0]) == type(""):
+        return subtype[0]
+    return subtype[0].__name__
 
-            rest = arg_type[1:]
+def _cached_compile(compile_fxn, method_spec, types):
+    """
+    Looks up the function compiled by compile_fxn for the given spec and 
+    types, compiling and caching it first if necessary.
+    """
+    key = (compile_fxn, id(method_spec), repr(types))
+    if key not in _CONVERTERS:
+        _CONVERTERS[key] = (method_spec, compile_fxn(method_spec, types))
+    return _CONVERTERS[key][1]
 
-            if type_fxn == dict:
+def _compile_unhash(method_spec, nested_types):
+    """
+    Compiles a function which converts a single value of the given nested
+    type from the hashable format used during generation, e.g. 
+    ("list", (elem0, elem1)) or ("dict", (((key0,), (val0,)),)), into an 
+    object of the intended type. Returns None if no conversion is needed.
+    """
+    first = nested_types[0]
+    name = _type_name(first)
+
+    if name == "dict":
+        ## Dictionaries are stored as a (keys, vals) pair of tuples
+        key_fxn = _compile_unhash(method_spec, nested_types[1][0])
+        val_fxn = _compile_unhash(method_spec, nested_types[1][1])
+
+        def unhash_dict(container):
+            keys, vals = container[1][0]
+            if key_fxn:
+                keys = [key_fxn(key) for key in keys]
+            if val_fxn:
+                vals = [val_fxn(val) for val in vals]
+            return dict(zip(keys, vals))
+
+        return unhash_dict
+
+    elif name in CONTAINER_TYPES:
+        ## Lists, sets, and tuples are stored as (typestr, elems)
+        type_fxn = getattr(__builtin__, name)
+        elem_fxn = _compile_unhash(method_spec, nested_types[1:])
+
+        if elem_fxn:
+            return lambda container: type_fxn([elem_fxn(elem) \
+                for elem in container[1]])
+        return lambda container: type_fxn(container[1])
+
+    elif name in method_spec.CONSTRUCTORS:
+        ## Classes are stored as tuples of fields, any of which may in turn
+        ## be containers
+        field_fxns = [_compile_unhash(method_spec, field[1][0]) or _identity \
+            for field in first[1]]
+
+        def unhash_class(fields):
+            return tuple([field_fxn(field) for field_fxn, field \
+                in zip(field_fxns, fields)])
+
+        return unhash_class
+
+    elif type(first[1]) == type([]):
+        ## Unidentified type: a class with no constructor
+        raise ValueError
 
-                key_type = arg_type[1][0]
-                val_type = arg_type[1][1]
+    ## Primitive type; nothing to be done!
+    return None
 
-                ## Process each (key, val) pair in the original dict, and 
-                ## add it to our new (actual) dict
-                for key, val in arg_val.items():
-                    converted_key = UNCONVERT_CLASSES(method_spec, [key], 
-                        [key_type])[0]
-                    converted_val = UNCONVERT_CLASSES(method_spec, [val], 
-                        [val_type])[0]
-                    container = APPEND(container, (converted_key, \
-                        converted_val))
+def _compile_classes(method_spec, nested_types, to_objects):
+    """
+    Compiles a function which converts a single value of the given nested 
+    type from tuples of fields to class objects (if to_objects) or back again
+    (otherwise). Returns None if no conversion is needed.
+    """
+    first = nested_types[0]
+    name = _type_name(first)
+
+    if name == "dict":
+        ## Convert each (key, val) pair, building a new dict
+        key_fxn = _compile_classes(method_spec, nested_types[1][0], \
+            to_objects)
+        val_fxn = _compile_classes(method_spec, nested_types[1][1], \
+            to_objects)
+
+        if not key_fxn and not val_fxn:
+            return dict
+
+        key_fxn = key_fxn or _identity
+        val_fxn = val_fxn or _identity
+        return lambda adict: dict([(key_fxn(key), val_fxn(val)) \
+            for key, val in adict.items()])
+
+    elif name in CONTAINER_TYPES:
+        ## Convert each element, building a new container of the same type
+        type_fxn = getattr(__builtin__, name)
+        elem_fxn = _compile_classes(method_spec, nested_types[1:], to_objects)
+
+        if elem_fxn:
+            return lambda container: type_fxn([elem_fxn(elem) \
+                for elem in container])
+        return type_fxn
+
+    elif name not in method_spec.CONSTRUCTORS:
+        ## Not a class; nothing to be done!
+        return None
+
+    ## NOTE: not currently set up to support nested classes
+    field_names = [field[0] for field in first[1]]
+
+    if not to_objects:
+        return lambda instance: tuple([getattr(instance, field_name) \
+            for field_name in field_names])
+
+    ## Get the constructor for this class
+    constructor = getattr(method_spec, name)
+    constructor_args = method_spec.CONSTRUCTORS[name]
+
+    def to_object(fields):
+        ## Instantiate the class object with nonsense args, then overwrite 
+        ## the fields with their true values
+        class_instance = constructor(*constructor_args)
+        for field_name, field_val in zip(field_names, fields):
+            setattr(class_instance, field_name, field_val)
+        return class_instance
 
-            else:
+    return to_object
 
-                ## Process each element in the original container, and add
-                ## it to our new container
-                elem_type = arg_type[1:]
-                for elem in arg_val: 
-                    converted_elem = UNCONVERT_CLASSES(method_spec, [elem], 
-                        [elem_type])
-                    container = APPEND(container, converted_elem[0])
+def _compile_arg_list(method_spec, types, to_objects):
+    """
+    Compiles a function which converts each arg in an arg list, as per 
+    _compile_classes.
+    """
+    arg_fxns = [_compile_classes(method_spec, arg_type, to_objects) \
+        or _identity for arg_type in types]
+    return lambda arg_list: tuple([arg_fxn(arg) for arg_fxn, arg \
+        in zip(arg_fxns, arg_list)])
 
-            ## Add this new container to the list
-            new_arg_list.append(container)
-            continue
+def _compile_to_objects(method_spec, types):
+    return _compile_arg_list(method_spec, types, True)
 
-        elif arg_type[0][0] not in method_spec.CONSTRUCTORS:
-            ## Base case: not a class; nothing to be done!
-            new_arg_list.append(arg_val)
-            continue
+def _compile_from_objects(method_spec, types):
+    return _compile_arg_list(method_spec, types, False)
+
+def GET_CONVERTER(method_spec, expected_types):
+    """
+    Returns the (cached) function for converting values of the given nested
+    type away from the hashable format used during generation.
+    """
+    return _cached_compile(_compile_unhash, method_spec, expected_types) \
+        or _identity
+
+def GET_CLASS_CONVERTER(method_spec, types):
+    """
+    Returns the (cached) function for converting an arg list of the given 
+    types from tuples of fields into class objects.
+    """
+    return _cached_compile(_compile_to_objects, method_spec, types)
 
-        ## Recursive case #2: class!
-        arg_type = arg_type[0]
-        class_name = arg_type[0]
-        fields = arg_type[1]
-        class_instance = arg_val
+def GET_CLASS_UNCONVERTER(method_spec, types):
+    """
+    Returns the (cached) function for converting an arg list of the given 
+    types from class objects back into tuples of fields.
+    """
+    return _cached_compile(_compile_from_objects, method_spec, types)
 
-        ## Now, overwrite the fields with their true values
-        new_fields = []
-        for j in range(len(fields)):
-            field_name = fields[j][0]
-            field_val = getattr(class_instance, field_name)
-            ## NOTE: not currently set up to support nested classes
-            new_fields.append(field_val)
+def CONTAINS_CLASSES(method_spec, types):
+    """
+    Returns True if any of the given (nested) types is a class; False 
+    otherwise.
+    """
+    for nested_types in types:
+        for subtype in nested_types:
+            if type(subtype) == type([]):
+                ## Dictionary keys and values
+                if CONTAINS_CLASSES(method_spec, subtype):
+                    return True
 
-        ## Add this class instance to the arg list
-        new_arg_list.append(tuple(new_fields))
+            elif _type_name(subtype) in method_spec.CONSTRUCTORS:
+                return True
 
-    return tuple(new_arg_list)
+    return False
 
 ###---------------------------------------------------
 ### POST-PROCESSING OF VARIABLE DEPENDENCIES:
@@ -482,42 +863,75 @@ def check_against_others(my_varnames, existing_varnames):
 ###---------------------------------------------------
 ### TOP-LEVEL PROCESSING:
 ###---------------------------------------------------
-def process_types(method_spec, types, vals, variables, process_fxns):
+def process_types(method_spec, types, vals, variables, process_fxns, \
+    fxn_args=()):
     """
     Processes all of the parameters, exhaustively generating all possible
     args for each one. Then, creates all possible arg lists by combining
     the possible args across all of the parameters.
+
+    Any fxn_args are passed on to each of the process_fxns (see 
+    process_types_rec).
     """
-    possible_args = process_types_rec(types, vals, variables, process_fxns)
+    return list(process_types_iter(method_spec, types, vals, variables, \
+        process_fxns, fxn_args))
 
+def process_types_iter(method_spec, types, vals, variables, process_fxns, \
+    fxn_args=()):
+    """
+    Generator version of process_types, which converts the arg lists one at a
+    time as they are consumed, rather than all at once.
+    """
+    possible_args = process_types_rec(types, vals, variables, process_fxns, \
+        *fxn_args)
+    return expand_arg_lists_iter(method_spec, types, \
+        combine_args(possible_args, variables))
+
+def combine_args(possible_args, variables, stats=None):
+    """
+    Creates the set of all possible arg lists from the given possible args 
+    for each parameter (as returned by process_types_rec), in their hashable
+    format. The possible args can be restricted first (e.g. to
+    some of the values of the first parameter) to only create the arg lists 
+    that use them. Given stage stats (see STAGE), the number of arg lists 
+    created, pruned by variable usage, and dropped as duplicates are added to
+    its "combine" stage.
+    """
     ## Recursively create all possible sets of parameters; in doing so,
     ## post-process the options to filter out combinations that don't satisfy
     ## variable usage
     arg_lists = []
-    generate_arg_lists(possible_args, 0, arg_lists, variables)
+    generate_arg_lists(possible_args, 0, arg_lists, variables, stats)
 
     ## Filter out duplicates:
-    arg_lists = set([arg_list[1] for arg_list in arg_lists])
+    unique_arg_lists = set([arg_list[1] for arg_list in arg_lists])
 
-    ## Convert all of the arg lists away from the hashable format
-    converted_arg_lists = []
-    for arg_list in arg_lists:
+    if stats is not None:
+        STAGE_COUNT(stats, "combine", "candidates", len(arg_lists))
+        STAGE_COUNT(stats, "combine", "duplicates", \
+            len(arg_lists) - len(unique_arg_lists))
 
-        ## Convert each individual arg in this list
-        converted_arg_list = []
-        for i in range(len(arg_list)):
-            val = arg_list[i]
-            converted_val = CHECK_CONVERT(method_spec, val, types[i])
-            converted_arg_list.append(converted_val)
+    return unique_arg_lists
 
-        converted_arg_lists.append(converted_arg_list)
+def expand_arg_lists_iter(method_spec, types, arg_lists):
+    """
+    Converts the given arg lists (as returned by combine_args) away from the
+    hashable format one at a time, as they are consumed.
+    """
+    ## Use one compiled conversion function per parameter
+    converters = [GET_CONVERTER(method_spec, subtypes) for subtypes in types]
 
-    return converted_arg_lists
+    for arg_list in arg_lists:
+
+        ## Convert each individual arg in this list
+        yield [convert(val) for convert, val in zip(converters, arg_list)]
 
-def process_types_rec(types, vals, variables, process_fxns):
+def process_types_rec(types, vals, variables, process_fxns, *fxn_args):
     """
     Processes all of the parameters, exhaustively generating all possible 
     args for each one and returning this list (of lists) of possible args.
+    Any further fxn_args (i.e. the state of the generator for the current 
+    call) are passed on to each of the process_fxns.
     """
     possible_args = []
 
@@ -534,19 +948,22 @@ def process_types_rec(types, vals, variables, process_fxns):
         if first_subtype in process_fxns:
             ## Base case: primitive type!
             first_process_fxn = process_fxns[first_subtype]
-            retval = first_process_fxn(nested_type, nested_val, 0, variables)
+            retval = first_process_fxn(nested_type, nested_val, 0, variables, \
+                *fxn_args)
 
         else:
             ## Recursive case: class!
             first_process_fxn = process_fxns[CLASS]
-            retval = first_process_fxn(nested_type, nested_val, 0, variables)
+            retval = first_process_fxn(nested_type, nested_val, 0, variables, \
+                *fxn_args)
 
         ## Add all possible args for the i-th parameter
         possible_args.append(retval)
 
     return possible_args
 
-def generate_arg_lists(possible_args, idx, arg_lists, variables):
+def generate_arg_lists(possible_args, idx, arg_lists, variables, stats=None, \
+    stage="combine"):
     """
     Given possible_args, a list of sub-lists where the i-th sub-list contains 
     all possible  values for the i-th parameter, creates and returns a list of
@@ -554,7 +971,9 @@ def generate_arg_lists(possible_args, idx, arg_lists, variables):
     containing one possible value for each parameters.
 
     Note that this is the function that makes sure all of the variable 
-    specifications are adhered to.
+    specifications are adhered to; given stage stats (see STAGE), the number
+    of (partial) arg lists pruned for violating them is added to the given 
+    stage.
 
     e.g. possible_args = [[1, 2], ["a", "b"]]
          output = [(1, "a"), (1, "b"), (2, "a"), (2, "b")]
@@ -569,13 +988,15 @@ def generate_arg_lists(possible_args, idx, arg_lists, variables):
     else:
         ## Recursive case: generate arg lists encapsulating parameters from 
         ## index idx + 1 onwards
-        generate_arg_lists(possible_args, idx + 1, arg_lists, variables)
+        generate_arg_lists(possible_args, idx + 1, arg_lists, variables, \
+            stats, stage)
         all_varnames = [possible_args[i][0] for i in range(len(possible_args))]
         this_varnames = possible_args[idx][0]
         my_possible_args = possible_args[idx][1]
 
         ## Add all valid combos including all possible values of this 
         ## (idx-th) parameter 
+        num_pruned = 0
         for i in range(len(possible_args[idx][1])):
             opt = possible_args[idx][1][i]
             opt_varnames = this_varnames[i]
@@ -599,6 +1020,11 @@ def generate_arg_lists(possible_args, idx, arg_lists, variables):
                                 combined_varnames, (opt,) + args))
                     else:
                         new_arg_lists.append((combined_varnames, (opt,) + args))
+                else:
+                    num_pruned += 1
+
+        if stats is not None:
+            STAGE_COUNT(stats, stage, "pruned", num_pruned)
 
     del arg_lists[:]
     arg_lists.extend(new_arg_lists)
@@ -1,3 +1,9 @@
+import itertools
+import math
+
+## Largest number of orders of a graph's nodes tried by canonical_graph
+MAX_RELABELINGS = 5040
+
 def validate_directed_graph(args):
     """
     Checks that the 0th arg is a valid directed graph.
@@ -181,3 +187,51 @@ def mutate_resilience(args):
         retval = not bool(len(filter(lambda x: x not in args[0], args[1]))) \
             and list(set(args[1])) == args[1]
     return retval
+
+def canonical_graph(args):
+    """
+    Canonical form for test cases whose 0th arg is a valid (directed or
+    undirected) graph, such that graphs that only differ by relabeled nodes
+    share a canonical form: the nodes are relabeled 0, 1, ..., in whichever
+    order gives the smallest sorted list of edges. Only nodes with the same
+    degrees are reordered among themselves; if that still leaves more than
+    MAX_RELABELINGS orders, only the first is tried, so some isomorphic 
+    graphs may not be collapsed.
+
+    The remaining args are left as they are, so this is only suitable if
+    they do not refer to nodes of the graph.
+    """
+    graph = args[0]
+    in_degrees = dict([(node, 0) for node in graph])
+    for nbrs in graph.values():
+        for nbr in nbrs:
+            in_degrees[nbr] += 1
+
+    ## Group the nodes by their degrees, which relabeling preserves
+    degrees = lambda node: (len(graph[node]), in_degrees[node])
+    groups = [list(group) for dummy, group in itertools.groupby( \
+        sorted(graph, key=lambda node: (degrees(node), node)), degrees)]
+
+    num_orders = 1
+    for group in groups:
+        num_orders *= math.factorial(len(group))
+
+    if num_orders > MAX_RELABELINGS:
+        group_orders = [[group] for group in groups]
+    else:
+        group_orders = [itertools.permutations(group) for group in groups]
+
+    ## Find the order of nodes that gives the smallest list of edges
+    best_edges = None
+    for orders in itertools.product(*group_orders):
+        labels = {}
+        for order in orders:
+            for node in order:
+                labels[node] = len(labels)
+
+        edges = sorted([(labels[node], labels[nbr]) for node, nbrs \
+            in graph.items() for nbr in nbrs])
+        if best_edges is None or edges < best_edges:
+            best_edges = edges
+
+    return (len(graph), tuple(best_edges)) + tuple(args[1:])
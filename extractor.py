@@ -20,9 +20,21 @@ import ast
 import astor
 import errno
 import hashlib
+import itertools
+import json
+import multiprocessing
+import operator
 import os
+import pickle
 import progress.bar
-import subprocess
+
+from utils.scan import is_archive, iter_archive, scan_files
+
+## Functions that a worker process extracts from each file (see _init_worker)
+_WORKER = {}
+
+## Number of files handed to a worker process at a time
+CHUNK_SIZE = 16
 
 class RemoveDocstrings(ast.NodeTransformer):
     """
@@ -97,28 +109,68 @@ class FindImports(ast.NodeVisitor):
     def get_imports(self):
         return self._imports
 
-class FindFxn(ast.NodeVisitor):
+class ModuleIndex():
     """
-    Helper class for finding top-level function definition.
+    Index of a parsed module: its imports, its top-level function
+    definitions, and the names each of those functions calls. Source code
+    and call names are computed once per function and cached, so any number
+    of functions (and their helpers) can be extracted from one parse.
     """
-    def __init__(self, fxnname):
-        ast.NodeVisitor.__init__(self)
-        self._fxnname = fxnname
-        self._found = False
-        self._fxnnode = None
+    def __init__(self, tree):
+        self._tree = tree
+        self._fxnnodes = {}
+        self._sources = {}
+        self._calls = {}
+        self._module_source = None
+
+        ## Keep the first top-level definition of each name
+        for child in ast.iter_child_nodes(tree):
+            if isinstance(child, ast.FunctionDef) and \
+                child.name not in self._fxnnodes:
+                self._fxnnodes[child.name] = child
+
+        import_finder = FindImports()
+        import_finder.visit(tree)
+        self._imports = import_finder.get_imports()
+
+    def has_fxn(self, fxnname):
+        return fxnname in self._fxnnodes
 
-    def visit_Module(self, node):
-        for child in ast.iter_child_nodes(node):
-            if isinstance(child, ast.FunctionDef) and (child.name == self._fxnname):
-                self._found = True
-                self._fxnnode = child
-                break
+    def get_imports(self):
+        return self._imports
 
-    def has_fxn(self):
-        return self._found
+    def get_source(self, fxnname):
+        """
+        Return the source of the given function, without docstrings.
+        """
+        if fxnname not in self._sources:
+            ## Stripping docstrings mutates the node, so only do it once
+            node = RemoveDocstrings().visit(self._fxnnodes[fxnname])
+            self._sources[fxnname] = astor.to_source(node)
+        return self._sources[fxnname]
 
-    def get_fxn(self):
-        return self._fxnnode
+    def get_calls(self, fxnname):
+        """
+        Return the set of names called by the given function.
+        """
+        if fxnname not in self._calls:
+            ## Docstrings must be stripped before looking for calls
+            self.get_source(fxnname)
+            helper_finder = FindHelpers()
+            helper_finder.visit(self._fxnnodes[fxnname])
+            self._calls[fxnname] = helper_finder.get_names()
+        return self._calls[fxnname]
+
+    def get_module_source(self):
+        """
+        Return the source of the entire module, without top level calls or
+        docstrings.
+        """
+        if self._module_source is None:
+            node = RemoveTopLevelCalls().visit(self._tree)
+            node = RemoveDocstrings().visit(node)
+            self._module_source = astor.to_source(node)
+        return self._module_source
 
 class RemoveTopLevelCalls(ast.NodeTransformer):
     """
@@ -155,26 +207,274 @@ class RemoveTopLevelCalls(ast.NodeTransformer):
         newname = ast.Name("None", ast.Load())
         return newname
 
-def get_last(line):
-    words = line.split()
-    return words[-1]
+class FoldConstants(ast.NodeTransformer):
+    """
+    Node transformer to replace arithmetic on numeric constants, and the
+    concatenation of string constants, with the resulting constant.
+    """
+    ## True division is not folded, as its result depends on the imports
+    NUM_OPS = {ast.Add: operator.add, ast.Sub: operator.sub,
+               ast.Mult: operator.mul, ast.FloorDiv: operator.floordiv,
+               ast.Mod: operator.mod, ast.Pow: operator.pow,
+               ast.LShift: operator.lshift, ast.RShift: operator.rshift,
+               ast.BitOr: operator.or_, ast.BitAnd: operator.and_,
+               ast.BitXor: operator.xor}
+    UNARY_OPS = {ast.USub: operator.neg, ast.UAdd: operator.pos,
+                 ast.Invert: operator.invert}
+
+    ## Largest operands of the operators that can produce huge results
+    MAX_EXPONENT = 64
+    MAX_BASE = 2**64
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        left, right, op = node.left, node.right, type(node.op)
+        if isinstance(left, ast.Str) and isinstance(right, ast.Str) and \
+            op == ast.Add and type(left.s) == type(right.s):
+            return ast.copy_location(ast.Str(left.s + right.s), node)
+
+        if not (isinstance(left, ast.Num) and isinstance(right, ast.Num) \
+            and op in self.NUM_OPS):
+            return node
+        try:
+            if op in (ast.Pow, ast.LShift) and \
+                (abs(right.n) > self.MAX_EXPONENT or \
+                abs(left.n) > self.MAX_BASE):
+                return node
+            value = self.NUM_OPS[op](left.n, right.n)
+        except Exception:
+            return node
+        return ast.copy_location(ast.Num(value), node)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.operand, ast.Num) and \
+            type(node.op) in self.UNARY_OPS:
+            try:
+                value = self.UNARY_OPS[type(node.op)](node.operand.n)
+            except Exception:
+                return node
+            return ast.copy_location(ast.Num(value), node)
+        return node
+
+class FindBindings(ast.NodeVisitor):
+    """
+    Helper class for finding the names bound in the scope of a function:
+    its parameters, and the names assigned to in its body, but not in the 
+    bodies of nested functions, lambdas, classes, or generator 
+    expressions.
+    """
+    def __init__(self):
+        ast.NodeVisitor.__init__(self)
+        self._bound = set([])
+
+    def visit_Name(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self._bound.add(node.id)
+
+    def visit_FunctionDef(self, node):
+        self._bound.add(node.name)
+        ## Defaults and decorators are evaluated in the enclosing scope
+        for expr in node.args.defaults + node.decorator_list:
+            self.visit(expr)
+
+    def visit_ClassDef(self, node):
+        self._bound.add(node.name)
+        for expr in node.bases + node.decorator_list:
+            self.visit(expr)
+
+    def visit_Lambda(self, node):
+        for expr in node.args.defaults:
+            self.visit(expr)
+
+    def visit_GeneratorExp(self, node):
+        pass
+
+    def visit_SetComp(self, node):
+        pass
+
+    def visit_DictComp(self, node):
+        pass
+
+    def get_names(self):
+        return self._bound
+
+class RenameNames(ast.NodeTransformer):
+    """
+    Node transformer to rename each of the given names, wherever it is 
+    used, to the given prefix followed by the order in which it was first
+    seen.
+    """
+    def __init__(self, names, prefix):
+        ast.NodeTransformer.__init__(self)
+        self._names = names
+        self._prefix = prefix
+        self.mapping = {}
+        self.order = []
+
+    def rename(self, name):
+        if name not in self._names:
+            return name
+        if name not in self.mapping:
+            self.mapping[name] = self._prefix + str(len(self.order))
+            self.order.append(name)
+        return self.mapping[name]
+
+    def visit_Name(self, node):
+        node.id = self.rename(node.id)
+        return node
+
+    def visit_FunctionDef(self, node):
+        node.name = self.rename(node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_ClassDef(self, node):
+        node.name = self.rename(node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_arguments(self, node):
+        for arg in node.args:
+            self.visit(arg)
+        if node.vararg:
+            node.vararg = self.rename(node.vararg)
+        if node.kwarg:
+            node.kwarg = self.rename(node.kwarg)
+        for default in node.defaults:
+            self.visit(default)
+        return node
+
+## Calls that can refer to local variables by name, which therefore cannot be
+## renamed
+DYNAMIC_NAMES = set(["eval", "execfile", "locals", "vars"])
 
-def is_pyfile(filename):
-    if filename.endswith(".py"):
-        return True
+def rename_locals(node, keywords=None):
+    """
+    Rename the parameters and local variables of the given function 
+    definition, in the order they are first seen, unless it refers to
+    its variables dynamically. Parameters named in keywords, the set of 
+    names passed by keyword in the surrounding code, keep their names; if
+    keywords is None, no parameters are renamed.
+    """
+    excluded = set([])
+    for child in ast.walk(node):
+        if isinstance(child, ast.Exec) or (isinstance(child, ast.Call) and \
+            isinstance(child.func, ast.Name) and \
+            child.func.id in DYNAMIC_NAMES):
+            return
+        elif isinstance(child, ast.Global):
+            excluded.update(child.names)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            ## Renaming these would change what is imported
+            for alias in child.names:
+                excluded.add(alias.asname or alias.name.split(".")[0])
+
+    binding_finder = FindBindings()
+    for arg in node.args.args:
+        binding_finder.visit(arg)
+    params = binding_finder.get_names()
+    if keywords is None:
+        excluded.update(params)
     else:
-        return False
+        excluded.update(params.intersection(keywords))
+
+    for stmt in node.body:
+        binding_finder.visit(stmt)
+    bound = binding_finder.get_names()
+    bound.update([name for name in (node.args.vararg, node.args.kwarg) 
+        if name])
+
+    ## The function's own defaults and decorators are not in its scope
+    renamer = RenameNames(bound.difference(excluded), "#v")
+    for arg in node.args.args:
+        renamer.visit(arg)
+    if node.args.vararg:
+        node.args.vararg = renamer.rename(node.args.vararg)
+    if node.args.kwarg:
+        node.args.kwarg = renamer.rename(node.args.kwarg)
+    for stmt in node.body:
+        renamer.visit(stmt)
+
+def normalize(codestr, funcname):
+    """
+    Returns a normalized form of the given extracted code, which is the 
+    same for implementations that differ only in their imports, constant 
+    expressions, the names of their parameters, local variables, and helper
+    functions, or the order of their helper functions.
+    """
+    tree = ast.parse(codestr)
+    tree = FoldConstants().visit(tree)
+
+    ## Keep the first definition of each function, as the extractor does;
+    ## imports are not part of the normalized form
+    fxnnodes = {}
+    fxnnames = []
+    others = []
+    for child in tree.body:
+        if isinstance(child, ast.FunctionDef):
+            if child.name not in fxnnodes:
+                fxnnodes[child.name] = child
+                fxnnames.append(child.name)
+        elif not isinstance(child, (ast.Import, ast.ImportFrom)):
+            others.append(child)
+
+    ## Calls may pass parameters by keyword, so those must keep their names;
+    ## a **kwargs argument could pass any of them
+    keywords = set([])
+    for child in ast.walk(tree):
+        if isinstance(child, ast.Call):
+            if child.kwargs:
+                keywords = None
+                break
+            keywords.update([keyword.arg for keyword in child.keywords])
+
+    for fxnname in fxnnames:
+        rename_locals(fxnnodes[fxnname], keywords)
+
+    ## Number the helpers in the order they are first called, starting from 
+    ## the extracted function, and order them by that number
+    helper_names = set(fxnnames).difference([funcname])
+    renamer = RenameNames(helper_names, "#h")
+    if funcname in fxnnodes:
+        renamer.visit(fxnnodes[funcname])
+    visited = 0
+    for fxnname in [funcname] + fxnnames:
+        ## Helpers that are never called are numbered in the order defined
+        renamer.rename(fxnname)
+        while visited < len(renamer.order):
+            renamer.visit(fxnnodes[renamer.order[visited]])
+            visited += 1
+    for child in others:
+        renamer.visit(child)
+
+    body = [fxnnodes[fxnname] for fxnname in [funcname] + renamer.order
+        if fxnname in fxnnodes]
+    return ast.dump(ast.Module(body + others))
 
 def main(inputdir, outputdir, funcnos, funcnames,
-    funconly=False, funcplushelpers=True, savedfilelist=""):
+    funconly=False, funcplushelpers=True, savedfilelist="", jobs=1,
+    patterns=("*.py",), recursive=False, normalize_code=False, 
+    manifestpath=None, use_manifest=True):
     """
-    inputdir - name of input directory
+    inputdir - name of input directory, or of a .zip or tar archive
     outputdir - name of output directory
     funcname  - name of function of interest
     funconly  - boolean indicating if only function should be extracted
     funcplushelpers - boolean indicating if only function + its helper functions should be extracted
     savedfilelist - name of JSON file containing list of files to extract from
                     if empty string, then ignored
+    jobs - number of worker processes to extract files across
+    patterns - glob patterns of the names of files to extract from
+    recursive - boolean indicating if files in subdirectories of inputdir 
+                should be extracted from as well
+    normalize_code - boolean indicating if implementations with the same 
+                     normalized form (see normalize), rather than the same
+                     code, should be treated as duplicates
+    manifestpath - name of the file recording what was extracted from each
+                   file (see load_manifest), or None if not recorded
+    use_manifest - boolean indicating if files that are unchanged since 
+                   they were recorded in the manifest should be skipped
     """
     ## Create output directory
     for funcno in funcnos:
@@ -184,136 +484,361 @@ def main(inputdir, outputdir, funcnos, funcnames,
             if ex.errno != errno.EEXIST:
                 raise
 
-    s = subprocess.Popen("ls -l " + inputdir,
-                         shell=True,
-                         stdout=subprocess.PIPE)
-    listing = s.communicate()[0]
-    lines = listing.split('\n')
-    lines = lines[1:-1]
-    files = map(get_last, lines)
-
-    filenames = filter(is_pyfile, files)
-    filenames = [os.path.abspath(inputdir) + "/" + filename 
-        for filename in filenames]
+    ## Only files that have changed since the last extraction with the same
+    ## options need to be extracted from again
+    key = manifest_key(inputdir, funconly, funcplushelpers, normalize_code)
+    manifest = {}
+    if manifestpath and use_manifest:
+        manifest = load_manifest(manifestpath, key)
+
+    ## Mapping of {path of file, relative to input directory: (manifest 
+    ## entry, contents)}; an archive is read in a single pass rather than 
+    ## unpacked, keeping only the contents of the files that changed
+    sources = {}
+    if is_archive(inputdir):
+        for relpath, size, mtime, contents in iter_archive(inputdir, \
+            patterns, recursive):
+            entry = _manifest_entry(manifest, relpath, size, mtime, \
+                funcnames, lambda: contents)
+            if "results" in entry:
+                contents = None
+            sources[relpath] = (entry, contents)
+    else:
+        for relpath in scan_files(inputdir, patterns, recursive):
+            filename = os.path.join(inputdir, relpath)
+            stat = os.stat(filename)
+            entry = _manifest_entry(manifest, relpath, stat.st_size, \
+                stat.st_mtime, funcnames, lambda: _read(filename))
+            sources[relpath] = (entry, None)
+
+    ## Files are extracted from in sorted order, so that the same one of a 
+    ## set of duplicates is kept on every run
+    relpaths = sorted(sources)
+    entries = [sources[relpath][0] for relpath in relpaths]
+    changed = [(os.path.abspath(inputdir) + "/" + relpath, 
+        sources[relpath][1]) for relpath, entry 
+        in itertools.izip(relpaths, entries) if "results" not in entry]
 
     bar = progress.bar.ChargingBar("   -- Extracting", 
-        max=len(filenames))
+        max=len(relpaths))
+
+    ## Files are parsed, extracted, and hashed across worker processes, but 
+    ## merged in order, so the output is the same for any number of jobs
+    pool = None
+    if jobs > 1 and len(changed) > 1:
+        pool = multiprocessing.Pool(jobs, _init_worker, (funcnames, \
+            funconly, funcplushelpers, normalize_code))
+        results = pool.imap(_extract_worker_file, changed, CHUNK_SIZE)
+    else:
+        results = (_extract_file(filename, contents, funcnames, funconly, \
+            funcplushelpers, normalize_code) for filename, contents \
+            in changed)
     
+    ## Deduplicated implementations are kept in memory until all files have
+    ## been seen, as a later duplicate may replace an earlier one
     fname_to_codestr = {}
+    fname_to_idx = {}
     funchashset = {}
 
+    ## Mapping of {kept file: [files dropped as its duplicates]}, so that the
+    ## results of testing the kept file can be fanned back out
+    fname_to_dups = {}
+
     numdups = [0]*len(funcnos)
     numunique = [0]*len(funcnos)
     numbadfilesfunc = [0]*len(funcnos)
 
-    for filename in filenames:
-        bar.next()
-        ## Read the file
-        pyfile = open(filename)
-        pystr = pyfile.read()
-
-        for idx in range(len(funcnos)):
-            funcno = funcnos[idx]
-            funcname = funcnames[idx]
-
-            outfilename = outputdir + str(funcno) + "/" + funcname + "_" \
-                + filename[filename.rfind("/")+1:]
-
-            ## Parse the file; must be in try/except, as may not be parseable
-            try:
-                tree = ast.parse(pystr)
-            except Exception as err:
-                numbadfilesfunc[idx] += 1
-                continue
-
-            codestr, codestr_no_imports = extract(tree, funcname, \
-                funconly, funcplushelpers, filename, set([]))
-            if not codestr:
+    ## Reap the worker processes even if a worker or the merge fails
+    try:
+        for relpath, entry in itertools.izip(relpaths, entries):
+            bar.next()
+            if "results" not in entry:
+                ## Keep the results for other functions, recorded previously
+                extracted = results.next()
+                previous = entry.pop("previous", {})
+                if extracted is None:
+                    entry["results"] = None
+                else:
+                    previous.update(itertools.izip(funcnames, extracted))
+                    entry["results"] = previous
+            elif entry["results"] is None:
+                extracted = None
+            else:
+                extracted = [entry["results"][funcname] 
+                    for funcname in funcnames]
+
+            if extracted is None:
+                ## The file could not be parsed
+                for idx in range(len(funcnos)):
+                    numbadfilesfunc[idx] += 1
                 continue
 
-            ## Hash the function using md5 to eliminate duplicates
-            codehash = hashlib.md5(codestr_no_imports).hexdigest()
-                
-            if codehash in funchashset:
-                ## We have already seen this implementation
-                numdups[idx] += 1
+            for idx in range(len(funcnos)):
+                funcno = funcnos[idx]
+                funcname = funcnames[idx]
 
-                ## Take the longest one to ensure we get all imports
-                if len(codestr) > len(fname_to_codestr[funchashset[codehash]]):
-                    del fname_to_codestr[funchashset[codehash]]
-                    funchashset[codehash] = outfilename
-                    fname_to_codestr[outfilename] = codestr
+                ## Files in subdirectories are flattened into the output 
+                ## directory
+                outfilename = outputdir + str(funcno) + "/" + funcname + "_" \
+                    + relpath.replace(os.sep, "_")
 
-                continue
+                codestr, codehash = extracted[idx]
+                if not codestr:
+                    continue
+                
+                if codehash in funchashset:
+                    ## We have already seen this implementation
+                    numdups[idx] += 1
+
+                    ## Take the longest one to ensure we get all imports
+                    keptfilename = funchashset[codehash]
+                    if len(codestr) > len(fname_to_codestr[keptfilename]):
+                        del fname_to_codestr[keptfilename]
+                        del fname_to_idx[keptfilename]
+                        funchashset[codehash] = outfilename
+                        fname_to_codestr[outfilename] = codestr
+                        fname_to_idx[outfilename] = idx
+                        fname_to_dups[outfilename] = \
+                            fname_to_dups.pop(keptfilename) + [keptfilename]
+                    else:
+                        fname_to_dups[keptfilename].append(outfilename)
+
+                    continue
+
+                funchashset[codehash] = outfilename
+                fname_to_codestr[outfilename] = codestr
+                fname_to_idx[outfilename] = idx
+                fname_to_dups[outfilename] = []
+                numunique[idx] += 1
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    ## Remove the files kept by an earlier extraction that are no longer 
+    ## kept, as everything in the output directory is tested; files not 
+    ## named like extracted ones (such as mutants) are left alone
+    for idx in range(len(funcnos)):
+        funcdir = outputdir + str(funcnos[idx])
+        for fname in scan_files(funcdir, [funcnames[idx] + "_*.py"]):
+            if funcdir + "/" + fname not in fname_to_codestr:
+                os.remove(funcdir + "/" + fname)
+
+    ## Write each implementation exactly once, now that it is final
+    numbyteswritten = [0]*len(funcnos)
+    for outfilename in sorted(fname_to_codestr):
+        codestr = fname_to_codestr[outfilename]
+        outf = open(outfilename, "w+")
+        outf.write(codestr)
+        outf.close()
+        numbyteswritten[fname_to_idx[outfilename]] += len(codestr)
+
+    ## Write the mapping of {dropped file: kept file} of each function next
+    ## to its output directory
+    equivalences = [{} for funcno in funcnos]
+    for outfilename, dups in fname_to_dups.items():
+        for dupfilename in dups:
+            equivalences[fname_to_idx[outfilename]][ \
+                os.path.basename(dupfilename)] = \
+                os.path.basename(outfilename)
+    for idx in range(len(funcnos)):
+        outf = open(outputdir + str(funcnos[idx]) + ".equivalences.json", 
+            "w+")
+        json.dump(equivalences[idx], outf, indent=2, sort_keys=True)
+        outf.close()
 
-            funchashset[codehash] = outfilename
-            fname_to_codestr[outfilename] = codestr
-            numunique[idx] += 1
+    if manifestpath:
+        write_manifest(manifestpath, key, dict(itertools.izip(relpaths, 
+            entries)))
 
-            for outfilename, codestr in fname_to_codestr.items():
-                ## Write to a file
-                outf = open(outfilename, "w+")
-                outf.write(codestr)
-                outf.close()
+    print "\n      Unchanged files skipped:", len(relpaths) - len(changed)
 
     for idx in range(len(funcnos)):
         print "\n      Funcname:", funcnames[idx]
         print "      Dups:", numdups[idx]
         print "      Unique:", numunique[idx]
         print "      Bad files with func:", numbadfilesfunc[idx]
+        print "      Bytes written:", numbyteswritten[idx]
 
     bar.finish()
 
-def extract(tree, funcname, funconly, funcplushelpers,  
+def manifest_key(inputdir, funconly, funcplushelpers, normalize_code):
+    """
+    Returns the key under which the results of extracting from the given 
+    input directory with the given options are recorded (see 
+    load_manifest): a hash of the input directory, the options, and the 
+    extractor itself.
+    """
+    digest = hashlib.md5()
+    digest.update(repr([os.path.abspath(inputdir), funconly, 
+        funcplushelpers, normalize_code]))
+    extractorfile = open(os.path.splitext(os.path.abspath(__file__))[0] \
+        + ".py")
+    digest.update(extractorfile.read())
+    extractorfile.close()
+    return digest.hexdigest()
+
+def load_manifest(path, key):
+    """
+    Returns the manifest written to the given path (see write_manifest), 
+    if it was recorded under the given key; otherwise, an empty one. The 
+    manifest maps {path of file, relative to input directory: entry}, where
+    each entry records the size, mtime, and md5 hash of the file, and 
+    either None, if the file could not be parsed, or a mapping of 
+    {funcname: (code string, hash)} for each function extracted from it 
+    (see _extract_file).
+    """
+    try:
+        f = open(path, "rb")
+        manifest = pickle.load(f)
+        f.close()
+    except Exception:
+        return {}
+
+    if manifest.get("key") != key:
+        return {}
+    return manifest["files"]
+
+def write_manifest(path, key, files):
+    """
+    Pickles the given manifest, recorded under the given key, to the given
+    path, writing to a temporary file first so that an interrupted write 
+    never leaves a truncated one behind.
+    """
+    f = open(path + ".tmp", "wb")
+    pickle.dump({"key": key, "files": files}, f, pickle.HIGHEST_PROTOCOL)
+    f.close()
+    os.rename(path + ".tmp", path)
+
+def _manifest_entry(manifest, relpath, size, mtime, funcnames, read_fxn):
+    """
+    Returns the manifest entry for the given file, with its results if they
+    can be reused: the file has the same size and mtime as recorded or, 
+    failing that, the same md5 hash of its contents (as returned by 
+    read_fxn), and all of the given functions were extracted from it. 
+    Otherwise, the entry has no results, and any that were recorded are
+    kept under "previous".
+    """
+    entry = {"size": size, "mtime": mtime}
+    recorded = manifest.get(relpath)
+
+    if recorded and (recorded["size"], recorded["mtime"]) == (size, mtime):
+        entry["md5"] = recorded["md5"]
+    else:
+        entry["md5"] = hashlib.md5(read_fxn()).hexdigest()
+
+    if recorded and recorded["md5"] == entry["md5"]:
+        results = recorded["results"]
+        if results is None or all([funcname in results 
+            for funcname in funcnames]):
+            entry["results"] = results
+        else:
+            entry["previous"] = results
+
+    return entry
+
+def _read(filename):
+    """
+    Returns the contents of the given file.
+    """
+    pyfile = open(filename, "rb")
+    pystr = pyfile.read()
+    pyfile.close()
+    return pystr
+
+def _extract_file(filename, contents, funcnames, funconly, funcplushelpers, 
+    normalize_code=False):
+    """
+    Parse the given file (read from disk, unless its contents are given) 
+    once and extract each of the given functions from it. Returns None if
+    the file cannot be parsed; otherwise, a list with the code string of 
+    each function (empty if it could not be extracted) and the md5 hash 
+    used to eliminate duplicates, of its normalized form if normalize_code.
+    """
+    ## Read the file
+    if contents is None:
+        pystr = _read(filename)
+    else:
+        pystr = contents
+
+    ## Parse the file; must be in try/except, as may not be parseable
+    try:
+        index = ModuleIndex(ast.parse(pystr))
+    except Exception as err:
+        return None
+
+    extracted = []
+    for funcname in funcnames:
+        codestr, codestr_no_imports = extract(index, funcname, \
+            funconly, funcplushelpers, filename, set([]))
+        if not codestr:
+            extracted.append(("", None))
+            continue
+
+        ## Hash the function using md5 to eliminate duplicates
+        if normalize_code:
+            codehash = hashlib.md5(normalize(codestr, funcname)).hexdigest()
+        else:
+            codehash = hashlib.md5(codestr_no_imports).hexdigest()
+        extracted.append((codestr, codehash))
+
+    return extracted
+
+def _init_worker(funcnames, funconly, funcplushelpers, normalize_code):
+    """
+    Initializes a worker process to extract the given functions.
+    """
+    _WORKER["funcnames"] = funcnames
+    _WORKER["funconly"] = funconly
+    _WORKER["funcplushelpers"] = funcplushelpers
+    _WORKER["normalize_code"] = normalize_code
+
+def _extract_worker_file(source):
+    """
+    Extracts the functions from the given (filename, contents) (see 
+    _extract_file) in a worker process.
+    """
+    filename, contents = source
+    return _extract_file(filename, contents, _WORKER["funcnames"], \
+        _WORKER["funconly"], _WORKER["funcplushelpers"], \
+        _WORKER["normalize_code"])
+
+def extract(index, funcname, funconly, funcplushelpers,  
     filename, helper_names):
     """
-    Extract the given function from the given AST.
+    Extract the given function from the given module index.
     """
     codestr_no_imports = ""
     codestr = ""
 
-    ## Look for the function node 
-    finder = FindFxn(funcname)
-    finder.visit(tree)
-    found = finder.has_fxn()
-
-    import_finder = FindImports()
-    import_finder.visit(tree)
-
     importstr = ""
     if not helper_names:
-        for import_str in import_finder.get_imports():
+        for import_str in index.get_imports():
             importstr += import_str + "\n"
         importstr += "\n"
 
-    if found: 
+    if index.has_fxn(funcname): 
         ## Found the function
         if funconly or funcplushelpers:
             ## Only extract function
-            node = finder.get_fxn()
+            source = index.get_source(funcname)
         else:
             ## Extract entire module without top level calls
-            node = RemoveTopLevelCalls().visit(tree)
-
-        ## Remove docstrings
-        node = RemoveDocstrings().visit(node)
+            source = index.get_module_source()
 
-        ## Convert the modified module to source code string
-        codestr = importstr + astor.to_source(node)
-        codestr_no_imports = astor.to_source(node)
+        ## Prepend the imports to the source code string
+        codestr = importstr + source
+        codestr_no_imports = source
 
         ## Extract all helper functions
         if funcplushelpers:
-            subtree = ast.parse(codestr)
-            helper_finder = FindHelpers()
-            helper_finder.visit(subtree)
-            names = helper_finder.get_names()
+            names = index.get_calls(funcname)
             new_helper_names = names.difference(helper_names)
             helper_names = helper_names.union(new_helper_names)
 
             for helper_name in new_helper_names:
                 helper_codestr, helper_codestr_no_imports = \
-                    extract(tree, helper_name, \
+                    extract(index, helper_name, \
                     funconly, funcplushelpers, \
                     filename, helper_names)
                 if helper_codestr:
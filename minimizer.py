@@ -0,0 +1,224 @@
+"""
+Copyright 2015-2017 Rebecca Smith, Terry Tang, Joe Warren, and Scott Rixner
+
+This file is part of Testception.
+
+Testception is free software: you can redistribute it and/or modify it under 
+the terms of the GNU General Public License as published by the Free Software 
+Foundation, either version 3 of the License, or (at your option) any later 
+version.
+
+Testception is distributed in the hope that it will be useful, but WITHOUT ANY 
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR 
+A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with 
+Testception. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import importlib
+import itertools
+import os
+import pickle
+
+import progression_scheduler
+
+## Largest number of subsets of test cases to try when searching for a 
+## minimum subset exactly; beyond this, the greedy subset is kept
+EXACT_LIMIT = 100000
+
+## First line of a base test set file written by minimize_base_set
+MINIMIZED_HEADER = "## Minimized base test set; the full one is in " \
+    + "{0}_full.py\n"
+
+def _pair_masks(signatures, num_cases):
+    """
+    Returns a list mapping each test case index to a bitmask of the pairs of 
+    signatures (sets of failed test case indices) that it tells apart, i.e., 
+    those for which it is in one signature but not the other.
+    """
+    masks = [0] * num_cases
+    bit = 1
+    for sig0, sig1 in itertools.combinations(signatures, 2):
+        for ind in sig0 ^ sig1:
+            masks[ind] |= bit
+        bit <<= 1
+    return masks
+
+def _greedy_cover(masks, full):
+    """
+    Returns a list of indices into masks whose union is full, picked greedily
+    by the number of uncovered bits, with any that turn out to be redundant 
+    removed again.
+    """
+    picked = []
+    covered = 0
+    while covered != full:
+        best = max(range(len(masks)), 
+            key=lambda ind: (bin(masks[ind] & ~covered).count("1"), -ind))
+        picked.append(best)
+        covered |= masks[best]
+
+    ## Drop any index covered by the others, latest picks first
+    for ind in list(reversed(picked)):
+        others = 0
+        for other in picked:
+            if other != ind:
+                others |= masks[other]
+        if others == full:
+            picked.remove(ind)
+
+    return picked
+
+def _exact_cover(masks, full, upper):
+    """
+    Returns a smallest list of indices into masks whose union is full, if 
+    there is one with fewer than upper indices; otherwise, returns None.
+    """
+    for size in range(1, upper):
+        for subset in itertools.combinations(range(len(masks)), size):
+            union = 0
+            for ind in subset:
+                union |= masks[ind]
+            if union == full:
+                return list(subset)
+
+    return None
+
+def _num_subsets(n, upper):
+    """
+    Returns the number of non-empty subsets of n items with fewer than upper
+    items.
+    """
+    total = 0
+    num_combinations = 1
+    for size in range(1, upper):
+        num_combinations = num_combinations * (n - size + 1) / size
+        total += num_combinations
+    return total
+
+def minimal_cases(file_case, num_cases):
+    """
+    Given the mapping of {file_index: set([failed test case indices])} from a
+    test run on num_cases test cases, returns the indices (in ascending 
+    order) of a minimum or near-minimum subset of the test cases that 
+    partitions the files into signatures exactly as the full set does, and 
+    leaves every signature with at least one failed test case non-empty. 
+    Also returns whether the subset is known to be minimum.
+    """
+    signatures = set([frozenset(failed) for failed in file_case.values()])
+    signatures.add(frozenset())
+    masks = _pair_masks(list(signatures), num_cases)
+
+    ## Test cases that tell apart the same pairs are interchangeable, so only
+    ## the first of each is considered
+    firsts = {}
+    for ind, mask in enumerate(masks):
+        if mask and mask not in firsts:
+            firsts[mask] = ind
+    candidates = sorted(firsts.values())
+    candidate_masks = [masks[ind] for ind in candidates]
+
+    full = 0
+    for mask in candidate_masks:
+        full |= mask
+
+    ## Improve on the greedy subset by exhaustive search, if small enough
+    picked = _greedy_cover(candidate_masks, full)
+    is_minimum = _num_subsets(len(candidates), len(picked)) <= EXACT_LIMIT
+    if is_minimum:
+        smaller = _exact_cover(candidate_masks, full, len(picked))
+        if smaller is not None:
+            picked = smaller
+
+    ## Keep at least one test case, so that the result is still usable as a
+    ## base test set
+    idxs = sorted([candidates[ind] for ind in picked])
+    if not idxs and num_cases:
+        idxs = [0]
+
+    return idxs, is_minimum
+
+def minimize_base_set(projno, funcno, importdir):
+    """
+    For the given function, reduce the base test set to a minimum or 
+    near-minimum subset that gives the same signatures as the last test run 
+    (see minimal_cases). The reduced base test set replaces the generated one
+    (which is kept alongside it, suffixed with _full, unless it was itself 
+    reduced), and is also stored with the test results, for the runtime 
+    checks when scheduling the progression.
+    """
+    tester = progression_scheduler.load_pickle(projno, funcno, importdir)
+    if not tester:
+        ## Error loading pickle file
+        return -1
+
+    num_cases = len(tester.case_map.keys())
+    idxs, is_minimum = minimal_cases(tester.file_case, num_cases)
+
+    ## Split the kept indices between the exhaustive, randomized, and 
+    ## appended test cases (see delta_generator), which are written to file
+    ## without any instantiated classes
+    base_set_name = "proj" + str(projno) + "_func" + str(funcno)
+    base_set_path = os.getcwd() + "/base_set_generation/output/" \
+        + base_set_name + ".py"
+    try:
+        bts_mod = importlib.import_module("base_set_generation.output." \
+            + base_set_name)
+        bts_mod = reload(bts_mod)
+    except:
+        print " ERROR: run gen to generate base test set"
+        return -1
+
+    all_cases = bts_mod.EXHAUSTIVE_CASES + bts_mod.RANDOMIZED_CASES \
+        + getattr(bts_mod, "APPENDED_CASES", [])
+    if len(all_cases) != num_cases:
+        print " ERROR: base test set has changed since the last test run; " \
+            + "please run test again"
+        return -1
+
+    num_exhaustive = len(bts_mod.EXHAUSTIVE_CASES)
+    num_generated = num_exhaustive + len(bts_mod.RANDOMIZED_CASES)
+    exhaustive_cases = [all_cases[ind] for ind in idxs \
+        if ind < num_exhaustive]
+    randomized_cases = [all_cases[ind] for ind in idxs \
+        if num_exhaustive <= ind < num_generated]
+    appended_cases = [all_cases[ind] for ind in idxs \
+        if ind >= num_generated]
+
+    header = MINIMIZED_HEADER.format(base_set_name)
+    f = open(base_set_path)
+    minimized = (f.readline() == header)
+    f.close()
+    if not minimized:
+        os.rename(base_set_path, base_set_path[:-3] + "_full.py")
+
+    f = open(base_set_path, "w")
+    f.write(header)
+    f.write("EXHAUSTIVE_CASES = ")
+    f.write(repr(exhaustive_cases))
+    f.write("\n")
+    f.write("RANDOMIZED_CASES = ")
+    f.write(repr(randomized_cases))
+    if appended_cases:
+        f.write("\n")
+        f.write("APPENDED_CASES = ")
+        f.write(repr(appended_cases))
+    f.close()
+
+    ## Store the reduced set with the test results
+    tester.min_set = [tester.case_map[ind] for ind in idxs]
+    results_filename = "./test_output/" + base_set_name + ".pickle"
+    f_results = open(results_filename, "w+")
+    pickle.dump(tester, f_results)
+    f_results.close()
+
+    if is_minimum:
+        kind = "minimum"
+    else:
+        kind = "near-minimum"
+
+    print "   -- Kept {0} of {1} test cases ({2}), giving the same {3} " \
+        "signatures for {4} files".format(len(idxs), num_cases, kind, 
+        len(set([frozenset(failed) for failed \
+        in tester.file_case.values()])), len(tester.file_case))
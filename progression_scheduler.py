@@ -31,6 +31,8 @@ from radon.raw import analyze
 from radon.metrics import mi_visit
 from radon.complexity import cc_visit
 
+from utils.scan import scan_files
+
 ## Cutoff number of programs that share the same signature below which we will 
 ## throw out the signature as too obscure
 MIN_SIGNATURE_SIZE = 1
@@ -120,8 +122,7 @@ def program_complexity(projno, funcno):
 
     path = os.getcwd() + \
         "/extracted_files/proj{0}_func{1}/".format(projno, funcno)
-    for fname in os.listdir(path):
-        if fname[-4:] == '.pyc': continue
+    for fname in scan_files(path, ["*.py"]):
         try: 
             f = open(path + fname)
             content = f.read()
@@ -144,9 +145,7 @@ def program_length(projno, funcno):
 
     path = os.getcwd() + \
         "/extracted_files/proj{0}_func{1}/".format(projno, funcno)
-    for fname in os.listdir(path):
-        if fname[-4:] == '.pyc': 
-            continue
+    for fname in scan_files(path, ["*.py"]):
         try: 
             f = open(path + fname)
             lines = f.readlines()
@@ -205,7 +204,8 @@ def pick_programs(projno, funcno, importdir):
 
                     start_time = time.time()
                     test_flag = test_candidate(projno, funcno, 
-                        allfilelist[candidate], tester.base_set)
+                        allfilelist[candidate], getattr(tester, "min_set", 
+                        tester.base_set))
                     duration = time.time() - start_time
                     if test_flag and duration < MAX_RUNTIME_S: 
                         f = open(os.getcwd() + "/extracted_files/proj" \
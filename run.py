@@ -22,13 +22,22 @@ import argparse
 import importlib 
 import json
 import os
+import resource
 import sys
+import time
 
 import base_set_generation.config_file_parser as cfp
+import base_set_generation.coverage_selector as covsel
+import base_set_generation.delta_generator as dgen
+import base_set_generation.exhaustive_generator as egen
+import base_set_generation.generation_cache as cache
+import base_set_generation.randomized_generator as rgen
 import extractor
+import minimizer
 import progression_scheduler
 import tester
 from base_set_generation.test_case_generator import CONVERT_CLASSES
+from utils.scan import is_archive
 
 def update_menu(): 
     """
@@ -113,10 +122,16 @@ def showmenu():
             print "   --- " + str(no) + ": " + func
         print 
   
-def extract_files(projno, funcno, studentdir):
+def extract_files(projno, funcno, studentdir, jobs=1, patterns=None, 
+    recursive=False, normalize=False, use_cache=True):
     """
-    Extract function(s) from files. If funcno < 0, extracts all functions from
-    the given project.
+    Extract function(s) from files, across jobs processes. If funcno < 0, 
+    extracts all functions from the given project. Only files whose names
+    match one of the given glob patterns (by default, *.py) are extracted
+    from, including those in subdirectories if recursive. If normalize, 
+    implementations with the same normalized form are treated as 
+    duplicates. If use_cache, files that are unchanged since the last 
+    extraction from the same directory are not extracted from again.
     """
     cwd = os.getcwd()
     sys.path.insert(0, cwd + "/projects/project" + str(projno))
@@ -131,49 +146,331 @@ def extract_files(projno, funcno, studentdir):
         funcnos = [funcno]
 
     outputdir = cwd + "/extracted_files/proj" + str(projno) + "_func"
+    manifestpath = cwd + "/extracted_files/proj" + str(projno) \
+        + ".manifest.pickle"
     funcnames = [info.funclist[int(fno)] for fno in funcnos]
 
-    extractor.main(os.path.abspath(studentdir), outputdir, funcnos, 
-        funcnames) 
+    if not patterns:
+        patterns = ["*.py"]
 
-def gen_base_test_set(projno, funcno, importdir=None):
+    try:
+        extractor.main(os.path.abspath(studentdir), outputdir, funcnos, 
+            funcnames, jobs=jobs, patterns=patterns, recursive=recursive,
+            normalize_code=normalize, manifestpath=manifestpath, 
+            use_manifest=use_cache) 
+    except (IOError, OSError) as err:
+        print " ERROR: failed to read student files: " + str(err)
+        return -1
+
+def gen_base_test_set(projno, funcno, importdir=None, seed=None, jobs=1, 
+    budget=None, time_limit=None, boundary_first=False, 
+    coverage_guided=False, coverage_cap=None, per_group=None, use_cache=True,
+    write_stats=False):
     """
-    Generates the base test cases for the specified (problem, function).
+    Generates the base test cases for the specified (problem, function). The
+    randomized test cases are reproducible given a seed, and are generated
+    across jobs processes.
+
+    If given a total budget of test cases and/or a time limit (in seconds),
+    it is split between the exhaustive and randomized test cases according
+    to the [percent exhaustive] split, sampling the exhaustive domain if it
+    is too large to enumerate within its share. If boundary_first, the 
+    boundary values come first, and any exhaustive share is spent on them 
+    first.
+
+    Given per_group, the test cases are then reduced to that many per group
+    with the same reference output and execution path. If coverage_guided, 
+    they are then reduced to those that add coverage of the reference 
+    solution (or a new class of its output), up to coverage_cap of them, if 
+    given.
+
+    Unless use_cache is False, a base test set generated before from the 
+    same config, validation and constructor modules, solution, and options
+    is reused as is (see generation_cache), as long as it was generated from
+    a seed or has no test cases drawn at random. Otherwise, if none of the options
+    above are given and the config only widens the domains (or raises the
+    [num random]) of the last base test set generated for this function, 
+    only the new test cases are generated and appended to it (see 
+    delta_generator).
+
+    If write_stats, the counters, wall time, and peak memory of each stage of
+    generation are written as JSON next to the base test set (see 
+    _write_stats).
     """
+    start_time = time.time()
+
+    ## Counters and timings from each of the generators, for this call alone
+    stats = {}
+
     cwd = os.getcwd()
     outpath = cwd + "/base_set_generation/output/proj" + str(projno) + "_func" \
         + str(funcno) + ".py"
     ms_outpath = cwd + "/base_set_generation/output/ms_proj" + str(projno) + "_func" \
-        + str(funcno) + ".py"
+        + str(funcno) + ".pickle"
 
-    ## Parse the appropriate confid file and auto-generate method_spec.py
+    ## Parse the appropriate confid file, or reuse the method spec parsed from
+    ## it before; the method spec is passed explicitly to the generators
     try:
-        cfp.parse_config_file(projno, funcno, ms_outpath, importdir)
+        method_spec = cfp.load_method_spec(projno, funcno, importdir)
+    except ImportError as ex:
+        ## Validation file not found
+        print " ERROR:", ex.message
+        return -1
     except:
         print " ERROR: failed to parse config file; please see " \
             + "./projects/examples for\n    examples of valid config files, and " \
             + "README for a complete specification of\n    the config file grammar"
         return -1
 
-    ## These can't happen up top because they import method_spec, which is 
-    ## generated by parse_config_file()
-    try:
-        import base_set_generation.exhaustive_generator as egen
-        import base_set_generation.randomized_generator as rgen
-    except ImportError as ex:
-        ## Validation file not found
-        print " ERROR:", ex.message
-        return -1
+    ## Without a seed, any test cases drawn at random differ on every run, so
+    ## a base test set that has any can neither be reused nor extended
+    randomized = method_spec.RANDOMIZED_BOUND or budget is not None or \
+        time_limit is not None
+    if use_cache and seed is None and randomized:
+        print "   -- Not caching the base test set, since no seed was given " \
+            "(see -r)"
+        use_cache = False
+
+    ## Reuse a cached base test set, if there is one; the function itself 
+    ## only matters if the reference solution is traced
+    key = None
+    if use_cache:
+        funcname = None
+        if coverage_guided or per_group is not None:
+            with open("menu.json") as data_file:
+                funcname = json.load(data_file)[str(projno)]["funclist"][funcno]
+
+        key = cache.cache_key(method_spec, 
+            cwd + "/projects/project" + str(projno), [seed, budget, 
+            time_limit, boundary_first, coverage_guided, coverage_cap, 
+            per_group, funcname])
+        contents = cache.load(key)
+        if contents is not None:
+            f = open(outpath, "w")
+            f.write(contents)
+            f.close()
+            cfp.write_method_spec(method_spec, ms_outpath)
+
+            print "   -- Reusing cached base test set " + key[:12]
+            if write_stats:
+                _write_stats(outpath, start_time, stats, True)
+            return load_base_test_set(projno, funcno)
+
+    ## A base test set generated without any of the options that reduce it
+    ## can be extended later, if the config only widens its domains; find the
+    ## previous one before its method spec file is overwritten
+    generation_key = None
+    previous = None
+    if use_cache and budget is None and time_limit is None and \
+        not boundary_first and not coverage_guided and per_group is None:
+        generation_key = cache.generation_key(method_spec, 
+            cwd + "/projects/project" + str(projno), [seed])
+        previous = cache.load_previous(outpath, ms_outpath)
+        if previous is not None and \
+            previous["GENERATION_KEY"] != generation_key:
+            previous = None
+
+    ## Keep the method spec alongside the base test set, to check results
+    cfp.write_method_spec(method_spec, ms_outpath)
+
+    ## Only generate the test cases that are new since the previous base test
+    ## set, if it can be extended
+    if previous is not None:
+        base_test_set = dgen.gen_write_delta_cases(method_spec, outpath, 
+            previous, seed, jobs, stats)
+        if base_test_set is not None:
+            counters = stats["delta"]
+            print "   -- Extended previous base test set of {0} test cases " \
+                "with {1} exhaustive and {2} randomized test cases".format(
+                counters["previous"], counters["exhaustive"], 
+                counters["randomized"])
+
+            _record_generation(outpath, generation_key, key)
+            if write_stats:
+                _write_stats(outpath, start_time, stats)
+            return base_test_set
+
+    ## Convert a time limit into a budget of test cases, at the measured rate 
+    ## of generating randomized test cases
+    deadline = None
+    if time_limit:
+        deadline = time.time() + time_limit
+        time_budget = int(rgen.measure_rate(method_spec, seed) * time_limit)
+        if budget is None or time_budget < budget:
+            budget = time_budget
+
+    ## The exhaustive test cases get their share of the budget (by default,
+    ## all of it), and the randomized test cases get what they leave (see 
+    ## below)
+    exhaustive_bound = None
+    if budget is not None:
+        split = method_spec.SPLIT
+        if split:
+            exhaustive_bound = int(round(budget * split[0]))
+        else:
+            exhaustive_bound = budget
 
-    ## Generate the exhaustive test cases
-    exhaustive_cases = egen.gen_write_exhaustive_cases(outpath)
+    ## The config file may cap the exhaustive test cases regardless
+    if method_spec.EXHAUSTIVE_BOUND is not None and \
+        (exhaustive_bound is None or \
+        method_spec.EXHAUSTIVE_BOUND < exhaustive_bound):
+        exhaustive_bound = method_spec.EXHAUSTIVE_BOUND
 
-    ## Generate the randomized test cases
-    randomized_cases = rgen.gen_write_random_cases(outpath)
+    ## Generate the exhaustive test cases
+    exhaustive_cases = egen.gen_write_exhaustive_cases(method_spec, outpath, 
+        exhaustive_bound, seed, jobs, deadline, boundary_first, stats)
+
+    counters = stats.get("canonical")
+    if counters:
+        print "   -- Canonical forms: {0} of {1} exhaustive test cases kept " \
+            "({2:.1f}x reduction)".format(counters["canonical"], 
+            counters["valid"], 
+            counters["valid"] / float(max(counters["canonical"], 1)))
+
+    counters = stats.get("covering")
+    if counters:
+        print "   -- {0}-way covering array: {1} of {2} exhaustive test cases " \
+            "({3:.1%})".format(counters["strength"], counters["selected"], 
+            counters["full"], 
+            counters["selected"] / float(max(counters["full"], 1)))
+
+    ## Generate the randomized test cases; they get whatever is left of the 
+    ## budget if the config file gives a [percent exhaustive] split, and no
+    ## more than the [num random] otherwise
+    random_bound = method_spec.RANDOMIZED_BOUND
+    if budget is not None:
+        random_bound = max(budget - len(exhaustive_cases), 0)
+        if not method_spec.SPLIT:
+            random_bound = min(random_bound, method_spec.RANDOMIZED_BOUND)
+
+    ## A finite random domain only has so many test cases that aren't already
+    ## exhaustive test cases
+    random_size = rgen.domain_size(method_spec)
+    if random_size is not None:
+        random_bound = min(random_bound, 
+            max(random_size - len(exhaustive_cases), 0))
+
+    randomized_cases = rgen.gen_write_random_cases(method_spec, outpath, 
+        exhaustive_cases, seed, jobs, random_bound, deadline, stats)
+
+    for domain_name in ["boundary", "exhaustive", "random"]:
+        counters = stats.get("sampler", {}).get(domain_name)
+        if counters and counters["attempts"]:
+            print "   -- Sampled {0} domain: {1} of {2} attempts accepted " \
+                "({3:.1%}); {4} failed validation, {5} duplicates, {6} " \
+                "infeasible".format(domain_name, counters["accepted"], 
+                counters["attempts"], counters["acceptance_rate"], 
+                counters["invalid"], counters["duplicate"], 
+                counters["infeasible"])
+            if counters["equivalent"]:
+                print "      skipping {0} equivalent to earlier test " \
+                    "cases".format(counters["equivalent"])
+            if counters["strata"]:
+                print "      covering {0} of {1} strata".format( 
+                    counters["strata_covered"], counters["strata"])
+
+    ## Keep only representative test cases, as executed by the reference 
+    ## solution
+    if per_group is not None or coverage_guided:
+        exhaustive_cases, randomized_cases = covsel.gen_write_selected_cases(
+            method_spec, outpath, projno, funcno, exhaustive_cases, 
+            randomized_cases, importdir, coverage_guided, coverage_cap, 
+            per_group, stats)
+
+    if per_group is not None:
+        counters = stats["collapse"]
+        print "   -- Reference equivalence: kept {0} of {1} test cases, " \
+            "from {2} groups with the same output and execution " \
+            "path".format(counters["selected"], counters["candidates"], 
+            counters["groups"])
+
+    if coverage_guided:
+        counters = stats["coverage"]
+        print "   -- Coverage-guided: kept {0} of {1} test cases, covering " \
+            "{2} lines, {3} arcs, and {4} output classes".format( 
+            counters["selected"], counters["candidates"], counters["line"], 
+            counters["arc"], counters["output"])
+
+    _record_generation(outpath, generation_key, key)
+    if write_stats:
+        _write_stats(outpath, start_time, stats)
 
     ## Return the concatenation of the two sets of test cases
     return exhaustive_cases + randomized_cases
 
+def _record_generation(outpath, generation_key=None, cache_key=None):
+    """
+    Marks the base test set just written to outpath with the given 
+    generation key, if any, so that it can be extended later (see 
+    delta_generator), and caches it under the given cache key, if any.
+    """
+    if generation_key:
+        f = open(outpath, "a")
+        f.write("\nGENERATION_KEY = " + repr(generation_key))
+        f.close()
+
+    if cache_key:
+        cache.store(cache_key, outpath)
+
+def _write_stats(outpath, start_time, stats, cached=False):
+    """
+    Writes the stage stats of the generators (see 
+    test_case_generator.STAGE), as left in the given stats from generating 
+    the base test set just written to outpath, to a JSON file next to it, 
+    along with the total wall time since start_time, the peak memory of the 
+    process, and whether the base test set was cached. Prints where the 
+    stats were written.
+    """
+    summary = {"wall_time": time.time() - start_time, 
+        "peak_memory_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "cached": cached, "exhaustive": stats.get("exhaustive", {}), 
+        "randomized": stats.get("randomized", {})}
+
+    stats_path = os.path.splitext(outpath)[0] + ".stats.json"
+    f = open(stats_path, "w")
+    json.dump(summary, f, indent=2, sort_keys=True)
+    f.close()
+
+    print "   -- Wrote generation stats to " + os.path.relpath(stats_path)
+
+def load_base_test_set(projno, funcno):
+    """
+    Loads the base test set last generated for the specified (problem, 
+    function), with any class objects instantiated.
+    """
+    base_set_path = "base_set_generation.output.proj" + str(projno) + "_func" \
+        + str(funcno)
+    bts_mod = importlib.import_module(base_set_path)
+    method_spec = cfp.read_method_spec(os.getcwd() \
+        + "/base_set_generation/output/ms_proj" + str(projno) + "_func" \
+        + str(funcno) + ".pickle")
+
+    ## Make sure that it is reloaded from its current source, without keeping
+    ## any names that it no longer defines
+    pyc_path = os.path.splitext(bts_mod.__file__)[0] + ".pyc"
+    if os.path.isfile(pyc_path):
+        os.remove(pyc_path)
+    for name in ["APPENDED_CASES", "NUM_PREVIOUS"]:
+        bts_mod.__dict__.pop(name, None)
+    reload(bts_mod)
+
+    ## If there are class objects, instantiate them
+    base_test_set = bts_mod.EXHAUSTIVE_CASES + bts_mod.RANDOMIZED_CASES \
+        + getattr(bts_mod, "APPENDED_CASES", [])
+    return [CONVERT_CLASSES(method_spec, case, method_spec.TYPES) for case \
+        in base_test_set]
+
+def num_previous_cases(projno, funcno):
+    """
+    Returns the number of test cases in the base test set last loaded by 
+    load_base_test_set for the specified (problem, function) that it kept from
+    the base test set it extended (see delta_generator), or None if it was 
+    generated from scratch.
+    """
+    bts_mod = importlib.import_module("base_set_generation.output.proj" \
+        + str(projno) + "_func" + str(funcno))
+    return getattr(bts_mod, "NUM_PREVIOUS", None)
+
 def main():
     """ 
     Execute command. See README (or use -h) for options.
@@ -181,7 +478,8 @@ def main():
     ## Create an argument parser 
     parser = argparse.ArgumentParser(add_help=False)
 
-    ## cmd = [ updatemenu | showmenu | extract | gen | test | pick | all ]
+    ## cmd = [ updatemenu | showmenu | extract | gen | test | minimize | pick 
+    ##         | all ]
     sp = parser.add_subparsers()
     subparsers = {}
 
@@ -200,18 +498,27 @@ def main():
     CMD = "extract"
     sp_extract = sp.add_parser(CMD, help="extract implementations from files")
     sp_extract.set_defaults(cmd=CMD)
-    subparsers[CMD] = (sp_extract, ["p", "f", "s", "i"])
+    subparsers[CMD] = (sp_extract, ["p", "f", "s", "i", "j", "R", "g",
+        "N", "n"])
 
     CMD = "gen"
     sp_gen = sp.add_parser(CMD,  help="generate base test set")
     sp_gen.set_defaults(cmd=CMD)
-    subparsers[CMD] = (sp_gen, ["p", "f", "i"])
+    subparsers[CMD] = (sp_gen, ["p", "f", "i", "r", "j", "b", "t", "B", "c",
+        "C", "k", "n", "S"])
 
     CMD = "test"
     sp_test = sp.add_parser(CMD, help="test extracted implementations")
     sp_test.set_defaults(cmd=CMD)
     subparsers[CMD] = (sp_test, ["p", "f", "i"])
 
+    CMD = "minimize"
+    sp_min = sp.add_parser(CMD, 
+        help="reduce base test set to the cases that tell implementations " \
+        + "apart")
+    sp_min.set_defaults(cmd=CMD)
+    subparsers[CMD] = (sp_min, ["p", "f", "i"])
+
     CMD = "pick"
     sp_pick = sp.add_parser(CMD, 
         help="determine progression through implementations")
@@ -221,7 +528,8 @@ def main():
     CMD = "all"
     sp_all = sp.add_parser(CMD, help="extract && gen && test && pick")
     sp_all.set_defaults(cmd=CMD)
-    subparsers[CMD] = (sp_all, ["p", "f", "s", "i"])
+    subparsers[CMD] = (sp_all, ["p", "f", "s", "i", "r", "j", "b", "t", 
+        "B", "c", "C", "k", "n", "S", "R", "g", "N"])
 
     ## Set up sub-arguments for non-menu commands
     for cmd, (subp, sub_cmds) in subparsers.items():
@@ -235,10 +543,61 @@ def main():
                 help="function index (from menu)")
         if "s" in sub_cmds:
             args.add_argument("-s", "--student-dir", type=str,
-                help="directory containing student solutions")
+                help="directory (or .zip or tar archive) containing " \
+                + "student solutions")
         if "i" in sub_cmds:
             args.add_argument("-i", "--import-dir", type=str,
                 help="directory containing provided files")
+        if "r" in sub_cmds:
+            args.add_argument("-r", "--seed", type=int,
+                help="random seed for the randomized test cases (optional)")
+        if "j" in sub_cmds:
+            args.add_argument("-j", "--jobs", type=int, default=1,
+                help="number of processes extracting files or generating " \
+                + "test cases (optional)")
+        if "b" in sub_cmds:
+            args.add_argument("-b", "--budget", type=int,
+                help="total number of test cases to generate (optional)")
+        if "t" in sub_cmds:
+            args.add_argument("-t", "--time-limit", type=float,
+                help="time limit for test case generation, in seconds " \
+                + "(optional)")
+        if "B" in sub_cmds:
+            args.add_argument("-B", "--boundary-first", action="store_true",
+                help="generate boundary values first, spending any limited " \
+                + "exhaustive budget on them first (optional)")
+        if "c" in sub_cmds:
+            args.add_argument("-c", "--coverage-guided", action="store_true",
+                help="keep only test cases that add coverage of the " \
+                + "reference solution (optional)")
+        if "C" in sub_cmds:
+            args.add_argument("-C", "--coverage-cap", type=int,
+                help="maximum number of test cases kept by -c (optional)")
+        if "k" in sub_cmds:
+            args.add_argument("-k", "--keep-per-group", type=int,
+                help="number of test cases to keep per group with the same " \
+                + "reference output and execution path (optional)")
+        if "n" in sub_cmds:
+            args.add_argument("-n", "--no-cache", action="store_true",
+                help="re-extract unchanged files, and regenerate the base " \
+                + "test set even if a cached one matches (optional)")
+        if "S" in sub_cmds:
+            args.add_argument("-S", "--stats", action="store_true",
+                help="write counters and timings for each stage of " \
+                + "generation next to the base test set (optional)")
+        if "R" in sub_cmds:
+            args.add_argument("-R", "--recursive", action="store_true",
+                help="also extract from files in subdirectories of the " \
+                + "student directory (optional)")
+        if "g" in sub_cmds:
+            args.add_argument("-g", "--glob", type=str, action="append",
+                help="glob pattern of the names of files to extract from; " \
+                + "may be repeated (optional, default *.py)")
+        if "N" in sub_cmds:
+            args.add_argument("-N", "--normalize", action="store_true",
+                help="treat implementations that differ only in names, " \
+                + "helper order, or constant expressions as duplicates " \
+                + "(optional)")
 
     ## Extract args
     try:
@@ -270,6 +629,35 @@ def main():
         print " ERROR: directory " + os.path.abspath(args.student_dir) + \
             " does not exist"
         return
+    elif "s" in sub_cmds and args.student_dir and \
+        os.path.isfile(os.path.abspath(args.student_dir)) and \
+        not is_archive(os.path.abspath(args.student_dir)):
+        print " ERROR: " + os.path.abspath(args.student_dir) + " is neither " \
+            + "a directory nor a .zip or tar archive"
+        return
+
+    if "j" in sub_cmds and args.jobs < 1:
+        print " ERROR: number of jobs must be at least 1"
+        return
+
+    if "b" in sub_cmds and args.budget is not None and args.budget < 0:
+        print " ERROR: budget must be at least 0"
+        return
+
+    if "t" in sub_cmds and args.time_limit is not None and \
+        args.time_limit <= 0:
+        print " ERROR: time limit must be positive"
+        return
+
+    if "C" in sub_cmds and args.coverage_cap is not None and \
+        args.coverage_cap < 1:
+        print " ERROR: coverage cap must be at least 1"
+        return
+
+    if "k" in sub_cmds and args.keep_per_group is not None and \
+        args.keep_per_group < 1:
+        print " ERROR: number of test cases per group must be at least 1"
+        return
 
     ## Call proper function(s) according to cmd 
     if cmd == "updatemenu": 
@@ -300,19 +688,30 @@ def main():
     cwd = os.getcwd()
     config_file_path = cwd + "/projects/project" + str(args.projno) + "/func" \
         + str(args.funcno) + ".cfg"
-    if not os.path.exists(config_file_path):
+    ## Extracting all functions (funcno < 0) needs no config file
+    if not (cmd == "extract" and args.funcno < 0) and \
+        not os.path.exists(config_file_path):
         print " ERROR: file " + config_file_path + " does not exist"
         return
 
     if cmd == "extract":
         print " * Extracting programs from files..."
         print
-        extract_files(args.projno, args.funcno, args.student_dir)
+        retval = extract_files(args.projno, args.funcno, args.student_dir, 
+            args.jobs, args.glob, args.recursive, args.normalize, 
+            not args.no_cache)
+        if retval == -1:
+            print " Extraction failed."
+            return
         print " Done!\n"
 
     elif cmd == "gen":
         print " * Generating base test set..."
-        base_test_set = gen_base_test_set(args.projno, args.funcno, args.import_dir)
+        base_test_set = gen_base_test_set(args.projno, args.funcno, 
+            args.import_dir, args.seed, args.jobs, args.budget, 
+            args.time_limit, args.boundary_first, args.coverage_guided, 
+            args.coverage_cap, args.keep_per_group, not args.no_cache, 
+            args.stats)
         if base_test_set == -1:
             print " Generation failed."
             return
@@ -321,24 +720,7 @@ def main():
     elif cmd == "test":
         ## Attempt to reload base test set from previous generation
         try:
-            base_set_path = "base_set_generation.output.proj" \
-                + str(args.projno) + "_func" + str(args.funcno)
-            method_spec_path = "base_set_generation.output.ms_proj" \
-                + str(args.projno) + "_func" + str(args.funcno)
-            bts_mod = importlib.import_module(base_set_path)
-            ms_mod = importlib.import_module(method_spec_path)
-
-            os.remove(os.path.abspath("./base_set_generation/output/proj" \
-                + str(args.projno) + "_func" + str(args.funcno) + ".pyc"))
-            reload(bts_mod)
-            os.remove(os.path.abspath("./base_set_generation/output/ms_proj" \
-                + str(args.projno) + "_func" + str(args.funcno) + ".pyc"))
-            reload(ms_mod)
-
-            ## If there are class objects, instantiate them
-            base_test_set = bts_mod.EXHAUSTIVE_CASES + bts_mod.RANDOMIZED_CASES
-            base_test_set = [CONVERT_CLASSES(ms_mod, case, ms_mod.TYPES) \
-                for case in base_test_set]
+            base_test_set = load_base_test_set(args.projno, args.funcno)
 
         except:
             raise
@@ -347,12 +729,21 @@ def main():
         
         print " * Identifying bugs..."
         retval = tester.run_tests(args.projno, args.funcno, base_test_set, 
-            args.import_dir)
+            args.import_dir, num_previous_cases(args.projno, args.funcno))
         if retval == -1:
             print " Bug identification failed."
             return
         print " Done!\n"
 
+    elif cmd == "minimize":
+        print " * Minimizing base test set..."
+        retval = minimizer.minimize_base_set(args.projno, args.funcno, 
+            args.import_dir)
+        if retval == -1:
+            print " Minimization failed."
+            return
+        print " Done!\n"
+
     elif cmd == "pick":
         print " * Scheduling progression..."
         progression_scheduler.pick_programs(args.projno, args.funcno, 
@@ -361,13 +752,19 @@ def main():
 
     elif cmd == "all":
         print " * Extracting programs from files..."
-        retval = extract_files(args.projno, args.funcno, args.student_dir)
+        retval = extract_files(args.projno, args.funcno, args.student_dir,
+            args.jobs, args.glob, args.recursive, args.normalize, 
+            not args.no_cache)
         if retval == -1:
             print " Extraction failed."
             return
 
         print " * Generating base test set..."
-        base_test_set = gen_base_test_set(args.projno, args.funcno, args.import_dir)
+        base_test_set = gen_base_test_set(args.projno, args.funcno, 
+            args.import_dir, args.seed, args.jobs, args.budget, 
+            args.time_limit, args.boundary_first, args.coverage_guided, 
+            args.coverage_cap, args.keep_per_group, not args.no_cache, 
+            args.stats)
         if base_test_set == -1:
             print " Base test set generation failed."
             return
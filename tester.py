@@ -29,32 +29,32 @@ import datetime
 from progress.bar import ChargingBar
 
 from utils.deep_equal import deep_equal
+from utils.scan import remove_files, scan_files
 
-def run_tests(projno, funcno, test_set, importdir):
+def run_tests(projno, funcno, test_set, importdir, num_previous=None):
     """
     Execute test_set on extract files for given (projno, funcno).
+
+    If the first num_previous test cases are those of the last test run (see
+    delta_generator), on the same corpus, its results for them are reused 
+    and only the rest are executed.
     """
     starttime = datetime.datetime.now()
     inputdir = os.getcwd() + "/extracted_files/proj" + str(projno) + "_func" \
         + str(funcno)
 
-    ## Remove *.pyc
+    ## Remove *.pyc, which may be stale if the corpus was re-extracted
     try:
-        filelist = os.listdir(inputdir)
+        remove_files(inputdir, ["*.pyc"])
+        filelist = scan_files(inputdir, ["*.py"])
     except:
         print " ERROR: missing corpus; please run extract or manually " \
             + "populate directory\n    " + inputdir
         return -1
 
-    for fname in filelist:
-        if fname[-4:] == ".pyc":
-            os.system("rm {0}/{1}".format(inputdir, fname))
-    filelist = os.listdir(inputdir)
-
     ## Enable importing programs from corpus (and importing provided files)
     sys.path.insert(0, inputdir)
-    files = os.listdir(inputdir)
-    num_files = len(files)
+    num_files = len(filelist)
     if importdir:
         sys.path.insert(0, os.path.abspath(importdir))
 
@@ -68,6 +68,9 @@ def run_tests(projno, funcno, test_set, importdir):
         menu = json.load(data_file)
     funcname = menu[str(projno)]["funclist"][funcno]
     tester = Tester(solution, funcname, test_set)
+    tester.filelist = filelist
+    results_filename = "./test_output/proj" + str(projno) + "_func" \
+        + str(funcno) + ".pickle"
 
     if len(tester.case_map) == 0:
         print " ERROR: base test set is empty; please check that the domain " \
@@ -87,7 +90,20 @@ def run_tests(projno, funcno, test_set, importdir):
             + " match the\n    specification in the config file"
         return -1
 
-    tester.solution_results()
+    ## Reuse the results of the last test run, if it covered the first 
+    ## num_previous test cases
+    start = 0
+    previous = None
+    if num_previous:
+        previous = load_previous_results(results_filename, tester, 
+            num_previous)
+    if previous:
+        tester.resume(previous)
+        start = num_previous
+        print "   -- Reusing results of the last test run for " \
+            + str(start) + " of " + str(len(test_set)) + " test cases"
+
+    tester.solution_results(start)
 
     ## Prepare to output test results
     try:
@@ -106,6 +122,13 @@ def run_tests(projno, funcno, test_set, importdir):
         fout.write("\nFile {0}: {1}".format(count, fname))
         fout.flush()
 
+        ## Files removed in the last test run stay removed, and the rest 
+        ## need no testing if there are no new test cases
+        if previous and (fname in tester.remove_set or \
+            start == len(test_set)):
+            count += 1
+            continue
+
         ## Load student submission for testing; catch import exceptions
         try:
             submission = importlib.import_module(fname[:-3])
@@ -115,7 +138,7 @@ def run_tests(projno, funcno, test_set, importdir):
             continue
 
         ## Test submission on base test set
-        tester.test_fast(submission, fname, count)
+        tester.test_fast(submission, fname, count, start)
         count += 1
 
     bar.finish()
@@ -125,10 +148,8 @@ def run_tests(projno, funcno, test_set, importdir):
         ## Save the results in the ./test_output directory, for use by the
         ## progression scheduler
         tester.sol = None ## Can't pickle module objects
-        results_filename = "./test_output/proj" + str(projno) + "_func" \
-            + str(funcno) + ".pickle"
         if os.path.isfile(results_filename):
-            os.system("rm {0}".format(results_filename))
+            os.remove(results_filename)
         f_results = open(results_filename, "w+")
         pickle.dump(tester, f_results)
 
@@ -142,6 +163,33 @@ def run_tests(projno, funcno, test_set, importdir):
     print "      Runtime:", endtime - starttime
     print
 
+def load_previous_results(results_filename, tester, num_previous):
+    """
+    Returns the tester pickled by the last test run, if its base test set is
+    the first num_previous test cases of the given tester's, and it ran on the
+    same corpus; otherwise returns None.
+    """
+    try:
+        f_results = open(results_filename)
+        previous = pickle.load(f_results)
+        f_results.close()
+    except:
+        return None
+
+    if previous.funcname != tester.funcname or \
+        getattr(previous, "filelist", None) != tester.filelist or \
+        len(previous.base_set) != num_previous:
+        return None
+
+    try:
+        if not deep_equal(list(previous.base_set), 
+            list(tester.base_set[:num_previous])):
+            return None
+    except:
+        return None
+
+    return previous
+
 def test_helper_fast(submission, funcname, case_map, results, queue):   
     """
     Helper function for testing a student submission; results are returned
@@ -215,6 +263,10 @@ class Tester():
         self.remove_set = set()
         self.timeoutlimit = 15
 
+        ## Files in the corpus, in the order they were tested (set by 
+        ## run_tests)
+        self.filelist = None
+
         ## Assigns an explicit index to each case; easier than using the list 
         ## indices for the purposes of multiprocessing
         self.create_case_map()
@@ -227,14 +279,27 @@ class Tester():
         for ind, case in enumerate(self.base_set):
             self.case_map[ind] = case
 
-    def solution_results(self):
+    def resume(self, previous):
+        """
+        Takes on the results of the given tester, for the test cases that
+        its base test set shares with this one.
         """
-        Generates the results of all test cases and stores in self.results.
+        self.results = previous.results
+        self.case_file = previous.case_file
+        self.file_case = previous.file_case
+        self.wrong_set = previous.wrong_set
+        self.correct_set = previous.correct_set
+        self.remove_set = previous.remove_set
+
+    def solution_results(self, start=0):
+        """
+        Generates the results of all test cases (from index start on) and
+        stores in self.results.
         """
         bar = ChargingBar("   -- Generating reference results ",
-            max=len(self.base_set))
+            max=len(self.base_set) - start)
 
-        for ind in range(len(self.base_set)):
+        for ind in range(start, len(self.base_set)):
             bar.next()
             case = self.case_map[ind]
             temp_case = copy.deepcopy(case)
@@ -271,9 +336,10 @@ class Tester():
             self.case_file[ind] = set()
         self.case_file[ind].add(fname)
 
-    def test_fast(self, submission, fname, findex):
+    def test_fast(self, submission, fname, findex, start=0):
         """
-        Tests the correctness of the given student submission.
+        Tests the correctness of the given student submission (on the test
+        cases from index start on, keeping its results for the others).
         """
         try:
             test_func = getattr(submission, self.funcname)
@@ -287,10 +353,17 @@ class Tester():
         ## Use queue to hold results
         queue = multiprocessing.Manager().Queue()
 
+        if start:
+            case_map = dict([(ind, case) for ind, case \
+                in self.case_map.items() if ind >= start])
+        else:
+            case_map = self.case_map
+
         ## Start correctness_checker as a subprocess
-        self.file_case[findex] = set()
+        if not start or findex not in self.file_case:
+            self.file_case[findex] = set()
         p = multiprocessing.Process(target=test_helper_fast,
-            args=(submission, self.funcname, self.case_map, self.results, 
+            args=(submission, self.funcname, case_map, self.results, 
             queue))
         p.start()
 
@@ -302,6 +375,8 @@ class Tester():
             p.terminate()
             p.join()
             self.remove_set.add(fname)
+            self.wrong_set.discard(findex)
+            self.correct_set.discard(findex)
             return 
 
         ## Process test case failures
@@ -310,8 +385,11 @@ class Tester():
             self.update_file_case(findex, ind)
             self.update_case_file(ind, findex)
 
-        ## Classify this submission as correct or buggy
-        correctness_flag = queue.get() 
+        ## Classify this submission as correct or buggy, including any test
+        ## cases it failed before start
+        correctness_flag = queue.get() and not self.file_case[findex]
+        self.wrong_set.discard(findex)
+        self.correct_set.discard(findex)
         if not correctness_flag:
             self.wrong_set.add(findex)
         else: 
@@ -0,0 +1,133 @@
+"""
+Copyright 2015-2017 Rebecca Smith, Terry Tang, Joe Warren, and Scott Rixner
+
+This file is part of Testception.
+
+Testception is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+Testception is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+Testception. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import fnmatch
+import os
+import posixpath
+import re
+import tarfile
+import zipfile
+import zlib
+
+## Suffixes of the archives that files can be read from (see iter_archive)
+ARCHIVE_SUFFIXES = (".zip", ".tar.gz", ".tgz", ".tar")
+
+def _raise(err):
+    """
+    Error handler for os.walk, which otherwise ignores a missing or
+    unreadable directory.
+    """
+    raise err
+
+def _compile(patterns):
+    """
+    Returns a regular expression matching any of the given glob patterns.
+    """
+    return re.compile("|".join([fnmatch.translate(pattern) \
+        for pattern in patterns]))
+
+def scan_files(dirname, patterns=("*",), recursive=False):
+    """
+    Returns the paths, relative to dirname, of the files in dirname whose
+    names match any of the given glob patterns, in sorted order. If
+    recursive, the files in its subdirectories are included as well.
+    Raises OSError if dirname cannot be read.
+    """
+    regex = _compile(patterns)
+
+    paths = []
+    for root, subdirs, fnames in os.walk(dirname, onerror=_raise):
+        relroot = os.path.relpath(root, dirname)
+        for fname in fnames:
+            if regex.match(fname):
+                if relroot == os.curdir:
+                    paths.append(fname)
+                else:
+                    paths.append(os.path.join(relroot, fname))
+
+        if not recursive:
+            break
+
+    paths.sort()
+    return paths
+
+def remove_files(dirname, patterns, recursive=False):
+    """
+    Removes the files in dirname (see scan_files) whose names match any of
+    the given glob patterns, in a single scan. Returns the number of files
+    removed.
+    """
+    paths = scan_files(dirname, patterns, recursive)
+    for path in paths:
+        os.remove(os.path.join(dirname, path))
+
+    return len(paths)
+
+def is_archive(path):
+    """
+    Returns True if the given path is that of an archive that files can be
+    read from (see iter_archive).
+    """
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_SUFFIXES)
+
+def iter_archive(path, patterns=("*",), recursive=False):
+    """
+    Yields (name, size, mtime, contents) for each file in the given .zip or
+    (optionally compressed) tar archive whose name matches any of the given
+    glob patterns, in the order they are stored, without unpacking the
+    archive to disk; tar archives are read as a stream. Names are paths 
+    within the archive; unless recursive, only files at its top level are
+    included. Raises IOError if the archive cannot be read.
+    """
+    regex = _compile(patterns)
+
+    def matches(name):
+        return regex.match(name.split("/")[-1]) and \
+            (recursive or "/" not in name)
+
+    ## Errors may only surface part way through reading a stream
+    try:
+        if path.lower().endswith(".zip"):
+            archive = zipfile.ZipFile(path)
+            try:
+                for info in archive.infolist():
+                    name = _normalize_name(info.filename)
+                    if not info.filename.endswith("/") and matches(name):
+                        yield name, info.file_size, info.date_time, \
+                            archive.read(info)
+            finally:
+                archive.close()
+        else:
+            archive = tarfile.open(path, "r|*")
+            try:
+                for info in archive:
+                    name = _normalize_name(info.name)
+                    if info.isfile() and matches(name):
+                        yield name, info.size, info.mtime, \
+                            archive.extractfile(info).read()
+            finally:
+                archive.close()
+    except (zipfile.BadZipfile, tarfile.TarError, zlib.error) as err:
+        raise IOError(path + ": " + str(err))
+
+def _normalize_name(name):
+    """
+    Returns the given name of a file in an archive without any leading "./"
+    or "/".
+    """
+    return posixpath.normpath(name).lstrip("/")